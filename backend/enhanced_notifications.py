@@ -8,13 +8,110 @@ from email import encoders
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict
 import json
+import html
+import gzip
+import time
+import hashlib
+import uuid
+import random
 import asyncio
 import logging
 from motor.motor_asyncio import AsyncIOMotorClient
+from string import Template
+from pymongo import ReturnDocument, UpdateOne, UpdateMany
+from pymongo.errors import BulkWriteError
 from enum import Enum
+from external_integrations.messaging import get_sms_provider, get_push_provider, close_providers
 
 logger = logging.getLogger(__name__)
 
+# SMTP connection pool settings
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', '4'))
+SMTP_TIMEOUT_SECONDS = 15  # Per connect/send, so a stuck server can't hold a worker
+SMTP_MAX_MESSAGES_PER_CONNECTION = 100  # Many providers cap messages per session
+SMTP_IDLE_SECONDS = 60  # Servers drop idle sessions; reconnect rather than reuse
+
+# Delivery outbox settings
+OUTBOX_WORKERS = int(os.environ.get('NOTIFICATION_WORKERS', '4'))
+OUTBOX_LEASE_SECONDS = 120  # A crashed worker's claim is picked up again after this
+OUTBOX_POLL_SECONDS = 5
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_BACKOFF_BASE_SECONDS = 30
+OUTBOX_BACKOFF_MAX_SECONDS = 3600
+
+# Unread counter reconciliation
+COUNTER_RECONCILE_SECONDS = 900  # Fix counters of users whose notifications expired meanwhile
+# (the expires_at TTL index in create_indexes.py waits 2x this, so expired ones are still found)
+COUNTER_FULL_SWEEP_SECONDS = 86400  # Recount every user once a day to correct any drift
+COUNTER_RECONCILE_BATCH_SIZE = 500
+
+# Archival of old notifications into notifications_archive
+ARCHIVE_READ_AFTER_DAYS = 30  # Read notifications stay hot this long (read_at TTL at 60 days is the backstop)
+ARCHIVE_UNREAD_AFTER_DAYS = 180  # Unread but never-expiring ones eventually go too
+ARCHIVE_BATCH_SIZE = 1000
+
+# Email digests: low and medium priority email is collected and sent as one message per window
+EMAIL_DIGEST_ENABLED = os.environ.get('EMAIL_DIGEST_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+EMAIL_DIGEST_WINDOW_MINUTES = int(os.environ.get('EMAIL_DIGEST_WINDOW_MINUTES', '60'))
+EMAIL_DIGEST_CHECK_SECONDS = 300
+EMAIL_DIGEST_PRIORITIES = ("low", "medium")
+EMAIL_DIGEST_MAX_ITEMS = 20  # Rendered per email; the rest are summarised as a count
+EMAIL_DIGEST_USER_BATCH = 200
+EMAIL_DIGEST_LEASE_SECONDS = 600  # A crashed worker's claimed digest rows become claimable again after this
+
+PRIORITY_COLORS = {
+    "low": "#28a745",
+    "medium": "#ffc107",
+    "high": "#fd7e14",
+    "urgent": "#dc3545"
+}
+
+DIGEST_EMAIL_TEMPLATE = Template("""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>$subject</title>
+</head>
+<body style="font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #f4f4f4;">
+    <div style="max-width: 600px; margin: 0 auto; background-color: white; border-radius: 8px; overflow: hidden; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
+        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 30px; text-align: center;">
+            <h1 style="margin: 0; font-size: 28px;">🚗 Driving School Platform</h1>
+            <p style="margin: 10px 0 0 0; opacity: 0.9;">$summary</p>
+        </div>
+        <div style="padding: 30px;">
+            <p style="color: #333; font-size: 16px; margin-top: 0;">Hello $first_name,</p>
+            $items
+            $more
+        </div>
+        <div style="padding: 0 30px 30px;">
+            <a href="$dashboard_url"
+               style="display: inline-block; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 12px 30px; text-decoration: none; border-radius: 25px; font-weight: bold;">
+                Open Dashboard
+            </a>
+        </div>
+        <div style="background-color: #f8f9fa; padding: 20px; text-align: center; color: #666; font-size: 14px;">
+            <p style="margin: 0;">This is an automated summary from the Driving School Platform</p>
+            <p style="margin: 5px 0 0 0;">🇩🇿 Algeria Driving Education System</p>
+        </div>
+    </div>
+</body>
+</html>""")
+
+DIGEST_ITEM_TEMPLATE = Template("""<div style="border-left: 4px solid $color; padding: 10px 15px; margin-bottom: 15px; background-color: #f8f9fa;">
+                <h3 style="margin: 0 0 5px 0; color: #333; font-size: 16px;">$title</h3>
+                <p style="margin: 0; color: #666; line-height: 1.5;">$message</p>
+                <p style="margin: 5px 0 0 0; color: #999; font-size: 12px;">$created_at</p>
+            </div>""")
+
+# Batched notification writes
+NOTIFICATION_WRITE_WINDOW_SECONDS = 0.02  # Inserts arriving within this window share one insert_many
+NOTIFICATION_WRITE_MAX_BATCH = 500
+
+# Push delivery to connected clients
+BROKER_QUEUE_SIZE = 100  # Per connection; a stalled client drops its oldest events
+BROKER_CHANGE_STREAM = os.environ.get('NOTIFICATION_CHANGE_STREAM', '').lower() in ('1', 'true', 'yes')
+
 class NotificationPriority(str, Enum):
     LOW = "low"
     MEDIUM = "medium"
@@ -27,6 +124,269 @@ class NotificationChannel(str, Enum):
     PUSH = "push"
     IN_APP = "in_app"
 
+class DeliveryState(str, Enum):
+    PENDING = "pending"
+    DELIVERING = "delivering"
+    RETRY = "retry"
+    DELIVERED = "delivered"
+    FAILED = "failed"
+
+class NotificationBroker:
+    """In-process pub/sub from notification writers to connected clients.
+
+    Writers publish after a successful insert. With NOTIFICATION_CHANGE_STREAM set
+    (needs a MongoDB replica set) inserts are read from change streams instead, so
+    clients connected to any worker see every write.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, set] = {}
+        self._watchers: List[asyncio.Task] = []
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=BROKER_QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def _dispatch(self, notification: dict):
+        for queue in self._subscribers.get(notification.get("user_id"), ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(notification)
+
+    def publish(self, notifications: List[dict]):
+        """Push freshly inserted notifications to their users' connections"""
+        if self._watchers:
+            return  # The change streams deliver them, on every worker
+        for notification in notifications:
+            self._dispatch(notification)
+
+    def start_change_streams(self, db, collection_names: List[str]):
+        if not BROKER_CHANGE_STREAM or self._watchers:
+            return
+        self._watchers = [asyncio.create_task(self._watch(db[name])) for name in collection_names]
+
+    async def stop_change_streams(self):
+        watchers, self._watchers = self._watchers, []
+        for watcher in watchers:
+            watcher.cancel()
+        await asyncio.gather(*watchers, return_exceptions=True)
+
+    async def _watch(self, collection):
+        while True:
+            try:
+                async with collection.watch([{"$match": {"operationType": "insert"}}]) as stream:
+                    async for change in stream:
+                        self._dispatch(change["fullDocument"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification change stream error: {str(e)}")
+                await asyncio.sleep(5)
+
+# Shared by every service instance in the process
+notification_broker = NotificationBroker()
+
+class NotificationWriter:
+    """Buffers notification inserts for a short window and stores them with insert_many.
+
+    Callers still await their own documents being stored; concurrent writers just share
+    the round trip. on_inserted runs once per flush with the documents actually stored.
+    """
+
+    def __init__(self, collection, on_inserted):
+        self.collection = collection
+        self.on_inserted = on_inserted
+        self._buffer: List[tuple] = []  # (docs, future)
+        self._buffered = 0
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def write(self, notification_docs: List[dict]) -> List[dict]:
+        """Queue documents for the next batched insert; returns the ones stored
+        (documents whose idempotency key already exists are dropped)"""
+        if not notification_docs:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.append((notification_docs, future))
+        self._buffered += len(notification_docs)
+        if self._buffered >= NOTIFICATION_WRITE_MAX_BATCH:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(NOTIFICATION_WRITE_WINDOW_SECONDS)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        batch, self._buffer, self._buffered = self._buffer, [], 0
+        if not batch:
+            return
+        
+        docs = [doc for batch_docs, _ in batch for doc in batch_docs]
+        duplicates = set()
+        try:
+            try:
+                await self.collection.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if any(error.get("code") != 11000 for error in errors):
+                    raise
+                duplicates = {error["index"] for error in errors}
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        stored = [doc for index, doc in enumerate(docs) if index not in duplicates]
+        try:
+            await self.on_inserted(stored)
+        except Exception as e:
+            logger.error(f"Notification post-insert hook failed: {str(e)}")
+        stored_ids = {doc["id"] for doc in stored}
+        for batch_docs, future in batch:
+            if not future.done():
+                future.set_result([doc for doc in batch_docs if doc["id"] in stored_ids])
+
+class _PooledSMTPConnection:
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+        self.reused = False
+
+class SMTPConnectionPool:
+    """Bounded pool of authenticated SMTP connections.
+
+    smtplib is blocking, so every network call runs in a worker thread and the
+    event loop only waits on it. Connections are reused across messages, which
+    saves the TCP connect, STARTTLS and login on every send.
+    """
+
+    def __init__(self, host: str, port: int, username: str, password: str, size: int = SMTP_POOL_SIZE, use_tls: bool = True):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self._slots = asyncio.Semaphore(size)
+        self._idle: List[_PooledSMTPConnection] = []
+
+    def _connect(self) -> _PooledSMTPConnection:
+        # The socket timeout is a backstop; wait_for enforces SMTP_TIMEOUT_SECONDS, so a slow
+        # server surfaces as a timeout rather than a disconnect that would be retried
+        smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT_SECONDS * 2)
+        try:
+            if self.use_tls:
+                smtp.starttls()
+            smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        return _PooledSMTPConnection(smtp)
+
+    @staticmethod
+    def _close(connection: _PooledSMTPConnection):
+        try:
+            connection.smtp.quit()
+        except Exception:
+            connection.smtp.close()
+
+    async def _acquire(self) -> _PooledSMTPConnection:
+        await self._slots.acquire()
+        try:
+            while self._idle:
+                connection = self._idle.pop()
+                if time.monotonic() - connection.last_used < SMTP_IDLE_SECONDS:
+                    connection.reused = True
+                    return connection
+                await asyncio.to_thread(self._close, connection)
+            return await asyncio.wait_for(asyncio.to_thread(self._connect), SMTP_TIMEOUT_SECONDS)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def _release(self, connection: _PooledSMTPConnection, healthy: bool):
+        try:
+            if healthy and connection.messages_sent < SMTP_MAX_MESSAGES_PER_CONNECTION:
+                connection.last_used = time.monotonic()
+                self._idle.append(connection)
+            else:
+                # Closing the socket also unblocks a thread still stuck after a timeout
+                await asyncio.to_thread(self._close, connection)
+        finally:
+            self._slots.release()
+
+    async def send_many(self, messages: List[tuple]) -> List[bool]:
+        """Send (from_addr, to_addrs, message) tuples back to back over one connection"""
+        connection = await self._acquire()
+        healthy = True
+        results = []
+
+        def send_all():
+            for from_addr, to_addrs, message in messages:
+                try:
+                    connection.smtp.sendmail(from_addr, to_addrs, message)
+                    connection.messages_sent += 1
+                    results.append(True)
+                except smtplib.SMTPRecipientsRefused as e:
+                    # A bad address doesn't break the session
+                    logger.error(f"Recipients refused: {e.recipients}")
+                    results.append(False)
+
+        try:
+            await asyncio.wait_for(asyncio.to_thread(send_all), SMTP_TIMEOUT_SECONDS * max(1, len(messages)))
+            sent = results
+        except Exception as e:
+            healthy = False
+            sent = list(results)
+            logger.error(f"SMTP session failed after {len(sent)} of {len(messages)} messages: {str(e)}")
+        finally:
+            await self._release(connection, healthy)
+        return sent + [False] * (len(messages) - len(sent))
+
+    async def send(self, from_addr: str, to_addrs: List[str], message: str) -> bool:
+        """Send one message, retrying once on a fresh connection if a pooled one went stale"""
+        for attempt in range(2):
+            connection = await self._acquire()
+            try:
+                await asyncio.wait_for(
+                    asyncio.to_thread(connection.smtp.sendmail, from_addr, to_addrs, message),
+                    SMTP_TIMEOUT_SECONDS
+                )
+            except smtplib.SMTPServerDisconnected:
+                await self._release(connection, False)
+                # Only a pooled connection can have gone stale; a fresh one failing is a real error
+                if attempt == 0 and connection.reused:
+                    continue
+                raise
+            except BaseException:
+                await self._release(connection, False)
+                raise
+            connection.messages_sent += 1
+            await self._release(connection, True)
+            return True
+        return False
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            await asyncio.to_thread(self._close, connection)
+
 class EnhancedNotificationService:
     def __init__(self, db_client):
         self.db = db_client.driving_school_platform
@@ -35,6 +395,28 @@ class EnhancedNotificationService:
         self.smtp_username = os.environ.get('SMTP_USERNAME')
         self.smtp_password = os.environ.get('SMTP_PASSWORD')
         self.from_email = os.environ.get('FROM_EMAIL', self.smtp_username)
+        self.smtp_use_tls = os.environ.get('SMTP_USE_TLS', 'true').lower() in ('1', 'true', 'yes')
+        self.smtp_pool = None
+        if self.smtp_username and self.smtp_password:
+            self.smtp_pool = SMTPConnectionPool(
+                self.smtp_server, self.smtp_port, self.smtp_username, self.smtp_password, use_tls=self.smtp_use_tls
+            )
+        # Shared per process so throttling and circuit state cover every service instance
+        self.sms_provider = get_sms_provider()
+        self.push_provider = get_push_provider()
+        self._workers: List[asyncio.Task] = []
+        self._outbox_wakeup = asyncio.Event()
+        self._reconciler: Optional[asyncio.Task] = None
+        self._digest_task: Optional[asyncio.Task] = None
+        # Every producer (this service and server.py) writes through here into one collection
+        self.writer = NotificationWriter(self.db.notifications, self._after_insert)
+
+    async def close(self):
+        """Flush buffered writes and close pooled connections on shutdown"""
+        await self.writer.flush()
+        if self.smtp_pool:
+            await self.smtp_pool.close()
+        close_providers()
 
     async def create_notification(
         self,
@@ -50,9 +432,74 @@ class EnhancedNotificationService:
     ) -> str:
         """Create an enhanced notification with multiple delivery channels"""
         
-        notification_id = str(__import__('uuid').uuid4())
+        notification_doc = self._build_notification(
+            user_id, notification_type, title, message, priority, channels, metadata, scheduled_at, expires_at
+        )
+        
+        # Delivery workers pick it up; the caller only waits for the insert
+        await self.writer.write([notification_doc])
+        return notification_doc["id"]
+
+    async def write_notifications(self, notification_docs: List[dict]) -> List[dict]:
+        """Store notifications built elsewhere, filling in the shared schema's defaults"""
+        normalized = []
+        for doc in notification_docs:
+            base = self._build_notification(
+                user_id=doc["user_id"],
+                notification_type=doc["type"],
+                title=doc.get("title", ""),
+                message=doc.get("message", ""),
+                priority=doc.get("priority", NotificationPriority.MEDIUM),
+                channels=doc.get("channels", [NotificationChannel.IN_APP]),
+                metadata=doc.get("metadata"),
+                expires_at=doc.get("expires_at")
+            )
+            base.update(doc)
+            normalized.append(base)
+        return await self.writer.write(normalized)
+
+    async def _after_insert(self, notification_docs: List[dict]):
+        """Count, push and queue for delivery whatever a writer flush stored"""
+        try:
+            await self._count_new_notifications(notification_docs)
+        except Exception as e:
+            logger.warning(f"Failed to update notification counters: {str(e)}")
+        notification_broker.publish(notification_docs)
+        if any(doc["delivery_state"] == DeliveryState.PENDING for doc in notification_docs):
+            self._outbox_wakeup.set()
+
+    def _build_notification(
+        self,
+        user_id: str,
+        notification_type: str,
+        title: str,
+        message: str,
+        priority: NotificationPriority = NotificationPriority.MEDIUM,
+        channels: List[NotificationChannel] = [NotificationChannel.IN_APP],
+        metadata: Optional[Dict] = None,
+        scheduled_at: Optional[datetime] = None,
+        expires_at: Optional[datetime] = None,
+        idempotency_key: Optional[str] = None
+    ) -> dict:
+        """Build a notification document ready for the outbox"""
+        now = datetime.utcnow()
+        channels = [NotificationChannel(channel).value for channel in channels]
+        # In-app delivery is the stored document itself; everything else goes through the outbox
+        delivery_status = {}
+        if NotificationChannel.IN_APP.value in channels:
+            delivery_status[NotificationChannel.IN_APP.value] = {"success": True, "delivered_at": now}
+        # Routine email waits for the user's next digest instead
+        digest_email = (
+            EMAIL_DIGEST_ENABLED
+            and NotificationChannel.EMAIL.value in channels
+            and NotificationPriority(priority).value in EMAIL_DIGEST_PRIORITIES
+        )
+        if digest_email:
+            delivery_status[NotificationChannel.EMAIL.value] = {"success": False, "skipped": "digest", "queued_at": now}
+        needs_delivery = any(channel not in delivery_status for channel in channels)
+        
         notification_doc = {
-            "id": notification_id,
+            "id": str(uuid.uuid4()),
             "user_id": user_id,
             "type": notification_type,
             "title": title,
@@ -61,70 +508,316 @@ class EnhancedNotificationService:
             "channels": channels,
             "metadata": metadata or {},
             "is_read": False,
-            "is_delivered": False,
-            "delivery_status": {},
-            "scheduled_at": scheduled_at or datetime.utcnow(),
+            "is_delivered": any(status["success"] for status in delivery_status.values()),
+            "delivery_status": delivery_status,
+            "delivery_state": DeliveryState.PENDING if needs_delivery else DeliveryState.DELIVERED,
+            "delivery_attempts": 0,
+            "next_attempt_at": scheduled_at or now,
+            "lease_until": None,
+            "scheduled_at": scheduled_at or now,
             "expires_at": expires_at,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
+            "created_at": now,
+            "updated_at": now
         }
+        if idempotency_key:
+            notification_doc["idempotency_key"] = idempotency_key
+        if digest_email:
+            notification_doc["email_digest_pending"] = True
+        return notification_doc
+
+    async def _insert_notifications(self, notification_docs: List[dict]) -> int:
+        """Insert many notifications at once; ones whose idempotency key already exists are skipped"""
+        return len(await self.writer.write(notification_docs))
+
+    async def _count_new_notifications(self, notification_docs: List[dict]):
+        """Add freshly inserted notifications to their users' counters"""
+        increments = {}
+        for doc in notification_docs:
+            user_increments = increments.setdefault(doc["user_id"], {"total": 0, "unread": 0})
+            user_increments["total"] += 1
+            user_increments["unread"] += 1
+            key = f"unread_by_priority.{NotificationPriority(doc['priority']).value}"
+            user_increments[key] = user_increments.get(key, 0) + 1
+        if increments:
+            await self.db.notification_counters.bulk_write([
+                UpdateOne(
+                    {"id": user_id},
+                    {"$inc": user_increments, "$set": {"user_id": user_id, "updated_at": datetime.utcnow()}},
+                    upsert=True
+                )
+                for user_id, user_increments in increments.items()
+            ], ordered=False)
+
+    async def _decrement_counters(self, notification: dict, total: int = 0):
+        """Take a notification that was read or deleted out of its user's counters"""
+        increments = {"total": total}
+        if not notification.get("is_read"):
+            increments["unread"] = -1
+            increments[f"unread_by_priority.{NotificationPriority(notification['priority']).value}"] = -1
+        await self.db.notification_counters.update_one(
+            {"id": notification["user_id"]},
+            {"$inc": increments, "$set": {"updated_at": datetime.utcnow()}}
+        )
+
+    async def reconcile_counters(self, user_ids: Optional[List[str]] = None) -> int:
+        """Recount unexpired notifications for the given users (all users when None)"""
+        now = datetime.utcnow()
+        match = {"$or": [{"expires_at": None}, {"expires_at": {"$gte": now}}]}
+        if user_ids is not None:
+            match["user_id"] = {"$in": user_ids}
         
-        await self.db.enhanced_notifications.insert_one(notification_doc)
+        counters = {user_id: self._empty_counter() for user_id in user_ids or []}
+        async for group in self.db.notifications.aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "is_read": "$is_read", "priority": "$priority"},
+                "count": {"$sum": 1}
+            }}
+        ]):
+            counter = counters.setdefault(group["_id"]["user_id"], self._empty_counter())
+            counter["total"] += group["count"]
+            if not group["_id"]["is_read"]:
+                counter["unread"] += group["count"]
+                priority = group["_id"]["priority"] or NotificationPriority.MEDIUM.value
+                counter["unread_by_priority"][priority] = counter["unread_by_priority"].get(priority, 0) + group["count"]
         
-        # If not scheduled for later, send immediately
-        if not scheduled_at or scheduled_at <= datetime.utcnow():
-            await self._deliver_notification(notification_doc)
+        user_list = list(counters.items())
+        for start in range(0, len(user_list), COUNTER_RECONCILE_BATCH_SIZE):
+            await self.db.notification_counters.bulk_write([
+                UpdateOne(
+                    {"id": user_id},
+                    {"$set": {**counter, "user_id": user_id, "updated_at": now}},
+                    upsert=True
+                )
+                for user_id, counter in user_list[start:start + COUNTER_RECONCILE_BATCH_SIZE]
+            ], ordered=False)
         
-        return notification_id
+        if user_ids is None:
+            # Users with no unexpired notifications left weren't in the aggregation
+            await self.db.notification_counters.update_many(
+                {"updated_at": {"$lt": now}},
+                {"$set": {**self._empty_counter(), "updated_at": now}}
+            )
+        return len(counters)
 
-    async def _deliver_notification(self, notification: dict):
-        """Deliver notification through specified channels"""
-        delivery_status = {}
+    @staticmethod
+    def _empty_counter() -> dict:
+        return {"total": 0, "unread": 0, "unread_by_priority": {priority.value: 0 for priority in NotificationPriority}}
+
+    def start_counter_reconciler(self):
+        """Start the periodic job that corrects counters for expirations and drift,
+        archiving old notifications before each daily recount"""
+        if self._reconciler is None:
+            self._reconciler = asyncio.create_task(self._reconcile_loop())
+
+    async def stop_counter_reconciler(self):
+        reconciler, self._reconciler = self._reconciler, None
+        if reconciler:
+            reconciler.cancel()
+            await asyncio.gather(reconciler, return_exceptions=True)
+
+    async def _reconcile_loop(self):
+        last_run = datetime.utcnow()
+        last_full_sweep = time.monotonic()
+        while True:
+            await asyncio.sleep(COUNTER_RECONCILE_SECONDS)
+            try:
+                now = datetime.utcnow()
+                if time.monotonic() - last_full_sweep >= COUNTER_FULL_SWEEP_SECONDS:
+                    await self.archive_notifications()
+                    await self.reconcile_counters()
+                    last_full_sweep = time.monotonic()
+                else:
+                    expired_users = await self.db.notifications.distinct(
+                        "user_id", {"expires_at": {"$gte": last_run, "$lt": now}}
+                    )
+                    if expired_users:
+                        await self.reconcile_counters(expired_users)
+                last_run = now
+            except Exception as e:
+                logger.error(f"Notification counter reconcile error: {str(e)}")
+
+    async def archive_notifications(self) -> int:
+        """Move old notifications into gzipped per-user bundles in notifications_archive"""
+        now = datetime.utcnow()
+        read_cutoff = now - timedelta(days=ARCHIVE_READ_AFTER_DAYS)
+        query = {"$or": [
+            {"is_read": True, "read_at": {"$lt": read_cutoff}},
+            {"is_read": True, "read_at": {"$exists": False}, "created_at": {"$lt": read_cutoff}},
+            {"is_read": False, "created_at": {"$lt": now - timedelta(days=ARCHIVE_UNREAD_AFTER_DAYS)}}
+        ]}
+        
+        archived = 0
+        while True:
+            # A stable order means a batch interrupted before its delete is rebuilt identically
+            notifications = await self.db.notifications.find(query).sort(
+                [("created_at", 1), ("id", 1)]
+            ).limit(ARCHIVE_BATCH_SIZE).to_list(length=ARCHIVE_BATCH_SIZE)
+            if not notifications:
+                break
+            
+            by_user = {}
+            for notification in notifications:
+                notification.pop("_id", None)
+                by_user.setdefault(notification["user_id"], []).append(notification)
+            
+            bundles = []
+            for user_id, user_notifications in by_user.items():
+                ids = [notification["id"] for notification in user_notifications]
+                bundles.append({
+                    "id": hashlib.sha1(",".join(ids).encode()).hexdigest(),
+                    "user_id": user_id,
+                    "count": len(ids),
+                    "notification_ids": ids,
+                    "first_created_at": user_notifications[0]["created_at"],
+                    "last_created_at": user_notifications[-1]["created_at"],
+                    "payload": gzip.compress(json.dumps(user_notifications, default=str).encode()),
+                    "archived_at": now
+                })
+            try:
+                await self.db.notifications_archive.insert_many(bundles, ordered=False)
+            except BulkWriteError as e:
+                # Bundles from an interrupted earlier run
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+            
+            await self.db.notifications.delete_many({"id": {"$in": [n["id"] for n in notifications]}})
+            archived += len(notifications)
+        
+        if archived:
+            logger.info(f"Archived {archived} notifications")
+        return archived
+
+    async def get_counters(self, user_id: str) -> dict:
+        """Unread badge counts from the user's counter document"""
+        counter = await self.db.notification_counters.find_one({"id": user_id})
+        if counter is None:
+            await self.reconcile_counters([user_id])
+            counter = await self.db.notification_counters.find_one({"id": user_id})
+        return counter
+
+    def start_delivery_workers(self, count: int = OUTBOX_WORKERS):
+        """Start background workers that drain the delivery outbox"""
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._delivery_worker(f"{uuid.uuid4()}")) for _ in range(count)]
+
+    async def stop_delivery_workers(self):
+        """Stop the workers; notifications they had claimed are retried once their lease expires"""
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _delivery_worker(self, worker_id: str):
+        while True:
+            try:
+                notification = await self._claim_next(worker_id)
+                if notification is None:
+                    self._outbox_wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._outbox_wakeup.wait(), OUTBOX_POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._deliver_notification(notification, worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification delivery worker error: {str(e)}")
+                await asyncio.sleep(OUTBOX_POLL_SECONDS)
+
+    async def _claim_next(self, worker_id: str) -> Optional[dict]:
+        """Lease the next due notification, including ones abandoned by a crashed worker"""
+        now = datetime.utcnow()
+        return await self.db.notifications.find_one_and_update(
+            {"$or": [
+                {"delivery_state": {"$in": [DeliveryState.PENDING, DeliveryState.RETRY]}, "next_attempt_at": {"$lte": now}},
+                {"delivery_state": DeliveryState.DELIVERING, "lease_until": {"$lt": now}}
+            ]},
+            {
+                "$set": {
+                    "delivery_state": DeliveryState.DELIVERING,
+                    "lease_until": now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+                    "leased_by": worker_id
+                },
+                "$inc": {"delivery_attempts": 1}
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _deliver_notification(self, notification: dict, worker_id: str):
+        """Deliver a claimed notification on all pending channels at once, then record the outcome"""
+        delivery_status = dict(notification.get("delivery_status") or {})
         
-        # Get user details
         user = await self.db.users.find_one({"id": notification["user_id"]})
         if not user:
             logger.error(f"User not found for notification {notification['id']}")
+            await self._finish_delivery(notification, worker_id, delivery_status, DeliveryState.FAILED)
             return
         
-        # Deliver through each channel
-        for channel in notification["channels"]:
-            try:
-                if channel == NotificationChannel.EMAIL and user.get("email"):
-                    success = await self._send_email(user, notification)
-                    delivery_status[channel] = {"success": success, "delivered_at": datetime.utcnow()}
-                
-                elif channel == NotificationChannel.SMS and user.get("phone"):
-                    success = await self._send_sms(user, notification)
-                    delivery_status[channel] = {"success": success, "delivered_at": datetime.utcnow()}
-                
-                elif channel == NotificationChannel.PUSH:
-                    success = await self._send_push_notification(user, notification)
-                    delivery_status[channel] = {"success": success, "delivered_at": datetime.utcnow()}
-                
-                elif channel == NotificationChannel.IN_APP:
-                    # In-app notifications are stored in database (already done)
-                    delivery_status[channel] = {"success": True, "delivered_at": datetime.utcnow()}
-                
-            except Exception as e:
-                logger.error(f"Failed to deliver notification via {channel}: {str(e)}")
-                delivery_status[channel] = {"success": False, "error": str(e)}
+        # Channels that already succeeded (or can't apply to this user) are not sent again
+        pending_channels = [
+            channel for channel in notification["channels"]
+            if not delivery_status.get(channel, {}).get("success") and not delivery_status.get(channel, {}).get("skipped")
+        ]
+        results = await asyncio.gather(*[
+            self._deliver_channel(channel, user, notification) for channel in pending_channels
+        ])
+        delivery_status.update(zip(pending_channels, results))
         
-        # Update notification with delivery status
-        await self.db.enhanced_notifications.update_one(
-            {"id": notification["id"]},
-            {
-                "$set": {
-                    "is_delivered": any(status.get("success", False) for status in delivery_status.values()),
-                    "delivery_status": delivery_status,
-                    "updated_at": datetime.utcnow()
-                }
-            }
+        if all(status.get("success") or status.get("skipped") for status in delivery_status.values()):
+            state = DeliveryState.DELIVERED
+        elif notification["delivery_attempts"] >= OUTBOX_MAX_ATTEMPTS:
+            state = DeliveryState.FAILED
+        else:
+            state = DeliveryState.RETRY
+        await self._finish_delivery(notification, worker_id, delivery_status, state)
+
+    async def _deliver_channel(self, channel: str, user: dict, notification: dict) -> dict:
+        try:
+            if channel == NotificationChannel.EMAIL and not user.get("email"):
+                return {"success": False, "skipped": "no_email"}
+            if channel == NotificationChannel.SMS and not user.get("phone"):
+                return {"success": False, "skipped": "no_phone"}
+            
+            if channel == NotificationChannel.EMAIL:
+                success = await self._send_email(user, notification)
+            elif channel == NotificationChannel.SMS:
+                success = await self._send_sms(user, notification)
+            elif channel == NotificationChannel.PUSH:
+                success = await self._send_push_notification(user, notification)
+            else:
+                success = True  # In-app notifications are stored in database (already done)
+            return {"success": success, "delivered_at": datetime.utcnow()}
+        except Exception as e:
+            logger.error(f"Failed to deliver notification via {channel}: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+    async def _finish_delivery(self, notification: dict, worker_id: str, delivery_status: dict, state: DeliveryState):
+        now = datetime.utcnow()
+        update = {
+            "is_delivered": any(status.get("success", False) for status in delivery_status.values()),
+            "delivery_status": delivery_status,
+            "delivery_state": state,
+            "lease_until": None,
+            "updated_at": now
+        }
+        if state == DeliveryState.RETRY:
+            # Exponential backoff with jitter so failing providers aren't hammered in lockstep
+            delay = min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (notification["delivery_attempts"] - 1))
+            update["next_attempt_at"] = now + timedelta(seconds=delay * random.uniform(0.5, 1.0))
+        
+        # Only the current lease holder may record the outcome
+        await self.db.notifications.update_one(
+            {"id": notification["id"], "leased_by": worker_id},
+            {"$set": update}
         )
 
     async def _send_email(self, user: dict, notification: dict) -> bool:
         """Send email notification"""
-        if not self.smtp_username or not self.smtp_password:
+        if not self.smtp_pool:
             logger.warning("SMTP credentials not configured")
             return False
         
@@ -138,13 +831,8 @@ class EnhancedNotificationService:
             html_body = self._create_email_template(user, notification)
             msg.attach(MIMEText(html_body, 'html'))
             
-            # Connect and send email
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.smtp_username, self.smtp_password)
-            text = msg.as_string()
-            server.sendmail(self.from_email, user["email"], text)
-            server.quit()
+            # Send over a pooled connection
+            await self.smtp_pool.send(self.from_email, [user["email"]], msg.as_string())
             
             logger.info(f"Email sent successfully to {user['email']}")
             return True
@@ -155,14 +843,7 @@ class EnhancedNotificationService:
 
     def _create_email_template(self, user: dict, notification: dict) -> str:
         """Create HTML email template"""
-        priority_colors = {
-            "low": "#28a745",
-            "medium": "#ffc107", 
-            "high": "#fd7e14",
-            "urgent": "#dc3545"
-        }
-        
-        priority_color = priority_colors.get(notification["priority"], "#007bff")
+        priority_color = PRIORITY_COLORS.get(notification["priority"], "#007bff")
         
         template = f"""
         <!DOCTYPE html>
@@ -216,6 +897,162 @@ class EnhancedNotificationService:
         """
         return template
 
+    def _create_digest_message(self, user: dict, notifications: List[dict]) -> str:
+        """Render one digest email for a user's pending notifications"""
+        shown = notifications[-EMAIL_DIGEST_MAX_ITEMS:]
+        items = "\n            ".join(
+            DIGEST_ITEM_TEMPLATE.substitute(
+                color=PRIORITY_COLORS.get(notification["priority"], "#007bff"),
+                title=html.escape(notification["title"]),
+                message=html.escape(notification["message"]),
+                created_at=notification["created_at"].strftime("%d/%m/%Y %H:%M")
+            )
+            for notification in reversed(shown)
+        )
+        hidden = len(notifications) - len(shown)
+        subject = f"🚗 {len(notifications)} update{'s' if len(notifications) != 1 else ''} - Driving School Platform"
+        
+        msg = MIMEMultipart()
+        msg['From'] = self.from_email
+        msg['To'] = user["email"]
+        msg['Subject'] = subject
+        msg.attach(MIMEText(DIGEST_EMAIL_TEMPLATE.substitute(
+            subject=html.escape(subject),
+            summary=f"You have {len(notifications)} new update{'s' if len(notifications) != 1 else ''}",
+            first_name=html.escape(user.get("first_name", "")),
+            items=items,
+            more=f"<p style='color: #666;'>…and {hidden} more in your dashboard.</p>" if hidden else "",
+            dashboard_url=os.environ.get('FRONTEND_URL', 'http://localhost:3000') + "/dashboard"
+        ), 'html'))
+        return msg.as_string()
+
+    async def send_email_digests(self) -> int:
+        """Send one email per user whose oldest pending digest item has waited a full window"""
+        now = datetime.utcnow()
+        due = await self.db.notifications.aggregate([
+            {"$match": {"email_digest_pending": True}},
+            {"$group": {"_id": "$user_id", "oldest": {"$min": "$created_at"}}},
+            {"$match": {"oldest": {"$lte": now - timedelta(minutes=EMAIL_DIGEST_WINDOW_MINUTES)}}}
+        ]).to_list(length=None)
+        user_ids = [group["_id"] for group in due]
+        
+        sent = 0
+        claim_id = f"digest-{uuid.uuid4()}"
+        for start in range(0, len(user_ids), EMAIL_DIGEST_USER_BATCH):
+            batch_ids = user_ids[start:start + EMAIL_DIGEST_USER_BATCH]
+            # Claim the rows first so concurrent workers never send the same items twice
+            claimed_at = datetime.utcnow()
+            await self.db.notifications.update_many(
+                {
+                    "email_digest_pending": True,
+                    "user_id": {"$in": batch_ids},
+                    "$or": [
+                        {"digest_claimed_by": None},
+                        {"digest_lease_until": {"$lt": claimed_at}}
+                    ]
+                },
+                {"$set": {
+                    "digest_claimed_by": claim_id,
+                    "digest_lease_until": claimed_at + timedelta(seconds=EMAIL_DIGEST_LEASE_SECONDS)
+                }}
+            )
+            users = {
+                user["id"]: user
+                async for user in self.db.users.find(
+                    {"id": {"$in": batch_ids}},
+                    {"id": 1, "email": 1, "first_name": 1}
+                )
+            }
+            pending = {}
+            async for notification in self.db.notifications.find(
+                {"email_digest_pending": True, "user_id": {"$in": batch_ids}, "digest_claimed_by": claim_id},
+                {"id": 1, "user_id": 1, "title": 1, "message": 1, "priority": 1, "created_at": 1}
+            ).sort("created_at", 1):
+                pending.setdefault(notification["user_id"], []).append(notification)
+            
+            recipients = []
+            outcomes = {}
+            for user_id, notifications in pending.items():
+                user = users.get(user_id)
+                if not user or not user.get("email"):
+                    outcomes[user_id] = {"success": False, "skipped": "no_email"}
+                elif not self.smtp_pool:
+                    outcomes[user_id] = {"success": False, "error": "SMTP credentials not configured"}
+                else:
+                    recipients.append(user_id)
+            
+            # One session per chunk, chunks sent in parallel over the pool
+            messages = [
+                (self.from_email, [users[user_id]["email"]], self._create_digest_message(users[user_id], pending[user_id]))
+                for user_id in recipients
+            ]
+            chunks = [
+                messages[i:i + SMTP_MAX_MESSAGES_PER_CONNECTION]
+                for i in range(0, len(messages), SMTP_MAX_MESSAGES_PER_CONNECTION)
+            ]
+            try:
+                results = [
+                    result
+                    for chunk_results in await asyncio.gather(*[self.smtp_pool.send_many(chunk) for chunk in chunks])
+                    for result in chunk_results
+                ]
+            except Exception as e:
+                logger.error(f"Email digest send error: {str(e)}")
+                results = [False] * len(recipients)
+            delivered_at = datetime.utcnow()
+            for user_id, success in zip(recipients, results):
+                if success:
+                    outcomes[user_id] = {"success": True, "delivered_at": delivered_at, "digest": True}
+                    sent += 1
+            
+            claim_fields = {"digest_claimed_by": "", "digest_lease_until": ""}
+            updates = [
+                UpdateMany(
+                    {"id": {"$in": [notification["id"] for notification in pending[user_id]]}, "digest_claimed_by": claim_id},
+                    {
+                        "$set": {"delivery_status.email": outcome, "updated_at": delivered_at},
+                        "$unset": {"email_digest_pending": "", **claim_fields}
+                    }
+                )
+                for user_id, outcome in outcomes.items()
+            ]
+            # Failed sends are released and stay pending for the next run
+            failed_ids = [
+                notification["id"]
+                for user_id, notifications in pending.items() if user_id not in outcomes
+                for notification in notifications
+            ]
+            if failed_ids:
+                updates.append(UpdateMany(
+                    {"id": {"$in": failed_ids}, "digest_claimed_by": claim_id},
+                    {"$unset": claim_fields}
+                ))
+            if updates:
+                await self.db.notifications.bulk_write(updates, ordered=False)
+        
+        if sent:
+            logger.info(f"Sent {sent} email digests")
+        return sent
+
+    def start_email_digests(self):
+        """Start the periodic email digest job"""
+        if EMAIL_DIGEST_ENABLED and self._digest_task is None:
+            self._digest_task = asyncio.create_task(self._digest_loop())
+
+    async def stop_email_digests(self):
+        digest_task, self._digest_task = self._digest_task, None
+        if digest_task:
+            digest_task.cancel()
+            await asyncio.gather(digest_task, return_exceptions=True)
+
+    async def _digest_loop(self):
+        while True:
+            await asyncio.sleep(EMAIL_DIGEST_CHECK_SECONDS)
+            try:
+                await self.send_email_digests()
+            except Exception as e:
+                logger.error(f"Email digest error: {str(e)}")
+
     def _format_metadata_for_email(self, metadata: dict) -> str:
         """Format metadata for email display"""
         if not metadata:
@@ -233,77 +1070,107 @@ class EnhancedNotificationService:
         return html
 
     async def _send_sms(self, user: dict, notification: dict) -> bool:
-        """Send SMS notification (placeholder for SMS service integration)"""
-        # This would integrate with SMS service like Twilio, Vonage, or local SMS provider
-        logger.info(f"SMS would be sent to {user.get('phone', 'N/A')}: {notification['title']}")
-        return True  # Simulated success
+        """Queue an SMS with the provider adapter; concurrent sends share one batched request"""
+        return await self.sms_provider.send({
+            "to": user["phone"],
+            "text": f"{notification['title']}: {notification['message']}"
+        })
 
     async def _send_push_notification(self, user: dict, notification: dict) -> bool:
-        """Send push notification (placeholder for push service integration)"""
-        # This would integrate with Firebase Cloud Messaging or similar
-        logger.info(f"Push notification would be sent to user {user['id']}: {notification['title']}")
-        return True  # Simulated success
+        """Send a push message to each of the user's registered devices"""
+        message = {
+            "user_id": user["id"],
+            "title": notification["title"],
+            "body": notification["message"],
+            "data": {"notification_id": notification["id"], "type": notification["type"]}
+        }
+        tokens = user.get("push_tokens") or []
+        if not tokens:
+            return await self.push_provider.send(message)
+        results = await self.push_provider.send_batch([{**message, "token": token} for token in tokens])
+        return any(results)
 
-    async def schedule_reminders(self):
-        """Schedule automatic reminders for various events"""
+    async def schedule_reminders(self) -> dict:
+        """Create session and payment reminders in bulk; returns how many of each were created"""
         now = datetime.utcnow()
         
         # Session reminders (24 hours before)
         tomorrow = now + timedelta(days=1)
-        sessions_cursor = self.db.sessions.find({
-            "scheduled_at": {
-                "$gte": tomorrow.replace(hour=0, minute=0, second=0),
-                "$lt": tomorrow.replace(hour=23, minute=59, second=59)
+        sessions = await self.db.sessions.find(
+            {
+                "scheduled_at": {
+                    "$gte": tomorrow.replace(hour=0, minute=0, second=0),
+                    "$lt": tomorrow.replace(hour=23, minute=59, second=59)
+                },
+                "status": "scheduled"
             },
-            "status": "scheduled"
-        })
+            {"id": 1, "student_id": 1, "session_type": 1, "scheduled_at": 1}
+        ).to_list(length=None)
         
-        async for session in sessions_cursor:
-            # Check if reminder already sent
-            existing_reminder = await self.db.enhanced_notifications.find_one({
-                "user_id": session["student_id"],
-                "type": "session_reminder",
-                "metadata.session_id": session["id"]
-            })
-            
-            if not existing_reminder:
-                await self.create_notification(
-                    user_id=session["student_id"],
-                    notification_type="session_reminder",
-                    title="Session Reminder",
-                    message=f"You have a {session['session_type']} session scheduled for tomorrow at {session['scheduled_at'].strftime('%H:%M')}",
-                    priority=NotificationPriority.HIGH,
-                    channels=[NotificationChannel.EMAIL, NotificationChannel.IN_APP],
-                    metadata={"session_id": session["id"], "session_type": session["session_type"]}
-                )
+        # One anti-join query instead of a lookup per session
+        already_reminded = set(await self.db.notifications.distinct(
+            "metadata.session_id",
+            {"type": "session_reminder", "metadata.session_id": {"$in": [session["id"] for session in sessions]}}
+        )) if sessions else set()
+        
+        session_reminders = [
+            self._build_notification(
+                user_id=session["student_id"],
+                notification_type="session_reminder",
+                title="Session Reminder",
+                message=f"You have a {session['session_type']} session scheduled for tomorrow at {session['scheduled_at'].strftime('%H:%M')}",
+                priority=NotificationPriority.HIGH,
+                channels=[NotificationChannel.EMAIL, NotificationChannel.IN_APP],
+                metadata={"session_id": session["id"], "session_type": session["session_type"]},
+                idempotency_key=f"session_reminder:{session['id']}"
+            )
+            for session in sessions if session["id"] not in already_reminded
+        ]
         
         # Payment reminders (for pending payments older than 3 days)
         three_days_ago = now - timedelta(days=3)
-        enrollments_cursor = self.db.enrollments.find({
-            "payment_status": "pending",
-            "created_at": {"$lt": three_days_ago}
-        })
+        enrollments = await self.db.enrollments.find(
+            {"payment_status": "pending", "created_at": {"$lt": three_days_ago}},
+            {"id": 1, "student_id": 1, "driving_school_id": 1, "amount": 1}
+        ).to_list(length=None)
         
-        async for enrollment in enrollments_cursor:
-            # Check if reminder already sent in last 24 hours
-            recent_reminder = await self.db.enhanced_notifications.find_one({
-                "user_id": enrollment["student_id"],
+        # Skip enrollments reminded in the last 24 hours
+        recently_reminded = set(await self.db.notifications.distinct(
+            "metadata.enrollment_id",
+            {
                 "type": "payment_reminder",
-                "metadata.enrollment_id": enrollment["id"],
+                "metadata.enrollment_id": {"$in": [enrollment["id"] for enrollment in enrollments]},
                 "created_at": {"$gte": now - timedelta(hours=24)}
-            })
-            
-            if not recent_reminder:
-                school = await self.db.driving_schools.find_one({"id": enrollment["driving_school_id"]})
-                await self.create_notification(
-                    user_id=enrollment["student_id"],
-                    notification_type="payment_reminder",
-                    title="Payment Reminder",
-                    message=f"Your enrollment payment for {school['name'] if school else 'driving school'} is still pending. Please complete your payment to continue.",
-                    priority=NotificationPriority.MEDIUM,
-                    channels=[NotificationChannel.EMAIL, NotificationChannel.IN_APP],
-                    metadata={"enrollment_id": enrollment["id"], "amount": enrollment["amount"]}
-                )
+            }
+        )) if enrollments else set()
+        enrollments = [enrollment for enrollment in enrollments if enrollment["id"] not in recently_reminded]
+        
+        schools = {
+            school["id"]: school["name"]
+            async for school in self.db.driving_schools.find(
+                {"id": {"$in": list({enrollment["driving_school_id"] for enrollment in enrollments})}},
+                {"id": 1, "name": 1}
+            )
+        } if enrollments else {}
+        
+        payment_reminders = [
+            self._build_notification(
+                user_id=enrollment["student_id"],
+                notification_type="payment_reminder",
+                title="Payment Reminder",
+                message=f"Your enrollment payment for {schools.get(enrollment['driving_school_id'], 'driving school')} is still pending. Please complete your payment to continue.",
+                priority=NotificationPriority.MEDIUM,
+                channels=[NotificationChannel.EMAIL, NotificationChannel.IN_APP],
+                metadata={"enrollment_id": enrollment["id"], "amount": enrollment["amount"]},
+                idempotency_key=f"payment_reminder:{enrollment['id']}:{now.date().isoformat()}"
+            )
+            for enrollment in enrollments
+        ]
+        
+        return {
+            "session_reminders": await self._insert_notifications(session_reminders),
+            "payment_reminders": await self._insert_notifications(payment_reminders)
+        }
 
     async def get_user_notifications(
         self,
@@ -329,17 +1196,11 @@ class EnhancedNotificationService:
             {"expires_at": {"$gte": now}}
         ]
         
-        notifications_cursor = self.db.enhanced_notifications.find(query).sort("created_at", -1).skip(skip).limit(limit)
+        notifications_cursor = self.db.notifications.find(query).sort("created_at", -1).skip(skip).limit(limit)
         notifications = await notifications_cursor.to_list(length=limit)
         
-        total_unread = await self.db.enhanced_notifications.count_documents({
-            "user_id": user_id,
-            "is_read": False,
-            "$or": [
-                {"expires_at": None},
-                {"expires_at": {"$gte": now}}
-            ]
-        })
+        counter = await self.get_counters(user_id)
+        total_unread = max(0, counter.get("unread", 0))
         
         return {
             "notifications": self._serialize_notifications(notifications),
@@ -365,66 +1226,55 @@ class EnhancedNotificationService:
 
     async def mark_as_read(self, notification_id: str, user_id: str) -> bool:
         """Mark notification as read"""
-        result = await self.db.enhanced_notifications.update_one(
-            {"id": notification_id, "user_id": user_id},
-            {"$set": {"is_read": True, "read_at": datetime.utcnow()}}
+        notification = await self.db.notifications.find_one_and_update(
+            {"id": notification_id, "user_id": user_id, "is_read": False},
+            {"$set": {"is_read": True, "read_at": datetime.utcnow()}},
+            projection={"user_id": 1, "priority": 1, "is_read": 1}
         )
-        return result.modified_count > 0
+        if notification is None:
+            return False
+        await self._decrement_counters(notification)
+        return True
 
     async def mark_all_as_read(self, user_id: str) -> int:
         """Mark all notifications as read for a user"""
-        result = await self.db.enhanced_notifications.update_many(
+        result = await self.db.notifications.update_many(
             {"user_id": user_id, "is_read": False},
             {"$set": {"is_read": True, "read_at": datetime.utcnow()}}
         )
+        await self.db.notification_counters.update_one(
+            {"id": user_id},
+            {"$set": {
+                "unread": 0,
+                "unread_by_priority": self._empty_counter()["unread_by_priority"],
+                "updated_at": datetime.utcnow()
+            }}
+        )
         return result.modified_count
 
     async def delete_notification(self, notification_id: str, user_id: str) -> bool:
         """Delete a notification"""
-        result = await self.db.enhanced_notifications.delete_one({
-            "id": notification_id,
-            "user_id": user_id
-        })
-        return result.deleted_count > 0
+        notification = await self.db.notifications.find_one_and_delete(
+            {"id": notification_id, "user_id": user_id},
+            projection={"user_id": 1, "priority": 1, "is_read": 1}
+        )
+        if notification is None:
+            return False
+        await self._decrement_counters(notification, total=-1)
+        return True
 
     async def get_notification_stats(self, user_id: str) -> dict:
         """Get notification statistics for a user"""
-        now = datetime.utcnow()
-        
-        total_notifications = await self.db.enhanced_notifications.count_documents({
-            "user_id": user_id,
-            "$or": [
-                {"expires_at": None},
-                {"expires_at": {"$gte": now}}
-            ]
-        })
-        
-        unread_notifications = await self.db.enhanced_notifications.count_documents({
-            "user_id": user_id,
-            "is_read": False,
-            "$or": [
-                {"expires_at": None},
-                {"expires_at": {"$gte": now}}
-            ]
-        })
-        
-        # Count by priority
-        priority_counts = {}
-        for priority in NotificationPriority:
-            count = await self.db.enhanced_notifications.count_documents({
-                "user_id": user_id,
-                "priority": priority,
-                "is_read": False,
-                "$or": [
-                    {"expires_at": None},
-                    {"expires_at": {"$gte": now}}
-                ]
-            })
-            priority_counts[priority] = count
+        counter = await self.get_counters(user_id)
+        total_notifications = max(0, counter.get("total", 0))
+        unread_notifications = max(0, counter.get("unread", 0))
         
         return {
             "total_notifications": total_notifications,
             "unread_notifications": unread_notifications,
-            "unread_by_priority": priority_counts,
+            "unread_by_priority": {
+                priority: max(0, counter.get("unread_by_priority", {}).get(priority.value, 0))
+                for priority in NotificationPriority
+            },
             "read_percentage": round((total_notifications - unread_notifications) / total_notifications * 100, 1) if total_notifications > 0 else 0
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,275 @@
+# SMS and push provider adapters for the notification service
+import os
+import time
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Optional, List, Dict
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_TIMEOUT_SECONDS = 10
+PROVIDER_BATCH_WINDOW_SECONDS = 0.05  # Messages queued within this window share one request
+CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive failed requests before the circuit opens
+CIRCUIT_RESET_SECONDS = 30  # How long an open circuit rejects sends before a trial request
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider is failing or its circuit is open"""
+
+class TokenBucket:
+    """Async token bucket allowing `rate` messages per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1):
+        async with self._lock:
+            remaining = tokens
+            while remaining > 0:
+                # Batches larger than the bucket are paid for in bucket-sized installments
+                needed = min(remaining, self.capacity)
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= needed:
+                    self.tokens -= needed
+                    remaining -= needed
+                else:
+                    await asyncio.sleep((needed - self.tokens) / self.rate)
+
+class CircuitBreaker:
+    """Stops sending to a provider after repeated failures, then lets a single trial request through.
+
+    Every allow() that returns True must be followed by record_success(),
+    record_failure() or release().
+    """
+
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    def is_open(self) -> bool:
+        """Whether sends are currently rejected, without claiming the trial"""
+        if self.opened_at is None:
+            return False
+        return self.trial_in_flight or time.monotonic() - self.opened_at < self.reset_seconds
+
+    def allow(self) -> bool:
+        """Permit one request; after the cooldown only the first caller gets the trial"""
+        if self.opened_at is None:
+            return True
+        if self.is_open():
+            return False
+        self.trial_in_flight = True
+        return True
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"{self.name} provider recovered, circuit closed")
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_in_flight or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"{self.name} provider failing, circuit open for {self.reset_seconds}s")
+            self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+
+    def release(self):
+        """Give back a trial whose request never reached the provider"""
+        self.trial_in_flight = False
+
+class HTTPProviderAdapter(ABC):
+    """Batching, throttled client for a JSON-over-HTTP messaging provider.
+
+    Messages sent within a short window are grouped into one request of up to
+    batch_size messages. Requests go over a pooled requests.Session in worker
+    threads, paced by a token bucket and guarded by a circuit breaker. Subclasses
+    shape the request body.
+    """
+
+    name = "provider"
+
+    def __init__(self, url: str, api_key: str, rate_per_second: float, batch_size: int, pool_size: int):
+        self.url = url
+        self.batch_size = batch_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"})
+        self.bucket = TokenBucket(rate_per_second)
+        self.breaker = CircuitBreaker(self.name)
+        self._in_flight = asyncio.Semaphore(pool_size)
+        self._queue: List[tuple] = []  # (message, future)
+        self._flush_task: Optional[asyncio.Task] = None
+        self._sending = set()
+
+    async def send(self, message: Dict) -> bool:
+        """Queue one message for the next batch; returns whether the provider accepted it"""
+        if self.breaker.is_open():
+            raise ProviderUnavailable(f"{self.name} circuit is open")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((message, future))
+        if len(self._queue) >= self.batch_size:
+            self._start_batch()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def send_batch(self, messages: List[Dict]) -> List[bool]:
+        """Send many messages; they are split into provider-sized batches"""
+        results = await asyncio.gather(*[self.send(message) for message in messages], return_exceptions=True)
+        return [result is True for result in results]
+
+    def close(self):
+        self.session.close()
+
+    @abstractmethod
+    def build_payload(self, messages: List[Dict]) -> Dict:
+        """Request body for one batch of messages"""
+
+    def parse_results(self, response: requests.Response, count: int) -> List[bool]:
+        """Per-message outcomes from {"results": [{"success": bool}, ...]}; a 2xx without them accepts all"""
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        results = body.get("results") if isinstance(body, dict) else None
+        if not isinstance(results, list) or len(results) != count:
+            return [True] * count
+        return [bool(result.get("success", True)) if isinstance(result, dict) else bool(result) for result in results]
+
+    def _start_batch(self):
+        batch, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+        task = asyncio.create_task(self._send_batch(batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _flush_later(self):
+        await asyncio.sleep(PROVIDER_BATCH_WINDOW_SECONDS)
+        self._flush_task = None
+        while self._queue:
+            self._start_batch()
+
+    async def _send_batch(self, batch: List[tuple]):
+        messages = [message for message, _ in batch]
+        try:
+            payload = self.build_payload(messages)
+            await self.bucket.acquire(len(messages))
+            async with self._in_flight:
+                if not self.breaker.allow():
+                    raise ProviderUnavailable(f"{self.name} circuit is open")
+                try:
+                    response = await asyncio.to_thread(
+                        self.session.post, self.url, json=payload, timeout=PROVIDER_TIMEOUT_SECONDS
+                    )
+                except requests.RequestException as e:
+                    self.breaker.record_failure()
+                    raise ProviderUnavailable(f"{self.name} request failed: {str(e)}")
+                except BaseException:
+                    self.breaker.release()
+                    raise
+
+            if response.status_code == 429 or response.status_code >= 500:
+                self.breaker.record_failure()
+                raise ProviderUnavailable(f"{self.name} returned {response.status_code}")
+            self.breaker.record_success()
+            if response.status_code >= 400:
+                logger.error(f"{self.name} rejected batch of {len(messages)}: {response.status_code} {response.text[:200]}")
+                results = [False] * len(messages)
+            else:
+                results = self.parse_results(response, len(messages))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+class SMSProvider(HTTPProviderAdapter):
+    name = "sms"
+
+    def __init__(self, url: str, api_key: str, sender_id: str, **kwargs):
+        super().__init__(url, api_key, **kwargs)
+        self.sender_id = sender_id
+
+    def build_payload(self, messages: List[Dict]) -> Dict:
+        return {"from": self.sender_id, "messages": [{"to": m["to"], "text": m["text"]} for m in messages]}
+
+class PushProvider(HTTPProviderAdapter):
+    name = "push"
+
+    def build_payload(self, messages: List[Dict]) -> Dict:
+        return {"notifications": messages}
+
+class LoggingProvider:
+    """Used when a provider isn't configured: logs the message and reports success"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    async def send(self, message: Dict) -> bool:
+        logger.info(f"{self.name} would be sent: {message}")
+        return True
+
+    async def send_batch(self, messages: List[Dict]) -> List[bool]:
+        return [await self.send(message) for message in messages]
+
+    def close(self):
+        pass
+
+# One adapter per provider per process, so rate limits and circuits are shared
+_providers: Dict[str, object] = {}
+
+def get_sms_provider():
+    if "sms" not in _providers:
+        url = os.environ.get('SMS_PROVIDER_URL')
+        if url:
+            _providers["sms"] = SMSProvider(
+                url,
+                os.environ.get('SMS_PROVIDER_API_KEY', ''),
+                sender_id=os.environ.get('SMS_SENDER_ID', 'DrivingSchool'),
+                rate_per_second=float(os.environ.get('SMS_RATE_PER_SECOND', '10')),
+                batch_size=int(os.environ.get('SMS_BATCH_SIZE', '100')),
+                pool_size=int(os.environ.get('SMS_POOL_SIZE', '4'))
+            )
+        else:
+            _providers["sms"] = LoggingProvider("SMS")
+    return _providers["sms"]
+
+def get_push_provider():
+    if "push" not in _providers:
+        url = os.environ.get('PUSH_PROVIDER_URL')
+        if url:
+            _providers["push"] = PushProvider(
+                url,
+                os.environ.get('PUSH_PROVIDER_API_KEY', ''),
+                rate_per_second=float(os.environ.get('PUSH_RATE_PER_SECOND', '100')),
+                batch_size=int(os.environ.get('PUSH_BATCH_SIZE', '500')),
+                pool_size=int(os.environ.get('PUSH_POOL_SIZE', '4'))
+            )
+        else:
+            _providers["push"] = LoggingProvider("Push notification")
+    return _providers["push"]
+
+def close_providers():
+    for provider in _providers.values():
+        provider.close()
+    _providers.clear()
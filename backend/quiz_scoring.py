@@ -0,0 +1,16 @@
+# Quiz answer keys shared by the API and the offline stats rebuild (rebuild_quiz_item_stats.py)
+
+def question_answer_key(question: dict):
+    """The answer that scores a question: correct_answer, else the id of the option flagged is_correct"""
+    if question.get("correct_answer") is not None:
+        return question["correct_answer"]
+    for option in question.get("options") or []:
+        if isinstance(option, dict) and option.get("is_correct"):
+            return option.get("id", option.get("text"))
+    return None
+
+def item_choice_key(answer) -> str:
+    """Field-name-safe key for a chosen answer in choice_counts"""
+    if answer is None:
+        return "_blank"
+    return str(answer).replace(".", "_").replace("$", "_")
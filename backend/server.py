@@ -1,18 +1,28 @@
 import os
 import uuid
+import time
+import asyncio
+import bisect
+import gzip
+import hmac
+import hashlib
 import logging
 import smtplib
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional, Dict
+from collections import Counter, OrderedDict
 from pathlib import Path
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from fastapi import FastAPI, HTTPException, status, Depends, UploadFile, File, Form, APIRouter, Request
+from fastapi import FastAPI, HTTPException, status, Depends, UploadFile, File, Form, APIRouter, Request, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, EmailStr
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from passlib.context import CryptContext
 import jwt
 from enum import Enum
@@ -28,6 +38,8 @@ import base64
 import sys
 import os
 sys.path.append(os.path.dirname(__file__))
+from enhanced_notifications import EnhancedNotificationService, notification_broker
+from quiz_scoring import question_answer_key, item_choice_key
 
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
@@ -77,6 +89,7 @@ app.add_middleware(
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
 client = AsyncIOMotorClient(MONGO_URL)
 db = client.driving_school_platform
+notification_service = EnhancedNotificationService(client)
 
 # Security setup
 security = HTTPBearer()
@@ -272,6 +285,10 @@ class Enrollment(BaseModel):
 class EnrollmentCreate(BaseModel):
     school_id: str
 
+class BulkEnrollmentAction(BaseModel):
+    enrollment_ids: List[str]
+    reason: Optional[str] = None  # Required when rejecting
+
 class Course(BaseModel):
     id: str
     enrollment_id: str
@@ -331,6 +348,20 @@ class QuizAttempt(BaseModel):
     completed_at: Optional[datetime] = None
     time_taken_minutes: Optional[int] = None
 
+class QuizAttemptSubmission(BaseModel):
+    client_attempt_id: str  # Generated on the device, makes resubmission idempotent
+    quiz_id: str
+    answers: dict
+    started_at: Optional[str] = None  # ISO strings recorded offline
+    completed_at: Optional[str] = None
+
+class QuizAttemptBatch(BaseModel):
+    attempts: List[QuizAttemptSubmission]
+
+class AdaptiveQuizRequest(BaseModel):
+    course_type: CourseType
+    question_count: int = 20
+
 class VideoRoom(BaseModel):
     id: str
     course_id: str
@@ -371,6 +402,16 @@ class SessionCreate(BaseModel):
     duration_minutes: int = 60
     location: Optional[str] = None
 
+class AutoScheduleRequest(BaseModel):
+    start_date: str  # ISO date of the first day sessions may be placed on
+    duration_minutes: int = 60
+    earliest_hour: int = 8
+    latest_hour: int = 18  # Sessions must end by this hour
+    weekdays: List[int] = [6, 0, 1, 2, 3]  # Python weekdays (Monday=0), default Sunday to Thursday
+    min_spacing_hours: int = 24
+    horizon_days: int = 120
+    location: Optional[str] = None
+
 class ExternalExpert(BaseModel):
     id: str
     user_id: str
@@ -479,6 +520,87 @@ ALGERIAN_STATES = [
 # Course sequence order
 COURSE_SEQUENCE = [CourseType.THEORY, CourseType.PARK, CourseType.ROAD]
 
+# Session calendar settings
+CALENDAR_SLOT_MINUTES = 15  # Granularity of teacher/student time reservations
+MAX_SESSION_DURATION_MINUTES = 240
+ACTIVE_SESSION_STATUSES = [SessionStatus.SCHEDULED, SessionStatus.IN_PROGRESS]
+SESSION_DAY_START_HOUR = 8
+SESSION_DAY_END_HOUR = 18
+SESSION_WEEKDAYS = [6, 0, 1, 2, 3]  # Sunday to Thursday
+
+SESSION_PAGE_DEFAULT_LIMIT = 50
+SESSION_PAGE_MAX_LIMIT = 200
+
+# Free-slot search settings
+SLOT_SEARCH_STEP_MINUTES = 30
+SLOT_SEARCH_MAX_DAYS = 31
+SLOT_SEARCH_MAX_SLOTS = 500  # Upper bound of slots computed per school window
+SLOT_SEARCH_CACHE_TTL_SECONDS = 15
+
+# Course auto-scheduling limits
+AUTO_SCHEDULE_MAX_HORIZON_DAYS = 365
+AUTO_SCHEDULE_MAX_SPACING_HOURS = 24 * 14
+
+# External expert settings
+MAX_EXAMS_PER_EXPERT_PER_DAY = 6
+EXAM_DURATION_MINUTES = 90
+EXAM_BATCH_CAPACITY = {CourseType.THEORY: 20, CourseType.PARK: 8, CourseType.ROAD: 4}
+# Shared session length as (fixed minutes, minutes per candidate); one candidate takes EXAM_DURATION_MINUTES
+EXAM_SESSION_MINUTES = {
+    CourseType.THEORY: (85, 5),  # One sitting for the whole group; per candidate only ID check and marking
+    CourseType.PARK: (50, 40),  # Maneuvers are examined one candidate at a time, setup is shared
+    CourseType.ROAD: (15, 75)  # Every candidate drives separately; only briefing and travel are shared
+}
+
+# Quiz bank cache settings
+QUIZ_CACHE_REVALIDATE_SECONDS = 30  # How often workers check the shared quiz bank version
+PRACTICE_QUIZ_CACHE_SIZE = 1000  # Practice quizzes are per student and never bump the bank version, so keep only recent ones
+MAX_QUIZ_ATTEMPT_BATCH = 500
+QUIZ_PAGE_DEFAULT_LIMIT = 50
+QUIZ_PAGE_MAX_LIMIT = 200
+QUIZ_ANSWER_FIELDS = ("correct_answer", "explanation")
+QUIZ_SUMMARY_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "title": 1,
+    "course_type": 1,
+    "difficulty": 1,
+    "passing_score": 1,
+    "time_limit_minutes": 1,
+    "question_count": {"$size": "$questions"}
+}
+
+# Item statistics thresholds
+ITEM_STATS_MIN_ATTEMPTS = 30  # Below this, flags are too noisy to act on
+ITEM_TRIVIAL_P_VALUE = 0.95
+ITEM_TOO_HARD_P_VALUE = 0.2
+ITEM_MIN_DISCRIMINATION = 0.1
+
+# Adaptive practice quiz settings (Rasch model, difficulties in logits)
+ADAPTIVE_TARGET_SUCCESS = 0.7  # Pick questions the student answers correctly ~70% of the time
+ADAPTIVE_PRIOR_WEIGHT = 10  # Pseudo-attempts given to the authored quiz difficulty
+ADAPTIVE_JITTER_LOGITS = 0.3  # Noise so repeated requests don't return identical quizzes
+ADAPTIVE_HISTORY_LIMIT = 50
+ADAPTIVE_MAX_QUESTIONS = 50
+ADAPTIVE_BANK_REFRESH_SECONDS = 300
+# Offline quiz pack settings
+QUIZ_PACK_ANSWER_MODES = ("none", "hashed")
+
+# Notification push settings
+SSE_HEARTBEAT_SECONDS = 25  # Below common proxy idle timeouts
+
+# Quiz leaderboard settings
+LEADERBOARD_SCORE_BUCKETS = 1001  # Average scores 0-100 at 0.1-point resolution
+LEADERBOARD_MIN_ATTEMPTS = 3  # Students need a few attempts before they are ranked
+LEADERBOARD_SYNC_SECONDS = 30  # How often deltas are saved and other workers' totals pulled
+LEADERBOARD_MAX_TOP = 100
+
+DIFFICULTY_PRIOR_LOGITS = {
+    QuizDifficulty.EASY: -1.0,
+    QuizDifficulty.MEDIUM: 0.0,
+    QuizDifficulty.HARD: 1.0
+}
+
 # Required documents by role
 REQUIRED_DOCUMENTS = {
     UserRole.STUDENT: [DocumentType.PROFILE_PHOTO, DocumentType.ID_CARD, DocumentType.MEDICAL_CERTIFICATE, DocumentType.RESIDENCE_CERTIFICATE],
@@ -527,8 +649,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await get_user_from_token(credentials.credentials)
+
+async def get_user_from_token(token: str):
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
@@ -540,54 +665,98 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise HTTPException(status_code=401, detail="User not found")
     return user
 
-async def check_user_documents_complete(user_id: str, role: str) -> bool:
-    """Check if user has uploaded and verified all required documents"""
-    required_docs = REQUIRED_DOCUMENTS.get(role, [])
+def documents_role(role: str) -> str:
+    """Role whose document requirements apply to a user (guests enroll as students)"""
+    return UserRole.STUDENT if role == UserRole.GUEST else role
+
+async def refresh_user_documents_status(user_id: str, role: Optional[str] = None) -> dict:
+    """Recompute and store the user's documents_status summary"""
+    if role is None:
+        user = await db.users.find_one({"id": user_id}, {"role": 1})
+        if not user:
+            return {}
+        role = user["role"]
     
-    documents_cursor = db.documents.find({
-        "user_id": user_id,
-        "is_verified": True,
-        "document_type": {"$in": [doc.value for doc in required_docs]}
-    })
-    documents = await documents_cursor.to_list(length=None)
+    required_types = [doc.value for doc in REQUIRED_DOCUMENTS.get(documents_role(role), [])]
     
-    uploaded_types = {doc["document_type"] for doc in documents}
-    required_types = {doc.value for doc in required_docs}
+    documents_cursor = db.documents.find(
+        {"user_id": user_id, "is_verified": True, "document_type": {"$in": required_types}},
+        {"document_type": 1}
+    )
+    verified_types = {doc["document_type"] for doc in await documents_cursor.to_list(length=None)}
     
-    return required_types.issubset(uploaded_types)
-
-async def update_course_availability(enrollment_id: str):
-    """Update course availability based on completion status"""
-    courses_cursor = db.courses.find({"enrollment_id": enrollment_id}).sort("course_type", 1)
-    courses = await courses_cursor.to_list(length=None)
+    documents_status = {
+        "verified_types": [t for t in required_types if t in verified_types],
+        "missing_types": [t for t in required_types if t not in verified_types],
+        "complete": all(t in verified_types for t in required_types),
+        "updated_at": datetime.utcnow()
+    }
+    await db.users.update_one({"id": user_id}, {"$set": {"documents_status": documents_status}})
+    return documents_status
+
+async def get_users_with_complete_documents(user_ids: List[str], role: str) -> set:
+    """Return the subset of user_ids whose required documents are all uploaded and verified"""
+    required_types = {doc.value for doc in REQUIRED_DOCUMENTS.get(role, [])}
+    if not required_types:
+        return set(user_ids)
+    
+    # Users with a documents_status summary are answered from the users collection
+    users_cursor = db.users.find(
+        {"id": {"$in": list(user_ids)}, "documents_status": {"$exists": True}},
+        {"id": 1, "documents_status.complete": 1}
+    )
+    users = await users_cursor.to_list(length=None)
+    complete = {u["id"] for u in users if u["documents_status"].get("complete")}
+    unsummarized = set(user_ids) - {u["id"] for u in users}
+    if not unsummarized:
+        return complete
+    
+    # Fall back to the documents collection for users created before the summary existed
+    pipeline = [
+        {"$match": {
+            "user_id": {"$in": list(unsummarized)},
+            "is_verified": True,
+            "document_type": {"$in": list(required_types)}
+        }},
+        {"$group": {"_id": "$user_id", "types": {"$addToSet": "$document_type"}}}
+    ]
+    results = await db.documents.aggregate(pipeline).to_list(length=None)
     
+    return complete | {r["_id"] for r in results if required_types.issubset(r["types"])}
+
+def plan_course_availability(courses: list) -> List[tuple]:
+    """Return (course_id, new_status) pairs needed to enforce the course sequence"""
     # Sort courses by sequence
     course_order = {CourseType.THEORY: 0, CourseType.PARK: 1, CourseType.ROAD: 2}
-    courses.sort(key=lambda x: course_order[x["course_type"]])
+    courses = sorted(courses, key=lambda x: course_order[x["course_type"]])
     
+    changes = []
     for i, course in enumerate(courses):
         if i == 0:  # First course (theory) is always available
             if course["status"] == CourseStatus.LOCKED:
-                await db.courses.update_one(
-                    {"id": course["id"]},
-                    {"$set": {"status": CourseStatus.AVAILABLE, "updated_at": datetime.utcnow()}}
-                )
+                changes.append((course["id"], CourseStatus.AVAILABLE))
         else:
             # Check if previous course is completed and exam passed
             prev_course = courses[i-1]
             if prev_course["exam_status"] == ExamStatus.PASSED:
                 if course["status"] == CourseStatus.LOCKED:
-                    await db.courses.update_one(
-                        {"id": course["id"]},
-                        {"$set": {"status": CourseStatus.AVAILABLE, "updated_at": datetime.utcnow()}}
-                    )
+                    changes.append((course["id"], CourseStatus.AVAILABLE))
             else:
                 # Lock the course if previous not completed
                 if course["status"] != CourseStatus.LOCKED:
-                    await db.courses.update_one(
-                        {"id": course["id"]},
-                        {"$set": {"status": CourseStatus.LOCKED, "updated_at": datetime.utcnow()}}
-                    )
+                    changes.append((course["id"], CourseStatus.LOCKED))
+    return changes
+
+async def update_course_availability(enrollment_id: str):
+    """Update course availability based on completion status"""
+    courses_cursor = db.courses.find({"enrollment_id": enrollment_id})
+    courses = await courses_cursor.to_list(length=None)
+    
+    for course_id, new_status in plan_course_availability(courses):
+        await db.courses.update_one(
+            {"id": course_id},
+            {"$set": {"status": new_status, "updated_at": datetime.utcnow()}}
+        )
 
 async def create_sequential_courses(enrollment_id: str):
     """Create courses with proper sequential logic"""
@@ -622,6 +791,892 @@ async def create_sequential_courses(enrollment_id: str):
     await db.courses.insert_many(courses)
     return courses
 
+# Session calendar functions
+def calendar_slot_starts(start: datetime, duration_minutes: int) -> List[datetime]:
+    """Return the start of every calendar slot covered by [start, start + duration)"""
+    end = start + timedelta(minutes=duration_minutes)
+    current = start.replace(second=0, microsecond=0) - timedelta(minutes=start.minute % CALENDAR_SLOT_MINUTES)
+    slots = []
+    while current < end:
+        slots.append(current)
+        current += timedelta(minutes=CALENDAR_SLOT_MINUTES)
+    return slots
+
+def is_on_calendar_grid(start: datetime) -> bool:
+    """Whether a session start falls on a calendar slot boundary.
+    
+    With every start on the grid, a session claims exactly the slots of [start, end rounded up),
+    so sessions the exact interval checks accept never compete for the same slot.
+    """
+    return start.second == 0 and start.microsecond == 0 and start.minute % CALENDAR_SLOT_MINUTES == 0
+
+def calendar_span(start: datetime, end: datetime) -> tuple:
+    """The (start, end) a session occupies in calendar slots, rounded out to the slot grid"""
+    span_start = start.replace(second=0, microsecond=0) - timedelta(minutes=start.minute % CALENDAR_SLOT_MINUTES)
+    return span_start, round_up_to_slot_grid(end, CALENDAR_SLOT_MINUTES)
+
+async def find_session_conflict(owner_field: str, owner_id: str, start: datetime, duration_minutes: int) -> Optional[dict]:
+    """Find an active session of a teacher or student overlapping the given interval"""
+    end = start + timedelta(minutes=duration_minutes)
+    
+    # Only sessions starting inside this window can overlap; served by (owner_field, scheduled_at)
+    sessions_cursor = db.sessions.find({
+        owner_field: owner_id,
+        "scheduled_at": {
+            "$gt": start - timedelta(minutes=MAX_SESSION_DURATION_MINUTES),
+            "$lt": end
+        },
+        "status": {"$in": ACTIVE_SESSION_STATUSES}
+    })
+    async for session in sessions_cursor:
+        if session["scheduled_at"] + timedelta(minutes=session["duration_minutes"]) > start:
+            return session
+    return None
+
+def calendar_slot_docs(session_id: str, owner_keys: List[str], start: datetime, duration_minutes: int) -> List[dict]:
+    """Build the calendar slot reservations for a session"""
+    return [
+        {"owner_key": owner_key, "slot_start": slot_start, "session_id": session_id}
+        for owner_key in owner_keys
+        for slot_start in calendar_slot_starts(start, duration_minutes)
+    ]
+
+async def claim_calendar_slots(slot_docs: List[dict]) -> bool:
+    """Atomically reserve calendar slots; False if any slot is already taken"""
+    try:
+        # Unique (owner_key, slot_start) index rejects double-booking across concurrent requests
+        await db.calendar_slots.insert_many(slot_docs, ordered=False)
+        return True
+    except BulkWriteError as e:
+        await release_calendar_slots(list({doc["session_id"] for doc in slot_docs}))
+        if all(error.get("code") == 11000 for error in e.details.get("writeErrors", [])):
+            return False
+        raise
+
+async def release_calendar_slots(session_ids: List[str]):
+    """Free the calendar slots reserved by sessions"""
+    await db.calendar_slots.delete_many({"session_id": {"$in": session_ids}})
+
+def interval_is_free(busy: List[tuple], start: datetime, end: datetime) -> bool:
+    """Check [start, end) against a sorted list of (start, end) busy intervals"""
+    i = bisect.bisect_left(busy, (end,))
+    # Busy intervals are at most a session long, plus one slot when rounded out to the calendar grid
+    earliest_overlapping_start = start - timedelta(minutes=MAX_SESSION_DURATION_MINUTES + CALENDAR_SLOT_MINUTES)
+    while i > 0:
+        i -= 1
+        busy_start, busy_end = busy[i]
+        if busy_end > start:
+            return False
+        if busy_start <= earliest_overlapping_start:
+            break
+    return True
+
+def round_up_to_slot_grid(moment: datetime, step_minutes: int = SLOT_SEARCH_STEP_MINUTES) -> datetime:
+    """Round a datetime up to the next step_minutes boundary"""
+    rounded = moment.replace(second=0, microsecond=0)
+    if rounded < moment:
+        rounded += timedelta(minutes=1)
+    return rounded + timedelta(minutes=-rounded.minute % step_minutes)
+
+# Short-lived per-process cache of school free slots, invalidated on booking
+_slot_search_cache: Dict[tuple, tuple] = {}
+_slot_search_generation: Dict[str, int] = {}
+
+def invalidate_slot_search_cache(school_id: str):
+    """Drop cached free slots of a school after a booking"""
+    _slot_search_generation[school_id] = _slot_search_generation.get(school_id, 0) + 1
+
+async def find_school_free_slots(school_id: str, student_gender: str, window_start: datetime,
+                                 window_end: datetime, duration_minutes: int) -> dict:
+    """Free slots of a school's approved teachers, computed from merged busy intervals"""
+    cache_key = (school_id, _slot_search_generation.get(school_id, 0), student_gender,
+                 window_start, window_end, duration_minutes)
+    cached = _slot_search_cache.get(cache_key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    teacher_query = {"driving_school_id": school_id, "is_approved": True}
+    if student_gender == "female":
+        teacher_query["can_teach_female"] = True
+    else:
+        teacher_query["can_teach_male"] = True
+    teachers = await db.teachers.find(teacher_query, {"id": 1, "user_id": 1}).to_list(length=None)
+    
+    teacher_busy = {teacher["id"]: [] for teacher in teachers}
+    sessions_cursor = db.sessions.find({
+        "teacher_id": {"$in": list(teacher_busy)},
+        "scheduled_at": {"$gt": window_start - timedelta(minutes=MAX_SESSION_DURATION_MINUTES), "$lt": window_end},
+        "status": {"$in": ACTIVE_SESSION_STATUSES}
+    }, {"teacher_id": 1, "scheduled_at": 1, "duration_minutes": 1})
+    for session in await sessions_cursor.to_list(length=None):
+        teacher_busy[session["teacher_id"]].append(
+            (session["scheduled_at"], session["scheduled_at"] + timedelta(minutes=session["duration_minutes"]))
+        )
+    
+    # Merge each teacher's busy intervals so every slot check is a single bisect
+    for teacher_id, busy in teacher_busy.items():
+        merged = []
+        for busy_start, busy_end in sorted(busy):
+            if merged and busy_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], busy_end))
+            else:
+                merged.append((busy_start, busy_end))
+        teacher_busy[teacher_id] = merged
+    
+    slots = []
+    duration = timedelta(minutes=duration_minutes)
+    day = window_start.replace(hour=0, minute=0, second=0, microsecond=0)
+    while day < window_end and len(slots) < SLOT_SEARCH_MAX_SLOTS:
+        if day.weekday() in SESSION_WEEKDAYS:
+            slot_start = day + timedelta(hours=SESSION_DAY_START_HOUR)
+            day_end = min(day + timedelta(hours=SESSION_DAY_END_HOUR), window_end)
+            while slot_start + duration <= day_end and len(slots) < SLOT_SEARCH_MAX_SLOTS:
+                if slot_start >= window_start:
+                    slot_end = slot_start + duration
+                    free_teachers = [
+                        teacher_id for teacher_id, busy in teacher_busy.items()
+                        if interval_is_free(busy, slot_start, slot_end)
+                    ]
+                    if free_teachers:
+                        slots.append({"start": slot_start, "end": slot_end, "teacher_ids": free_teachers})
+                slot_start += timedelta(minutes=SLOT_SEARCH_STEP_MINUTES)
+        day += timedelta(days=1)
+    
+    users_cursor = db.users.find(
+        {"id": {"$in": [teacher["user_id"] for teacher in teachers]}},
+        {"id": 1, "first_name": 1, "last_name": 1}
+    )
+    user_names = {u["id"]: f"{u['first_name']} {u['last_name']}" for u in await users_cursor.to_list(length=None)}
+    result = {
+        "slots": slots,
+        "teachers": {teacher["id"]: user_names.get(teacher["user_id"], "Unknown Teacher") for teacher in teachers}
+    }
+    
+    # Evict expired entries before caching the fresh result
+    now = time.monotonic()
+    for key in [key for key, (expires_at, _) in _slot_search_cache.items() if expires_at <= now]:
+        del _slot_search_cache[key]
+    _slot_search_cache[cache_key] = (now + SLOT_SEARCH_CACHE_TTL_SECONDS, result)
+    return result
+
+def build_session_page_query(base_query: dict, from_date: Optional[str], to_date: Optional[str],
+                             cursor: Optional[str], sort_order: str) -> dict:
+    """Restrict a sessions query to a scheduled_at window and a keyset cursor position"""
+    query = dict(base_query)
+    try:
+        window = {}
+        if from_date:
+            window["$gte"] = datetime.fromisoformat(from_date)
+        if to_date:
+            window["$lt"] = datetime.fromisoformat(to_date)
+        if window:
+            query["scheduled_at"] = window
+        
+        if cursor:
+            cursor_at, cursor_id = cursor.rsplit("|", 1)
+            cursor_at = datetime.fromisoformat(cursor_at)
+            op = "$gt" if sort_order == "asc" else "$lt"
+            query = {"$and": [query, {"$or": [
+                {"scheduled_at": {op: cursor_at}},
+                {"scheduled_at": cursor_at, "id": {op: cursor_id}}
+            ]}]}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date or cursor")
+    return query
+
+async def fetch_session_page(query: dict, sort_order: str, limit: int) -> tuple:
+    """Fetch one page of sessions sorted on (scheduled_at, id); returns (sessions, next_cursor)"""
+    limit = max(1, min(limit, SESSION_PAGE_MAX_LIMIT))
+    direction = 1 if sort_order == "asc" else -1
+    sessions_cursor = db.sessions.find(query).sort([("scheduled_at", direction), ("id", direction)]).limit(limit + 1)
+    sessions = await sessions_cursor.to_list(length=limit + 1)
+    
+    next_cursor = None
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        next_cursor = f"{sessions[-1]['scheduled_at'].isoformat()}|{sessions[-1]['id']}"
+    return sessions, next_cursor
+
+def new_session_doc(course: dict, teacher: dict, teacher_name: str, student: dict, scheduled_at: datetime,
+                    duration_minutes: int, location: Optional[str] = None) -> dict:
+    """Build a scheduled session document with school and participant names denormalized"""
+    return {
+        "id": str(uuid.uuid4()),
+        "course_id": course["id"],
+        "teacher_id": teacher["id"],
+        "student_id": student["id"],
+        "driving_school_id": teacher["driving_school_id"],
+        "student_name": f"{student['first_name']} {student['last_name']}",
+        "teacher_name": teacher_name,
+        "session_type": course["course_type"],
+        "scheduled_at": scheduled_at,
+        "duration_minutes": duration_minutes,
+        "location": location,
+        "status": SessionStatus.SCHEDULED,
+        "notes": None,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow()
+    }
+
+# External expert assignment functions
+async def reserve_expert_slot(expert_id: str, day: str, units: int = 1) -> bool:
+    """Atomically take `units` of the expert's exam slots for a day; False if they don't fit"""
+    try:
+        # A day without room fails the filter, so the upsert collides with the unique (expert_id, date) index
+        await db.expert_daily_load.find_one_and_update(
+            {"expert_id": expert_id, "date": day, "exam_count": {"$lte": MAX_EXAMS_PER_EXPERT_PER_DAY - units}},
+            {"$inc": {"exam_count": units}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False
+
+async def release_expert_slot(expert_id: str, day: str, units: int = 1):
+    """Give back exam slots reserved with reserve_expert_slot"""
+    await db.expert_daily_load.update_one(
+        {"expert_id": expert_id, "date": day, "exam_count": {"$gte": units}},
+        {"$inc": {"exam_count": -units}}
+    )
+
+async def assign_external_expert(exam_type: str, state: str, candidate_dates: List[datetime],
+                                 units: int = 1) -> Optional[tuple]:
+    """Reserve the least-loaded expert of the wilaya on the first candidate date with `units` free slots"""
+    experts_cursor = db.external_experts.find(
+        {"available_states": state, "is_available": True, "specialization": exam_type},
+        {"id": 1, "rating": 1}
+    )
+    experts = await experts_cursor.to_list(length=None)
+    if not experts:
+        return None
+    
+    expert_ids = [expert["id"] for expert in experts]
+    for scheduled_at in candidate_dates:
+        day = scheduled_at.date().isoformat()
+        loads_cursor = db.expert_daily_load.find({"expert_id": {"$in": expert_ids}, "date": day})
+        loads = {load["expert_id"]: load["exam_count"] for load in await loads_cursor.to_list(length=None)}
+        
+        ranked = sorted(experts, key=lambda expert: (loads.get(expert["id"], 0), -expert.get("rating", 0)))
+        for expert in ranked:
+            if loads.get(expert["id"], 0) + units > MAX_EXAMS_PER_EXPERT_PER_DAY:
+                break
+            if await reserve_expert_slot(expert["id"], day, units):
+                return expert, scheduled_at
+    return None
+
+def exam_session_minutes(exam_type: str, candidates: int) -> int:
+    """Expert time for one exam session with the given number of candidates"""
+    fixed, per_candidate = EXAM_SESSION_MINUTES.get(exam_type, (0, EXAM_DURATION_MINUTES))
+    return fixed + per_candidate * candidates
+
+def exam_load_units(exam_type: str, candidates: int) -> int:
+    """Daily expert load of a session, in single-exam slots of EXAM_DURATION_MINUTES (rounded up)"""
+    return -(-exam_session_minutes(exam_type, candidates) // EXAM_DURATION_MINUTES)
+
+def plan_course_sessions(plan, start_day: datetime, now: datetime, remaining: int,
+                         teacher_busy: Dict[str, List[tuple]], teacher_load: Dict[str, int],
+                         student_busy: List[tuple], course_busy: List[tuple],
+                         course_teacher_id: Optional[str]) -> List[tuple]:
+    """Greedily place up to `remaining` sessions; returns (teacher_id, start) pairs.
+    
+    Takes the earliest slot that fits, course teacher first, then the least-loaded teacher.
+    Teacher and student busy lists hold sorted calendar spans and are updated in place.
+    Candidate starts stay on the calendar slot grid whatever the session duration.
+    """
+    duration = timedelta(minutes=plan.duration_minutes)
+    spacing = timedelta(hours=plan.min_spacing_hours)
+    window_end = start_day + timedelta(days=plan.horizon_days)
+    placements = []
+    day = start_day
+    while len(placements) < remaining and day < window_end:
+        if day.weekday() in plan.weekdays:
+            slot_start = day + timedelta(hours=plan.earliest_hour)
+            day_end = day + timedelta(hours=plan.latest_hour)
+            while slot_start + duration <= day_end and len(placements) < remaining:
+                slot_end = slot_start + duration
+                span = calendar_span(slot_start, slot_end)
+                teacher_id = None
+                if (slot_start > now
+                        and interval_is_free(course_busy, slot_start - spacing, slot_end + spacing)
+                        and interval_is_free(student_busy, *span)):
+                    candidates = sorted(teacher_busy, key=lambda t: (t != course_teacher_id, teacher_load[t]))
+                    teacher_id = next((t for t in candidates if interval_is_free(teacher_busy[t], *span)), None)
+                if teacher_id:
+                    placements.append((teacher_id, slot_start))
+                    bisect.insort(teacher_busy[teacher_id], span)
+                    bisect.insort(student_busy, span)
+                    bisect.insort(course_busy, (slot_start, slot_end))
+                    teacher_load[teacher_id] += 1
+                    slot_start = span[1]
+                else:
+                    slot_start += timedelta(minutes=CALENDAR_SLOT_MINUTES)
+        day += timedelta(days=1)
+    return placements
+
+def pack_exam_batches(exams: List[dict]) -> List[dict]:
+    """Pack exam requests into capacity-limited batches sharing type, location and date.
+    
+    Exams with the fewest candidate dates are placed first, each into the fullest open
+    batch on one of its dates (best fit), opening a new batch only when none has room.
+    """
+    groups = {}
+    for exam in exams:
+        key = (exam["exam_type"], exam["location"].strip().lower())
+        groups.setdefault(key, []).append(exam)
+    
+    batches = []
+    for (exam_type, _), group in groups.items():
+        capacity = EXAM_BATCH_CAPACITY.get(exam_type, 1)
+        candidates = {
+            exam["id"]: sorted({date.date() for date in exam.get("preferred_dates") or [exam["scheduled_at"]]})
+            for exam in group
+        }
+        open_batches = []
+        for exam in sorted(group, key=lambda e: (len(candidates[e["id"]]), candidates[e["id"]][0])):
+            fitting = [
+                batch for batch in open_batches
+                if batch["date"] in candidates[exam["id"]] and len(batch["exams"]) < capacity
+            ]
+            if fitting:
+                batch = max(fitting, key=lambda b: len(b["exams"]))
+            else:
+                batch = {
+                    "exam_type": exam_type,
+                    "location": exam["location"],
+                    "date": candidates[exam["id"]][0],
+                    "exams": []
+                }
+                open_batches.append(batch)
+            batch["exams"].append(exam)
+        batches.extend(open_batches)
+    return batches
+
+# Quiz bank cache
+def strip_quiz_answers(quiz: dict) -> dict:
+    """Copy of a quiz without answer keys, explanations or correct-option flags"""
+    questions = []
+    for question in quiz.get("questions", []):
+        question = {key: value for key, value in question.items() if key not in QUIZ_ANSWER_FIELDS}
+        if isinstance(question.get("options"), list):
+            question["options"] = [
+                {key: value for key, value in option.items() if key != "is_correct"} if isinstance(option, dict) else option
+                for option in question["options"]
+            ]
+        questions.append(question)
+    return {**quiz, "questions": questions}
+
+NO_ANSWER_KEY = object()  # Stands in for a missing key; equal to no response, so nothing is marked correct
+
+class CompiledQuiz:
+    """Cached quiz with its answer key packed into an array for vectorized grading"""
+    
+    def __init__(self, quiz: dict):
+        self.id = quiz["id"]
+        self.version = quiz.get("version", 0)
+        self.quiz = quiz
+        self.passing_score = quiz["passing_score"]
+        self.question_count = len(quiz["questions"])
+        self.answer_key = np.empty(self.question_count, dtype=object)
+        for index, question in enumerate(quiz["questions"]):
+            key = question_answer_key(question)
+            self.answer_key[index] = NO_ANSWER_KEY if key is None else key
+        self.public_quiz = strip_quiz_answers(quiz)
+        # Practice quizzes borrow questions from the bank; statistics go to the original question
+        self.item_refs = [
+            (q["source"]["quiz_id"], q["source"]["question_index"]) if q.get("source") else (self.id, index)
+            for index, q in enumerate(quiz["questions"])
+        ]
+    
+    def grade(self, answers: dict) -> tuple:
+        """Return (correct_answers, score) for an answers dict keyed by question index"""
+        correct_answers, scores = self.grade_many([answers])
+        return int(correct_answers[0]), float(scores[0])
+    
+    def response_matrix(self, answers_list: List[dict]) -> np.ndarray:
+        """Lay answer sets out as an (attempts x questions) array"""
+        responses = np.empty((len(answers_list), self.question_count), dtype=object)
+        for row, answers in enumerate(answers_list):
+            responses[row] = [answers.get(str(i)) for i in range(self.question_count)]
+        return responses
+    
+    def correct_matrix(self, responses: np.ndarray) -> np.ndarray:
+        """Boolean (attempts x questions) array of answered questions matching the key"""
+        return (responses == self.answer_key) & np.not_equal(responses, None)
+    
+    def grade_many(self, answers_list: List[dict]) -> tuple:
+        """Grade many answer sets at once; returns (correct_answers, scores) arrays"""
+        responses = self.response_matrix(answers_list)
+        correct_answers = np.count_nonzero(self.correct_matrix(responses), axis=1)
+        if self.question_count > 0:
+            scores = correct_answers / self.question_count * 100
+        else:
+            scores = np.zeros(len(answers_list))
+        return correct_answers, scores
+
+_quiz_cache: Dict[str, CompiledQuiz] = {}
+_practice_quiz_cache: "OrderedDict[str, CompiledQuiz]" = OrderedDict()
+_quiz_bank_state = {"version": None, "checked_at": 0.0, "active_ids": None}
+
+async def _revalidate_quiz_cache():
+    """Drop cached quizzes when another worker has changed the quiz bank"""
+    now = time.monotonic()
+    if now - _quiz_bank_state["checked_at"] < QUIZ_CACHE_REVALIDATE_SECONDS:
+        return
+    
+    meta = await db.quiz_bank_meta.find_one({"id": "quiz_bank"})
+    version = meta["version"] if meta else 0
+    if version != _quiz_bank_state["version"]:
+        _quiz_cache.clear()
+        _practice_quiz_cache.clear()
+        _quiz_bank_state["active_ids"] = None
+        _quiz_bank_state["version"] = version
+    _quiz_bank_state["checked_at"] = now
+
+async def bump_quiz_bank_version():
+    """Invalidate every worker's quiz cache after a quiz is created or changed"""
+    meta = await db.quiz_bank_meta.find_one_and_update(
+        {"id": "quiz_bank"},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    _quiz_cache.clear()
+    _practice_quiz_cache.clear()
+    _quiz_bank_state.update(version=meta["version"], checked_at=time.monotonic(), active_ids=None)
+
+async def get_compiled_quiz(quiz_id: str) -> Optional[CompiledQuiz]:
+    """Get an active quiz from the cache, loading it on first use"""
+    await _revalidate_quiz_cache()
+    compiled = _quiz_cache.get(quiz_id)
+    if compiled is not None:
+        return compiled
+    compiled = _practice_quiz_cache.get(quiz_id)
+    if compiled is not None:
+        _practice_quiz_cache.move_to_end(quiz_id)
+        return compiled
+    
+    version = _quiz_bank_state["version"]
+    quiz = await db.quizzes.find_one({"id": quiz_id, "is_active": True})
+    if not quiz:
+        return None
+    compiled = CompiledQuiz(quiz)
+    if _quiz_bank_state["version"] != version:
+        return compiled  # The bank changed during the query; don't cache what may be stale
+    if quiz.get("is_practice"):
+        _practice_quiz_cache[quiz_id] = compiled
+        if len(_practice_quiz_cache) > PRACTICE_QUIZ_CACHE_SIZE:
+            _practice_quiz_cache.popitem(last=False)
+    else:
+        _quiz_cache[quiz_id] = compiled
+    return compiled
+
+async def get_active_quizzes() -> List[CompiledQuiz]:
+    """Get the whole active quiz bank from the cache"""
+    await _revalidate_quiz_cache()
+    active_ids = _quiz_bank_state["active_ids"]
+    if active_ids is not None:
+        return [_quiz_cache[quiz_id] for quiz_id in active_ids]
+    
+    version = _quiz_bank_state["version"]
+    quizzes = await db.quizzes.find({"is_active": True, "is_practice": {"$ne": True}}).to_list(length=None)
+    compiled_quizzes = [CompiledQuiz(quiz) for quiz in quizzes]
+    # A bump during the query may have made these stale, so only a still-current result is cached
+    if _quiz_bank_state["version"] == version:
+        for compiled in compiled_quizzes:
+            _quiz_cache[compiled.id] = compiled
+        _quiz_bank_state["active_ids"] = [compiled.id for compiled in compiled_quizzes]
+    return compiled_quizzes
+
+# Quiz item statistics
+def plan_item_stats(quiz: CompiledQuiz, answers_list: List[dict], scores) -> List[UpdateOne]:
+    """Build one $inc upsert per question covering a group of graded attempts"""
+    responses = quiz.response_matrix(answers_list)
+    correct = quiz.correct_matrix(responses).astype(float)
+    scores = np.asarray(scores, dtype=float)
+    correct_counts = correct.sum(axis=0)
+    correct_score_sums = scores @ correct
+    score_sum = float(scores.sum())
+    score_sq_sum = float((scores ** 2).sum())
+    now = datetime.utcnow()
+    
+    operations = []
+    for index, (source_quiz_id, source_index) in enumerate(quiz.item_refs):
+        increments = {
+            "attempts": len(answers_list),
+            "correct": int(correct_counts[index]),
+            "score_sum": score_sum,
+            "score_sq_sum": score_sq_sum,
+            "correct_score_sum": float(correct_score_sums[index])
+        }
+        for choice, count in Counter(item_choice_key(answer) for answer in responses[:, index]).items():
+            increments[f"choice_counts.{choice}"] = count
+        operations.append(UpdateOne(
+            {"id": f"{source_quiz_id}:{source_index}"},
+            {
+                "$inc": increments,
+                "$set": {
+                    "quiz_id": source_quiz_id,
+                    "question_index": source_index,
+                    "course_type": quiz.quiz["course_type"],
+                    "updated_at": now
+                }
+            },
+            upsert=True
+        ))
+    return operations
+
+async def record_item_stats(quiz: CompiledQuiz, answers_list: List[dict], scores):
+    """Fold graded attempts into quiz_item_stats; never fails the submission"""
+    if not answers_list or quiz.question_count == 0:
+        return
+    try:
+        await db.quiz_item_stats.bulk_write(plan_item_stats(quiz, answers_list, scores), ordered=False)
+    except Exception as e:
+        logger.warning(f"Failed to record item stats for quiz {quiz.id}: {str(e)}")
+
+def summarize_item_stats(stats: dict) -> dict:
+    """Derive difficulty (p-value), point-biserial discrimination and review flags"""
+    attempts = stats.get("attempts", 0)
+    correct = stats.get("correct", 0)
+    p_value = correct / attempts if attempts else None
+    
+    discrimination = None
+    if attempts and 0 < correct < attempts:
+        mean = stats["score_sum"] / attempts
+        variance = stats["score_sq_sum"] / attempts - mean ** 2
+        if variance > 0:
+            mean_correct = stats["correct_score_sum"] / correct
+            mean_incorrect = (stats["score_sum"] - stats["correct_score_sum"]) / (attempts - correct)
+            discrimination = (mean_correct - mean_incorrect) / variance ** 0.5 * (p_value * (1 - p_value)) ** 0.5
+    
+    flags = []
+    if attempts >= ITEM_STATS_MIN_ATTEMPTS:
+        if p_value >= ITEM_TRIVIAL_P_VALUE:
+            flags.append("trivial")
+        elif p_value <= ITEM_TOO_HARD_P_VALUE:
+            flags.append("too_hard")
+        if discrimination is not None and discrimination < ITEM_MIN_DISCRIMINATION:
+            flags.append("low_discrimination" if discrimination >= 0 else "negative_discrimination")
+    
+    return {
+        "attempts": attempts,
+        "correct": correct,
+        "p_value": round(p_value, 4) if p_value is not None else None,
+        "discrimination": round(discrimination, 4) if discrimination is not None else None,
+        "choice_counts": stats.get("choice_counts", {}),
+        "flags": flags
+    }
+
+# Adaptive practice quizzes
+def item_difficulty(stats: Optional[dict], prior: float) -> float:
+    """Rasch difficulty in logits, shrunk towards the authored difficulty for rarely seen items"""
+    prior_p = 1 / (1 + np.exp(prior))
+    attempts = stats["attempts"] if stats else 0
+    correct = stats["correct"] if stats else 0
+    p = (correct + ADAPTIVE_PRIOR_WEIGHT * prior_p) / (attempts + ADAPTIVE_PRIOR_WEIGHT)
+    return float(np.log((1 - p) / p))
+
+def estimate_ability(history: List[tuple]) -> float:
+    """Rasch ability from (score, question_count, mean_difficulty) of past attempts"""
+    total = sum(question_count for _, question_count, _ in history)
+    if total == 0:
+        return 0.0
+    correct = sum(score / 100 * question_count for score, question_count, _ in history)
+    mean_difficulty = sum(question_count * difficulty for _, question_count, difficulty in history) / total
+    p = (correct + 1) / (total + 2)
+    return float(np.log(p / (1 - p)) + mean_difficulty)
+
+class ItemBank:
+    """Active questions of one course type with their difficulties packed into an array"""
+    
+    def __init__(self, course_type: str, quizzes: List[CompiledQuiz], stats_by_ref: dict, version):
+        self.course_type = course_type
+        self.version = version
+        self.built_at = time.monotonic()
+        self.refs = []
+        self.questions = []
+        self.quiz_difficulty = {}  # quiz_id -> (mean difficulty, question count)
+        difficulties = []
+        for compiled in quizzes:
+            prior = DIFFICULTY_PRIOR_LOGITS.get(compiled.quiz["difficulty"], 0.0)
+            quiz_difficulties = [
+                item_difficulty(stats_by_ref.get((compiled.id, index)), prior)
+                for index in range(compiled.question_count)
+            ]
+            if not quiz_difficulties:
+                continue
+            self.refs.extend((compiled.id, index) for index in range(compiled.question_count))
+            self.questions.extend(compiled.quiz["questions"])
+            difficulties.extend(quiz_difficulties)
+            self.quiz_difficulty[compiled.id] = (float(np.mean(quiz_difficulties)), compiled.question_count)
+        self.difficulties = np.array(difficulties, dtype=float)
+    
+    def select(self, ability: float, count: int) -> np.ndarray:
+        """Indices of the questions closest to the target difficulty, easiest first"""
+        target = ability - np.log(ADAPTIVE_TARGET_SUCCESS / (1 - ADAPTIVE_TARGET_SUCCESS))
+        distance = np.abs(self.difficulties - target) + _adaptive_rng.uniform(0, ADAPTIVE_JITTER_LOGITS, len(self.difficulties))
+        if count >= len(distance):
+            selected = np.arange(len(distance))
+        else:
+            selected = np.argpartition(distance, count)[:count]
+        return selected[np.argsort(self.difficulties[selected])]
+
+_adaptive_rng = np.random.default_rng()
+_item_banks: Dict[str, ItemBank] = {}
+
+async def get_item_bank(course_type: str) -> ItemBank:
+    """Get the difficulty arrays for a course type, rebuilding when stale"""
+    quizzes = [compiled for compiled in await get_active_quizzes() if compiled.quiz["course_type"] == course_type]
+    bank = _item_banks.get(course_type)
+    if (
+        bank is None
+        or bank.version != _quiz_bank_state["version"]
+        or time.monotonic() - bank.built_at > ADAPTIVE_BANK_REFRESH_SECONDS
+    ):
+        stats_by_ref = {
+            (stats["quiz_id"], stats["question_index"]): stats
+            async for stats in db.quiz_item_stats.find(
+                {"course_type": course_type},
+                {"quiz_id": 1, "question_index": 1, "attempts": 1, "correct": 1}
+            )
+        }
+        bank = _item_banks[course_type] = ItemBank(course_type, quizzes, stats_by_ref, _quiz_bank_state["version"])
+    return bank
+
+# Offline quiz packs
+class QuizPack:
+    """Answer-free quiz bundle for one course type and difficulty, gzipped once per bank version"""
+    
+    def __init__(self, body: bytes, version):
+        self.version = version
+        self.body = body
+        self.gzipped = gzip.compress(body, mtime=0)
+        digest = hashlib.sha256(body).hexdigest()
+        # Strong ETags name exact bytes, so each encoding gets its own
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+_quiz_packs: Dict[tuple, QuizPack] = {}
+
+def quiz_pack_salt(version) -> str:
+    """Per-version salt, identical on every worker so ETags agree"""
+    return hmac.new(SECRET_KEY.encode(), f"quiz-pack:{version}".encode(), hashlib.sha256).hexdigest()[:16]
+
+def quiz_answer_hash(salt: str, quiz_id: str, question_index: int, answer) -> str:
+    """Hash a client compares against to self-grade offline"""
+    payload = f"{salt}:{quiz_id}:{question_index}:{json.dumps(answer, sort_keys=True)}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+async def get_quiz_pack(course_type: str, difficulty: Optional[str], answers: str) -> QuizPack:
+    """Get a quiz pack, rebuilding it only after the quiz bank changes"""
+    quizzes = [
+        compiled for compiled in await get_active_quizzes()
+        if compiled.quiz["course_type"] == course_type
+        and (not difficulty or compiled.quiz["difficulty"] == difficulty)
+    ]
+    version = _quiz_bank_state["version"]
+    key = (course_type, difficulty, answers)
+    pack = _quiz_packs.get(key)
+    if pack is None or pack.version != version:
+        salt = quiz_pack_salt(version)
+        pack_quizzes = []
+        for compiled in sorted(quizzes, key=lambda c: c.id):
+            public_quiz = serialize_doc(compiled.public_quiz)
+            if answers == "hashed":
+                for index, question in enumerate(public_quiz["questions"]):
+                    if compiled.answer_key[index] is not NO_ANSWER_KEY:
+                        question["answer_hash"] = quiz_answer_hash(salt, compiled.id, index, compiled.answer_key[index])
+            pack_quizzes.append(public_quiz)
+        
+        content = {
+            "course_type": course_type,
+            "difficulty": difficulty,
+            "bank_version": version,
+            "quizzes": pack_quizzes
+        }
+        if answers == "hashed":
+            content["salt"] = salt
+        body = json.dumps(content, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+        pack = _quiz_packs[key] = QuizPack(body, version)
+    return pack
+
+# Quiz leaderboards
+class Leaderboard:
+    """Students ranked by average quiz score, counted in a Fenwick tree over score buckets"""
+    
+    def __init__(self):
+        self.tree = [0] * (LEADERBOARD_SCORE_BUCKETS + 1)
+        self.bucket_of = {}  # student_id -> bucket
+        self.members = {}  # bucket -> student_ids
+    
+    def __len__(self):
+        return len(self.bucket_of)
+    
+    def _add(self, bucket: int, delta: int):
+        i = bucket + 1
+        while i <= LEADERBOARD_SCORE_BUCKETS:
+            self.tree[i] += delta
+            i += i & -i
+    
+    def _count_at_most(self, bucket: int) -> int:
+        total = 0
+        i = bucket + 1
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+    
+    def update(self, student_id: str, average_score: float):
+        bucket = min(LEADERBOARD_SCORE_BUCKETS - 1, max(0, int(round(average_score * 10))))
+        if self.bucket_of.get(student_id) == bucket:
+            return
+        self.remove(student_id)
+        self.bucket_of[student_id] = bucket
+        self.members.setdefault(bucket, set()).add(student_id)
+        self._add(bucket, 1)
+    
+    def remove(self, student_id: str):
+        bucket = self.bucket_of.pop(student_id, None)
+        if bucket is None:
+            return
+        self.members[bucket].discard(student_id)
+        if not self.members[bucket]:
+            del self.members[bucket]
+        self._add(bucket, -1)
+    
+    def rank(self, student_id: str) -> Optional[tuple]:
+        """(rank, average_score) for a student; equal averages share a rank"""
+        bucket = self.bucket_of.get(student_id)
+        if bucket is None:
+            return None
+        return len(self.bucket_of) - self._count_at_most(bucket) + 1, bucket / 10
+    
+    def top(self, n: int) -> List[tuple]:
+        """(student_id, average_score, rank) for the best n students"""
+        entries = []
+        ahead = 0
+        for bucket in sorted(self.members, reverse=True):
+            students = sorted(self.members[bucket])
+            entries.extend((student_id, bucket / 10, ahead + 1) for student_id in students[:n - len(entries)])
+            ahead += len(students)
+            if len(entries) >= n:
+                break
+        return entries
+
+_leaderboards: Dict[str, Leaderboard] = {}
+_leaderboard_entries: Dict[str, dict] = {}  # student_id -> totals and board membership
+_leaderboard_pending: Dict[str, dict] = {}  # student_id -> deltas not yet saved
+_leaderboard_state = {"synced_at": None}
+
+def leaderboard_keys(entry: dict) -> List[str]:
+    keys = []
+    if entry.get("driving_school_id"):
+        keys.append(f"school:{entry['driving_school_id']}")
+    if entry.get("state"):
+        keys.append(f"wilaya:{entry['state']}")
+    return keys
+
+def apply_leaderboard_entry(student_id: str, entry: dict):
+    """Place a student on their school and wilaya boards from absolute totals"""
+    previous = _leaderboard_entries.get(student_id)
+    keys = leaderboard_keys(entry) if entry["attempts"] >= LEADERBOARD_MIN_ATTEMPTS else []
+    for key in leaderboard_keys(previous) if previous else []:
+        if key not in keys and key in _leaderboards:
+            _leaderboards[key].remove(student_id)
+    _leaderboard_entries[student_id] = entry
+    for key in keys:
+        _leaderboards.setdefault(key, Leaderboard()).update(student_id, entry["score_sum"] / entry["attempts"])
+
+async def record_leaderboard_attempt(student: dict, score: float):
+    """Count a graded bank-quiz attempt on the student's boards; saved by the next sync"""
+    try:
+        entry = _leaderboard_entries.get(student["id"])
+        if entry is None:
+            entry = await db.leaderboard_entries.find_one({"id": student["id"]})
+            if entry is None:
+                enrollment = await db.enrollments.find_one(
+                    {"student_id": student["id"], "enrollment_status": EnrollmentStatus.APPROVED},
+                    sort=[("created_at", -1)]
+                )
+                entry = {
+                    "attempts": 0,
+                    "score_sum": 0.0,
+                    "driving_school_id": enrollment["driving_school_id"] if enrollment else None,
+                    "state": student.get("state")
+                }
+        
+        apply_leaderboard_entry(student["id"], {
+            "attempts": entry["attempts"] + 1,
+            "score_sum": entry["score_sum"] + score,
+            "driving_school_id": entry.get("driving_school_id"),
+            "state": entry.get("state")
+        })
+        pending = _leaderboard_pending.setdefault(student["id"], {"attempts": 0, "score_sum": 0.0})
+        pending["attempts"] += 1
+        pending["score_sum"] += score
+    except Exception as e:
+        logger.warning(f"Failed to update leaderboards for student {student['id']}: {str(e)}")
+
+async def sync_leaderboards():
+    """Save pending deltas with $inc, then pull totals that other workers changed"""
+    pending = dict(_leaderboard_pending)
+    _leaderboard_pending.clear()
+    if pending:
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"id": student_id},
+                {
+                    "$inc": {"attempts": delta["attempts"], "score_sum": delta["score_sum"]},
+                    "$set": {
+                        "student_id": student_id,
+                        "driving_school_id": _leaderboard_entries[student_id].get("driving_school_id"),
+                        "state": _leaderboard_entries[student_id].get("state"),
+                        "updated_at": now
+                    }
+                },
+                upsert=True
+            )
+            for student_id, delta in pending.items()
+        ]
+        try:
+            await db.leaderboard_entries.bulk_write(operations, ordered=False)
+        except Exception:
+            # Keep the deltas for the next sync
+            for student_id, delta in pending.items():
+                current = _leaderboard_pending.setdefault(student_id, {"attempts": 0, "score_sum": 0.0})
+                current["attempts"] += delta["attempts"]
+                current["score_sum"] += delta["score_sum"]
+            raise
+    
+    # A full load on startup, then only entries touched since the last sync (with slack for clock skew)
+    started_at = datetime.utcnow()
+    query = {}
+    if _leaderboard_state["synced_at"]:
+        query["updated_at"] = {"$gte": _leaderboard_state["synced_at"] - timedelta(seconds=LEADERBOARD_SYNC_SECONDS)}
+    async for stored in db.leaderboard_entries.find(query, {"id": 1, "attempts": 1, "score_sum": 1, "driving_school_id": 1, "state": 1}):
+        delta = _leaderboard_pending.get(stored["id"], {"attempts": 0, "score_sum": 0.0})
+        apply_leaderboard_entry(stored["id"], {
+            "attempts": stored["attempts"] + delta["attempts"],
+            "score_sum": stored["score_sum"] + delta["score_sum"],
+            "driving_school_id": stored.get("driving_school_id"),
+            "state": stored.get("state")
+        })
+    _leaderboard_state["synced_at"] = started_at
+
+async def leaderboard_sync_loop():
+    while True:
+        await asyncio.sleep(LEADERBOARD_SYNC_SECONDS)
+        try:
+            await sync_leaderboards()
+        except Exception as e:
+            logger.error(f"Leaderboard sync error: {str(e)}")
+
+# Notification writes
+async def insert_notifications(notification_docs: List[dict]):
+    """Store notifications through the shared batched writer, which also counts and pushes them"""
+    await notification_service.write_notifications(notification_docs)
+
 # Cloudinary upload function
 async def upload_to_cloudinary(file: UploadFile, folder: str, resource_type: str = "auto"):
     """Upload file to Cloudinary"""
@@ -1173,6 +2228,8 @@ async def upload_document(
         else:
             await db.documents.insert_one(document_data)
         
+        await refresh_user_documents_status(current_user["id"], current_user["role"])
+        
         return {
             "message": "Document uploaded successfully",
             "document": serialize_doc(document_data)
@@ -1554,6 +2611,7 @@ async def upload_document(
         }
         
         await db.documents.insert_one(document_doc)
+        await refresh_user_documents_status(current_user["id"], current_user["role"])
         
         return {
             "message": "Document uploaded successfully",
@@ -1581,7 +2639,7 @@ async def get_user_documents(current_user = Depends(get_current_user)):
 
 # Manager Routes
 @api_router.get("/manager/enrollments")
-async def get_pending_enrollments(current_user = Depends(get_current_user)):
+async def get_pending_enrollments(ready_only: bool = False, current_user = Depends(get_current_user)):
     try:
         if current_user["role"] != "manager":
             raise HTTPException(status_code=403, detail="Only managers can access this")
@@ -1598,13 +2656,27 @@ async def get_pending_enrollments(current_user = Depends(get_current_user)):
         })
         enrollments = await enrollments_cursor.to_list(length=None)
         
-        # Get student information for each enrollment
+        # Get student information for all enrollments in one query
+        students_query = {"id": {"$in": [e["student_id"] for e in enrollments]}}
+        if ready_only:
+            students_query["documents_status.complete"] = True
+        students_cursor = db.users.find(
+            students_query,
+            {"id": 1, "first_name": 1, "last_name": 1, "email": 1, "phone": 1, "documents_status": 1}
+        )
+        students = {s["id"]: s for s in await students_cursor.to_list(length=None)}
+        
+        if ready_only:
+            enrollments = [e for e in enrollments if e["student_id"] in students]
+        
         for enrollment in enrollments:
-            student = await db.users.find_one({"id": enrollment["student_id"]})
+            student = students.get(enrollment["student_id"])
             if student:
                 enrollment["student_name"] = f"{student['first_name']} {student['last_name']}"
                 enrollment["student_email"] = student["email"]
                 enrollment["student_phone"] = student["phone"]
+                enrollment["documents_status"] = student.get("documents_status")
+                enrollment["documents_complete"] = student.get("documents_status", {}).get("complete", False)
         
         return {"enrollments": serialize_doc(enrollments)}
     
@@ -1637,8 +2709,8 @@ async def approve_enrollment(
             raise HTTPException(status_code=403, detail="Unauthorized to approve this enrollment")
         
         # Check if student has uploaded all required documents
-        documents_complete = await check_user_documents_complete(
-            enrollment["student_id"], 
+        documents_complete = enrollment["student_id"] in await get_users_with_complete_documents(
+            [enrollment["student_id"]],
             "student"
         )
         
@@ -1670,7 +2742,7 @@ async def approve_enrollment(
             "metadata": {"enrollment_id": enrollment_id, "school_name": school["name"]},
             "created_at": datetime.utcnow()
         }
-        await db.notifications.insert_one(notification_doc)
+        await insert_notifications([notification_doc])
         
         return {"message": "Enrollment approved successfully"}
     
@@ -1720,7 +2792,7 @@ async def reject_enrollment(
             "metadata": {"enrollment_id": enrollment_id, "school_name": school["name"], "reason": reason},
             "created_at": datetime.utcnow()
         }
-        await db.notifications.insert_one(notification_doc)
+        await insert_notifications([notification_doc])
         
         return {"message": "Enrollment rejected"}
     
@@ -1730,6 +2802,166 @@ async def reject_enrollment(
             raise e
         raise HTTPException(status_code=500, detail="Failed to reject enrollment")
 
+async def _load_manager_enrollments(enrollment_ids: List[str], current_user: dict):
+    """Load the manager's school and the requested enrollments that belong to it"""
+    school = await db.driving_schools.find_one({"manager_id": current_user["id"]})
+    if not school:
+        raise HTTPException(status_code=404, detail="No driving school found for this manager")
+    
+    enrollments_cursor = db.enrollments.find({
+        "id": {"$in": enrollment_ids},
+        "driving_school_id": school["id"]
+    })
+    enrollments = await enrollments_cursor.to_list(length=None)
+    return school, {e["id"]: e for e in enrollments}
+
+@api_router.post("/manager/enrollments/bulk-approve")
+async def bulk_approve_enrollments(
+    action: BulkEnrollmentAction,
+    current_user = Depends(get_current_user)
+):
+    try:
+        if current_user["role"] != "manager":
+            raise HTTPException(status_code=403, detail="Only managers can approve enrollments")
+        
+        enrollment_ids = list(dict.fromkeys(action.enrollment_ids))
+        school, enrollments = await _load_manager_enrollments(enrollment_ids, current_user)
+        
+        # Check document completeness for every student in one aggregation
+        complete_students = await get_users_with_complete_documents(
+            [e["student_id"] for e in enrollments.values()],
+            "student"
+        )
+        
+        results = []
+        approved = []
+        for enrollment_id in enrollment_ids:
+            enrollment = enrollments.get(enrollment_id)
+            if not enrollment:
+                results.append({"enrollment_id": enrollment_id, "status": "failed", "detail": "Enrollment not found"})
+            elif enrollment["enrollment_status"] not in [EnrollmentStatus.PENDING_DOCUMENTS, EnrollmentStatus.PENDING_APPROVAL]:
+                results.append({"enrollment_id": enrollment_id, "status": "failed", "detail": f"Enrollment is already {enrollment['enrollment_status']}"})
+            elif enrollment["student_id"] not in complete_students:
+                results.append({"enrollment_id": enrollment_id, "status": "failed", "detail": "Student has not uploaded all required documents"})
+            else:
+                approved.append(enrollment)
+                results.append({"enrollment_id": enrollment_id, "status": "approved"})
+        
+        if approved:
+            now = datetime.utcnow()
+            approved_ids = [e["id"] for e in approved]
+            
+            # Approve enrollments
+            await db.enrollments.bulk_write([
+                UpdateOne(
+                    {"id": enrollment_id},
+                    {"$set": {"enrollment_status": EnrollmentStatus.APPROVED, "approved_at": now}}
+                )
+                for enrollment_id in approved_ids
+            ], ordered=False)
+            
+            # Update course availability for all approved enrollments
+            courses_cursor = db.courses.find({"enrollment_id": {"$in": approved_ids}})
+            courses_by_enrollment = {}
+            for course in await courses_cursor.to_list(length=None):
+                courses_by_enrollment.setdefault(course["enrollment_id"], []).append(course)
+            
+            course_updates = [
+                UpdateOne({"id": course_id}, {"$set": {"status": new_status, "updated_at": now}})
+                for courses in courses_by_enrollment.values()
+                for course_id, new_status in plan_course_availability(courses)
+            ]
+            if course_updates:
+                await db.courses.bulk_write(course_updates, ordered=False)
+            
+            # Send notifications to students
+            await insert_notifications([
+                {
+                    "id": str(uuid.uuid4()),
+                    "user_id": enrollment["student_id"],
+                    "type": NotificationType.ENROLLMENT_APPROVED,
+                    "title": "Enrollment Approved!",
+                    "message": f"Your enrollment at {school['name']} has been approved. You can now start your courses!",
+                    "is_read": False,
+                    "metadata": {"enrollment_id": enrollment["id"], "school_name": school["name"]},
+                    "created_at": now
+                }
+                for enrollment in approved
+            ])
+        
+        return {
+            "approved": len(approved),
+            "failed": len(results) - len(approved),
+            "results": results
+        }
+    
+    except Exception as e:
+        logger.error(f"Bulk approve enrollments error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to approve enrollments")
+
+@api_router.post("/manager/enrollments/bulk-reject")
+async def bulk_reject_enrollments(
+    action: BulkEnrollmentAction,
+    current_user = Depends(get_current_user)
+):
+    try:
+        if current_user["role"] != "manager":
+            raise HTTPException(status_code=403, detail="Only managers can reject enrollments")
+        
+        if not action.reason:
+            raise HTTPException(status_code=400, detail="A rejection reason is required")
+        
+        enrollment_ids = list(dict.fromkeys(action.enrollment_ids))
+        school, enrollments = await _load_manager_enrollments(enrollment_ids, current_user)
+        
+        results = []
+        rejected = []
+        for enrollment_id in enrollment_ids:
+            enrollment = enrollments.get(enrollment_id)
+            if not enrollment:
+                results.append({"enrollment_id": enrollment_id, "status": "failed", "detail": "Enrollment not found"})
+            else:
+                rejected.append(enrollment)
+                results.append({"enrollment_id": enrollment_id, "status": "rejected"})
+        
+        if rejected:
+            now = datetime.utcnow()
+            
+            # Reject enrollments
+            await db.enrollments.update_many(
+                {"id": {"$in": [e["id"] for e in rejected]}},
+                {"$set": {"enrollment_status": EnrollmentStatus.REJECTED}}
+            )
+            
+            # Send notifications to students
+            await insert_notifications([
+                {
+                    "id": str(uuid.uuid4()),
+                    "user_id": enrollment["student_id"],
+                    "type": NotificationType.ENROLLMENT_REJECTED,
+                    "title": "Enrollment Rejected",
+                    "message": f"Your enrollment at {school['name']} was rejected. Reason: {action.reason}",
+                    "is_read": False,
+                    "metadata": {"enrollment_id": enrollment["id"], "school_name": school["name"], "reason": action.reason},
+                    "created_at": now
+                }
+                for enrollment in rejected
+            ])
+        
+        return {
+            "rejected": len(rejected),
+            "failed": len(results) - len(rejected),
+            "results": results
+        }
+    
+    except Exception as e:
+        logger.error(f"Bulk reject enrollments error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to reject enrollments")
+
 # DRIVING SCHOOL MANAGEMENT ENDPOINTS
 
 @api_router.post("/driving-schools")
@@ -2094,11 +3326,13 @@ async def create_quiz(
             "passing_score": quiz_data.passing_score,
             "time_limit_minutes": quiz_data.time_limit_minutes,
             "is_active": True,
+            "version": 1,
             "created_by": current_user["id"],
             "created_at": datetime.utcnow()
         }
         
         await db.quizzes.insert_one(quiz_doc)
+        await bump_quiz_bank_version()
         
         return {"quiz_id": quiz_id, "message": "Quiz created successfully"}
     
@@ -2115,23 +3349,111 @@ async def get_quizzes(
     current_user = Depends(get_current_user)
 ):
     try:
-        query = {"is_active": True}
+        # Only managers get answer keys
+        is_manager = current_user["role"] == "manager"
+        quizzes = [
+            compiled.quiz if is_manager else compiled.public_quiz
+            for compiled in await get_active_quizzes()
+            if (not course_type or compiled.quiz["course_type"] == course_type)
+            and (not difficulty or compiled.quiz["difficulty"] == difficulty)
+        ]
         
+        return serialize_doc(quizzes)
+    
+    except Exception as e:
+        logger.error(f"Get quizzes error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve quizzes")
+
+@api_router.get("/quizzes/summary")
+async def get_quiz_summaries(
+    course_type: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = QUIZ_PAGE_DEFAULT_LIMIT,
+    current_user = Depends(get_current_user)
+):
+    """Get a page of active quizzes without their questions"""
+    try:
+        query = {"is_active": True, "is_practice": {"$ne": True}}
         if course_type:
             query["course_type"] = course_type
         if difficulty:
             query["difficulty"] = difficulty
+        if cursor:
+            query["id"] = {"$gt": cursor}
+        
+        limit = max(1, min(limit, QUIZ_PAGE_MAX_LIMIT))
+        quizzes = await db.quizzes.aggregate([
+            {"$match": query},
+            {"$sort": {"id": 1}},
+            {"$limit": limit + 1},
+            {"$project": QUIZ_SUMMARY_PROJECTION}
+        ]).to_list(length=limit + 1)
+        
+        next_cursor = None
+        if len(quizzes) > limit:
+            quizzes = quizzes[:limit]
+            next_cursor = quizzes[-1]["id"]
+        
+        return {"quizzes": serialize_doc(quizzes), "next_cursor": next_cursor}
+    
+    except Exception as e:
+        logger.error(f"Get quiz summaries error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve quizzes")
+
+@api_router.get("/quizzes/packs/{course_type}")
+async def get_quiz_pack_bundle(
+    course_type: CourseType,
+    request: Request,
+    difficulty: Optional[QuizDifficulty] = None,
+    answers: str = "none",
+    current_user = Depends(get_current_user)
+):
+    """Download a course type's quizzes in one gzipped bundle, revalidated with ETags"""
+    try:
+        if answers not in QUIZ_PACK_ANSWER_MODES:
+            raise HTTPException(status_code=400, detail=f"answers must be one of {', '.join(QUIZ_PACK_ANSWER_MODES)}")
         
-        quizzes_cursor = db.quizzes.find(query)
-        quizzes = await quizzes_cursor.to_list(length=None)
+        pack = await get_quiz_pack(course_type, difficulty, answers)
+        use_gzip = "gzip" in request.headers.get("accept-encoding", "")
+        etag = pack.gzip_etag if use_gzip else pack.etag
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
         
-        return serialize_doc(quizzes)
+        if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=headers)
+        
+        if use_gzip:
+            return Response(content=pack.gzipped, media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+        return Response(content=pack.body, media_type="application/json", headers=headers)
     
     except Exception as e:
-        logger.error(f"Get quizzes error: {str(e)}")
+        logger.error(f"Get quiz pack error: {str(e)}")
         if isinstance(e, HTTPException):
             raise e
-        raise HTTPException(status_code=500, detail="Failed to retrieve quizzes")
+        raise HTTPException(status_code=500, detail="Failed to build quiz pack")
+
+@api_router.get("/quizzes/{quiz_id}/take")
+async def get_quiz_for_taking(
+    quiz_id: str,
+    current_user = Depends(get_current_user)
+):
+    """Get one quiz with its questions but without the answers"""
+    try:
+        quiz = await get_compiled_quiz(quiz_id)
+        if not quiz or quiz.quiz.get("student_id", current_user["id"]) != current_user["id"]:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+        
+        return serialize_doc(quiz.public_quiz)
+    
+    except Exception as e:
+        logger.error(f"Get quiz error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve quiz")
 
 @api_router.post("/quizzes/{quiz_id}/attempt")
 async def take_quiz(
@@ -2143,23 +3465,15 @@ async def take_quiz(
         if current_user["role"] != "student":
             raise HTTPException(status_code=403, detail="Only students can take quizzes")
         
-        # Get quiz
-        quiz = await db.quizzes.find_one({"id": quiz_id, "is_active": True})
-        if not quiz:
+        # Get quiz from the cache
+        quiz = await get_compiled_quiz(quiz_id)
+        if not quiz or quiz.quiz.get("student_id", current_user["id"]) != current_user["id"]:
             raise HTTPException(status_code=404, detail="Quiz not found")
         
         # Calculate score
-        total_questions = len(quiz["questions"])
-        correct_answers = 0
-        
-        for i, question in enumerate(quiz["questions"]):
-            student_answer = answers.get(str(i))
-            correct_answer = question["correct_answer"]
-            if student_answer == correct_answer:
-                correct_answers += 1
-        
-        score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
-        passed = score >= quiz["passing_score"]
+        total_questions = quiz.question_count
+        correct_answers, score = quiz.grade(answers)
+        passed = score >= quiz.passing_score
         
         # Save attempt
         attempt_id = str(uuid.uuid4())
@@ -2176,6 +3490,9 @@ async def take_quiz(
         }
         
         await db.quiz_attempts.insert_one(attempt_doc)
+        await record_item_stats(quiz, [answers], [score])
+        if not quiz.quiz.get("is_practice"):
+            await record_leaderboard_attempt(current_user, score)
         
         return {
             "attempt_id": attempt_id,
@@ -2191,6 +3508,303 @@ async def take_quiz(
             raise e
         raise HTTPException(status_code=500, detail="Failed to take quiz")
 
+def parse_client_datetime(value: str) -> datetime:
+    """Parse an ISO 8601 string from a device into naive UTC, like datetime.utcnow()"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00") if value.endswith("Z") else value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+@api_router.post("/quizzes/attempts/batch")
+async def submit_quiz_attempts_batch(
+    batch: QuizAttemptBatch,
+    current_user = Depends(get_current_user)
+):
+    """Sync quiz attempts taken offline; attempts already stored are reported, not duplicated"""
+    try:
+        if current_user["role"] != "student":
+            raise HTTPException(status_code=403, detail="Only students can take quizzes")
+        
+        if len(batch.attempts) > MAX_QUIZ_ATTEMPT_BATCH:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_QUIZ_ATTEMPT_BATCH} attempts per batch")
+        
+        submissions = list({a.client_attempt_id: a for a in reversed(batch.attempts)}.values())[::-1]
+        
+        # Attempts synced by an earlier (possibly interrupted) request
+        existing_cursor = db.quiz_attempts.find(
+            {"student_id": current_user["id"], "client_attempt_id": {"$in": [a.client_attempt_id for a in submissions]}},
+            {"id": 1, "client_attempt_id": 1, "score": 1, "passed": 1}
+        )
+        existing = {a["client_attempt_id"]: a for a in await existing_cursor.to_list(length=None)}
+        
+        results = {}
+        by_quiz = {}
+        for submission in submissions:
+            if submission.client_attempt_id in existing:
+                stored = existing[submission.client_attempt_id]
+                results[submission.client_attempt_id] = {
+                    "status": "duplicate", "attempt_id": stored["id"], "score": stored["score"], "passed": stored["passed"]
+                }
+            else:
+                by_quiz.setdefault(submission.quiz_id, []).append(submission)
+        
+        now = datetime.utcnow()
+        attempt_docs = []
+        graded_quizzes = {}
+        for quiz_id, quiz_submissions in by_quiz.items():
+            quiz = await get_compiled_quiz(quiz_id)
+            if not quiz or quiz.quiz.get("student_id", current_user["id"]) != current_user["id"]:
+                for submission in quiz_submissions:
+                    results[submission.client_attempt_id] = {"status": "failed", "detail": "Quiz not found"}
+                continue
+            graded_quizzes[quiz_id] = quiz  # Kept for the stats below, which must not depend on the cache
+            
+            correct_answers, scores = quiz.grade_many([submission.answers for submission in quiz_submissions])
+            for submission, correct, score in zip(quiz_submissions, correct_answers, scores):
+                try:
+                    started_at = parse_client_datetime(submission.started_at) if submission.started_at else now
+                    completed_at = parse_client_datetime(submission.completed_at) if submission.completed_at else now
+                except (ValueError, TypeError):
+                    results[submission.client_attempt_id] = {"status": "failed", "detail": "Invalid date format"}
+                    continue
+                
+                attempt_doc = {
+                    "id": str(uuid.uuid4()),
+                    "client_attempt_id": submission.client_attempt_id,
+                    "quiz_id": quiz_id,
+                    "student_id": current_user["id"],
+                    "answers": submission.answers,
+                    "score": float(score),
+                    "passed": bool(score >= quiz.passing_score),
+                    "started_at": started_at,
+                    "completed_at": completed_at,
+                    "time_taken_minutes": max(0, int((completed_at - started_at).total_seconds() // 60))
+                }
+                attempt_docs.append(attempt_doc)
+                results[submission.client_attempt_id] = {
+                    "status": "accepted",
+                    "attempt_id": attempt_doc["id"],
+                    "score": attempt_doc["score"],
+                    "passed": attempt_doc["passed"],
+                    "correct_answers": int(correct),
+                    "total_questions": quiz.question_count
+                }
+        
+        if attempt_docs:
+            try:
+                await db.quiz_attempts.insert_many(attempt_docs, ordered=False)
+            except BulkWriteError as e:
+                # A concurrent retry stored some of these first; the unique index kept one copy
+                duplicate_ids = []
+                for error in e.details.get("writeErrors", []):
+                    if error.get("code") != 11000:
+                        raise
+                    client_attempt_id = attempt_docs[error["index"]]["client_attempt_id"]
+                    results[client_attempt_id] = {"status": "duplicate"}
+                    duplicate_ids.append(client_attempt_id)
+                async for stored in db.quiz_attempts.find(
+                    {"student_id": current_user["id"], "client_attempt_id": {"$in": duplicate_ids}},
+                    {"id": 1, "client_attempt_id": 1, "score": 1, "passed": 1}
+                ):
+                    results[stored["client_attempt_id"]] = {
+                        "status": "duplicate", "attempt_id": stored["id"], "score": stored["score"], "passed": stored["passed"]
+                    }
+            
+            stored_by_quiz = {}
+            for attempt_doc in attempt_docs:
+                if results[attempt_doc["client_attempt_id"]]["status"] == "accepted":
+                    stored_by_quiz.setdefault(attempt_doc["quiz_id"], []).append(attempt_doc)
+            for quiz_id, stored in stored_by_quiz.items():
+                quiz = graded_quizzes[quiz_id]
+                await record_item_stats(
+                    quiz,
+                    [attempt_doc["answers"] for attempt_doc in stored],
+                    [attempt_doc["score"] for attempt_doc in stored]
+                )
+                if not quiz.quiz.get("is_practice"):
+                    for attempt_doc in stored:
+                        await record_leaderboard_attempt(current_user, attempt_doc["score"])
+        
+        statuses = [result["status"] for result in results.values()]
+        return {
+            "accepted": statuses.count("accepted"),
+            "duplicates": statuses.count("duplicate"),
+            "failed": statuses.count("failed"),
+            "results": [
+                {"client_attempt_id": submission.client_attempt_id, **results[submission.client_attempt_id]}
+                for submission in submissions
+            ]
+        }
+    
+    except Exception as e:
+        logger.error(f"Batch quiz attempts error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to submit quiz attempts")
+
+@api_router.post("/quizzes/adaptive")
+async def create_adaptive_quiz(
+    request: AdaptiveQuizRequest,
+    current_user = Depends(get_current_user)
+):
+    """Assemble a practice quiz matched to the student's estimated ability"""
+    try:
+        if current_user["role"] != "student":
+            raise HTTPException(status_code=403, detail="Only students can take quizzes")
+        
+        if not 1 <= request.question_count <= ADAPTIVE_MAX_QUESTIONS:
+            raise HTTPException(status_code=400, detail=f"question_count must be between 1 and {ADAPTIVE_MAX_QUESTIONS}")
+        
+        bank = await get_item_bank(request.course_type)
+        if len(bank.difficulties) == 0:
+            raise HTTPException(status_code=404, detail="No questions available for this course type")
+        
+        # Recent attempts on this course type, bank quizzes and earlier practice quizzes alike
+        attempts = await db.quiz_attempts.find(
+            {"student_id": current_user["id"]},
+            {"quiz_id": 1, "score": 1}
+        ).sort("completed_at", -1).limit(ADAPTIVE_HISTORY_LIMIT).to_list(length=None)
+        
+        quiz_difficulty = dict(bank.quiz_difficulty)
+        unknown_ids = list({a["quiz_id"] for a in attempts if a["quiz_id"] not in quiz_difficulty})
+        if unknown_ids:
+            async for practice in db.quizzes.find(
+                {"id": {"$in": unknown_ids}, "is_practice": True, "course_type": request.course_type},
+                {"id": 1, "mean_difficulty": 1, "question_count": 1}
+            ):
+                quiz_difficulty[practice["id"]] = (practice["mean_difficulty"], practice["question_count"])
+        
+        ability = estimate_ability([
+            (a["score"], *quiz_difficulty[a["quiz_id"]]) for a in attempts if a["quiz_id"] in quiz_difficulty
+        ])
+        
+        selected = bank.select(ability, request.question_count)
+        mean_difficulty = float(bank.difficulties[selected].mean())
+        questions = [
+            {**bank.questions[i], "source": {"quiz_id": bank.refs[i][0], "question_index": bank.refs[i][1]}}
+            for i in selected
+        ]
+        
+        if mean_difficulty < -0.5:
+            difficulty = QuizDifficulty.EASY
+        elif mean_difficulty > 0.5:
+            difficulty = QuizDifficulty.HARD
+        else:
+            difficulty = QuizDifficulty.MEDIUM
+        
+        quiz_id = str(uuid.uuid4())
+        quiz_doc = {
+            "id": quiz_id,
+            "course_type": request.course_type,
+            "title": "Practice quiz",
+            "description": "Questions picked for your current level",
+            "difficulty": difficulty,
+            "questions": questions,
+            "passing_score": 70.0,
+            "time_limit_minutes": 30,
+            "is_active": True,
+            "is_practice": True,
+            "student_id": current_user["id"],
+            "estimated_ability": ability,
+            "mean_difficulty": mean_difficulty,
+            "question_count": len(questions),
+            "version": 1,
+            "created_by": current_user["id"],
+            "created_at": datetime.utcnow()
+        }
+        
+        # Practice quizzes are private, so the shared quiz bank version is left alone
+        await db.quizzes.insert_one(quiz_doc)
+        
+        return {"quiz": serialize_doc(strip_quiz_answers(quiz_doc)), "estimated_ability": round(ability, 3)}
+    
+    except Exception as e:
+        logger.error(f"Create adaptive quiz error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to create practice quiz")
+
+@api_router.get("/quizzes/{quiz_id}/item-stats")
+async def get_quiz_item_stats(
+    quiz_id: str,
+    flagged_only: bool = False,
+    current_user = Depends(get_current_user)
+):
+    """Per-question difficulty, discrimination and distractor counts for quiz review"""
+    try:
+        if current_user["role"] != "manager":
+            raise HTTPException(status_code=403, detail="Only managers can view quiz statistics")
+        
+        quiz = await db.quizzes.find_one({"id": quiz_id})
+        if not quiz:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+        
+        stats_by_index = {
+            stats["question_index"]: stats
+            async for stats in db.quiz_item_stats.find({"quiz_id": quiz_id})
+        }
+        
+        items = []
+        for index, question in enumerate(quiz["questions"]):
+            item = summarize_item_stats(stats_by_index.get(index, {}))
+            if flagged_only and not item["flags"]:
+                continue
+            items.append({
+                "question_index": index,
+                "question": question.get("question"),
+                "correct_answer": question_answer_key(question),
+                **item
+            })
+        
+        return {"quiz_id": quiz_id, "title": quiz["title"], "items": items}
+    
+    except Exception as e:
+        logger.error(f"Get quiz item stats error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve quiz statistics")
+
+@api_router.get("/leaderboards/{scope}/{key}")
+async def get_leaderboard(
+    scope: str,
+    key: str,
+    limit: int = 10,
+    current_user = Depends(get_current_user)
+):
+    """Top students by average quiz score for a school or wilaya, plus the caller's rank"""
+    try:
+        if scope not in ("school", "wilaya"):
+            raise HTTPException(status_code=400, detail="Scope must be 'school' or 'wilaya'")
+        
+        board = _leaderboards.get(f"{scope}:{key}") or Leaderboard()
+        top = board.top(max(1, min(limit, LEADERBOARD_MAX_TOP)))
+        
+        names = {
+            user["id"]: f"{user['first_name']} {user['last_name'][:1]}."
+            async for user in db.users.find(
+                {"id": {"$in": [student_id for student_id, _, _ in top]}},
+                {"id": 1, "first_name": 1, "last_name": 1}
+            )
+        }
+        
+        my_rank = board.rank(current_user["id"])
+        return {
+            "scope": scope,
+            "key": key,
+            "total_ranked": len(board),
+            "top": [
+                {"student_id": student_id, "name": names.get(student_id, "Unknown Student"), "average_score": average, "rank": rank}
+                for student_id, average, rank in top
+            ],
+            "my_rank": {"rank": my_rank[0], "average_score": my_rank[1]} if my_rank else None
+        }
+    
+    except Exception as e:
+        logger.error(f"Get leaderboard error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve leaderboard")
+
 # VIDEO ROOM ENDPOINTS
 
 @api_router.post("/video-rooms")
@@ -2348,24 +3962,47 @@ async def schedule_session(
         if not teacher:
             raise HTTPException(status_code=404, detail="Teacher not found or not approved")
         
-        # Create session
-        session_id = str(uuid.uuid4())
-        session_doc = {
-            "id": session_id,
-            "course_id": session_data.course_id,
-            "teacher_id": session_data.teacher_id,
-            "student_id": current_user["id"],
-            "session_type": course["course_type"],
-            "scheduled_at": datetime.fromisoformat(session_data.scheduled_at),
-            "duration_minutes": session_data.duration_minutes,
-            "location": session_data.location,
-            "status": SessionStatus.SCHEDULED,
-            "notes": None,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
+        if not 0 < session_data.duration_minutes <= MAX_SESSION_DURATION_MINUTES:
+            raise HTTPException(status_code=400, detail=f"Session duration must be between 1 and {MAX_SESSION_DURATION_MINUTES} minutes")
         
-        await db.sessions.insert_one(session_doc)
+        try:
+            scheduled_at = datetime.fromisoformat(session_data.scheduled_at)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use ISO 8601")
+        if not is_on_calendar_grid(scheduled_at):
+            raise HTTPException(status_code=400, detail=f"Sessions must start on a {CALENDAR_SLOT_MINUTES}-minute boundary")
+        
+        # Check teacher and student calendars
+        if await find_session_conflict("teacher_id", session_data.teacher_id, scheduled_at, session_data.duration_minutes):
+            raise HTTPException(status_code=409, detail="Teacher already has a session at this time")
+        if await find_session_conflict("student_id", current_user["id"], scheduled_at, session_data.duration_minutes):
+            raise HTTPException(status_code=409, detail="You already have a session at this time")
+        
+        teacher_user = await db.users.find_one({"id": teacher["user_id"]}, {"first_name": 1, "last_name": 1})
+        teacher_name = f"{teacher_user['first_name']} {teacher_user['last_name']}" if teacher_user else "Unknown Teacher"
+        
+        session_doc = new_session_doc(
+            course,
+            teacher,
+            teacher_name,
+            current_user,
+            scheduled_at,
+            session_data.duration_minutes,
+            session_data.location
+        )
+        session_id = session_doc["id"]
+        
+        # Reserve the time atomically so concurrent requests cannot double-book
+        owner_keys = [f"teacher:{session_data.teacher_id}", f"student:{current_user['id']}"]
+        if not await claim_calendar_slots(calendar_slot_docs(session_id, owner_keys, scheduled_at, session_data.duration_minutes)):
+            raise HTTPException(status_code=409, detail="This time slot was just booked, please choose another")
+        
+        try:
+            await db.sessions.insert_one(session_doc)
+        except Exception:
+            await release_calendar_slots([session_id])
+            raise
+        invalidate_slot_search_cache(teacher["driving_school_id"])
         
         return {"session_id": session_id, "message": "Session scheduled successfully"}
     
@@ -2375,21 +4012,267 @@ async def schedule_session(
             raise e
         raise HTTPException(status_code=500, detail="Failed to schedule session")
 
+@api_router.get("/courses/{course_id}/available-slots")
+async def get_available_slots(
+    course_id: str,
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    duration_minutes: int = 60,
+    limit: int = 10,
+    current_user = Depends(get_current_user)
+):
+    """Earliest free session slots across all approved teachers of the course's school"""
+    try:
+        if current_user["role"] != "student":
+            raise HTTPException(status_code=403, detail="Only students can search session slots")
+        
+        course = await db.courses.find_one({"id": course_id})
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
+        
+        enrollment = await db.enrollments.find_one({"id": course["enrollment_id"], "student_id": current_user["id"]})
+        if not enrollment:
+            raise HTTPException(status_code=403, detail="You are not enrolled in this course")
+        
+        if not 0 < duration_minutes <= MAX_SESSION_DURATION_MINUTES:
+            raise HTTPException(status_code=400, detail=f"Session duration must be between 1 and {MAX_SESSION_DURATION_MINUTES} minutes")
+        
+        try:
+            window_start = datetime.fromisoformat(from_date) if from_date else datetime.utcnow()
+            window_end = datetime.fromisoformat(to_date) if to_date else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use ISO 8601")
+        
+        # Round both ends up to the search grid so cache keys are shared between requests
+        window_start = round_up_to_slot_grid(max(window_start, datetime.utcnow()))
+        window_end = round_up_to_slot_grid(window_end) if window_end else window_start + timedelta(days=14)
+        if window_end <= window_start:
+            raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+        window_end = min(window_end, window_start + timedelta(days=SLOT_SEARCH_MAX_DAYS))
+        
+        school_slots = await find_school_free_slots(
+            enrollment["driving_school_id"],
+            current_user.get("gender"),
+            window_start,
+            window_end,
+            duration_minutes
+        )
+        
+        # Drop slots that clash with the student's own sessions
+        student_sessions = await db.sessions.find({
+            "student_id": current_user["id"],
+            "scheduled_at": {"$gt": window_start - timedelta(minutes=MAX_SESSION_DURATION_MINUTES), "$lt": window_end},
+            "status": {"$in": ACTIVE_SESSION_STATUSES}
+        }, {"scheduled_at": 1, "duration_minutes": 1}).to_list(length=None)
+        student_busy = sorted(
+            (session["scheduled_at"], session["scheduled_at"] + timedelta(minutes=session["duration_minutes"]))
+            for session in student_sessions
+        )
+        
+        slots = []
+        for slot in school_slots["slots"]:
+            if interval_is_free(student_busy, slot["start"], slot["end"]):
+                slots.append({
+                    "start": slot["start"],
+                    "end": slot["end"],
+                    "teachers": [
+                        {"teacher_id": teacher_id, "teacher_name": school_slots["teachers"][teacher_id]}
+                        for teacher_id in slot["teacher_ids"]
+                    ]
+                })
+                if len(slots) >= limit:
+                    break
+        
+        return {
+            "course_id": course_id,
+            "course_type": course["course_type"],
+            "duration_minutes": duration_minutes,
+            "slots": serialize_doc(slots)
+        }
+    
+    except Exception as e:
+        logger.error(f"Get available slots error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to retrieve available slots")
+
+@api_router.post("/courses/{course_id}/auto-schedule")
+async def auto_schedule_course(
+    course_id: str,
+    plan: AutoScheduleRequest,
+    current_user = Depends(get_current_user)
+):
+    """Schedule all remaining sessions of a course in one call"""
+    try:
+        if current_user["role"] != "student":
+            raise HTTPException(status_code=403, detail="Only students can schedule sessions")
+        
+        course = await db.courses.find_one({"id": course_id})
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
+        
+        enrollment = await db.enrollments.find_one({"id": course["enrollment_id"], "student_id": current_user["id"]})
+        if not enrollment:
+            raise HTTPException(status_code=403, detail="You are not enrolled in this course")
+        
+        if course["status"] in [CourseStatus.LOCKED, CourseStatus.COMPLETED]:
+            raise HTTPException(status_code=400, detail="Course is not open for scheduling")
+        
+        if not 0 < plan.duration_minutes <= MAX_SESSION_DURATION_MINUTES:
+            raise HTTPException(status_code=400, detail=f"Session duration must be between 1 and {MAX_SESSION_DURATION_MINUTES} minutes")
+        if not 0 <= plan.earliest_hour < plan.latest_hour <= 24 or not plan.weekdays:
+            raise HTTPException(status_code=400, detail="Invalid time window")
+        if any(not 0 <= weekday <= 6 for weekday in plan.weekdays):
+            raise HTTPException(status_code=400, detail="Weekdays must be between 0 (Monday) and 6 (Sunday)")
+        if not 1 <= plan.horizon_days <= AUTO_SCHEDULE_MAX_HORIZON_DAYS:
+            raise HTTPException(status_code=400, detail=f"horizon_days must be between 1 and {AUTO_SCHEDULE_MAX_HORIZON_DAYS}")
+        if not 0 <= plan.min_spacing_hours <= AUTO_SCHEDULE_MAX_SPACING_HOURS:
+            raise HTTPException(status_code=400, detail=f"min_spacing_hours must be between 0 and {AUTO_SCHEDULE_MAX_SPACING_HOURS}")
+        
+        try:
+            start_day = datetime.fromisoformat(plan.start_date).replace(hour=0, minute=0, second=0, microsecond=0)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+        
+        booked_sessions = await db.sessions.find({
+            "course_id": course_id,
+            "status": {"$in": ACTIVE_SESSION_STATUSES}
+        }, {"scheduled_at": 1, "duration_minutes": 1}).to_list(length=None)
+        remaining = course["total_sessions"] - course["completed_sessions"] - len(booked_sessions)
+        if remaining <= 0:
+            raise HTTPException(status_code=400, detail="All sessions of this course are already scheduled")
+        
+        # Approved teachers of the school who can teach this student
+        teacher_query = {"driving_school_id": enrollment["driving_school_id"], "is_approved": True}
+        if current_user.get("gender") == "female":
+            teacher_query["can_teach_female"] = True
+        else:
+            teacher_query["can_teach_male"] = True
+        teachers = await db.teachers.find(
+            teacher_query, {"id": 1, "user_id": 1, "driving_school_id": 1}
+        ).to_list(length=None)
+        if not teachers:
+            raise HTTPException(status_code=404, detail="No approved teachers available for this course")
+        teachers_by_id = {teacher["id"]: teacher for teacher in teachers}
+        
+        # Load busy intervals for the planning window with one query per calendar
+        window_end = start_day + timedelta(days=plan.horizon_days)
+        busy_window = {"$gt": start_day - timedelta(minutes=MAX_SESSION_DURATION_MINUTES), "$lt": window_end}
+        projection = {"teacher_id": 1, "scheduled_at": 1, "duration_minutes": 1}
+        
+        teacher_busy = {teacher["id"]: [] for teacher in teachers}
+        teacher_sessions = await db.sessions.find({
+            "teacher_id": {"$in": list(teacher_busy)},
+            "scheduled_at": busy_window,
+            "status": {"$in": ACTIVE_SESSION_STATUSES}
+        }, projection).to_list(length=None)
+        # Compared as slot spans, so a plan that passes these checks can always claim its slots
+        for session in teacher_sessions:
+            teacher_busy[session["teacher_id"]].append(calendar_span(
+                session["scheduled_at"], session["scheduled_at"] + timedelta(minutes=session["duration_minutes"])
+            ))
+        
+        student_sessions = await db.sessions.find({
+            "student_id": current_user["id"],
+            "scheduled_at": busy_window,
+            "status": {"$in": ACTIVE_SESSION_STATUSES}
+        }, projection).to_list(length=None)
+        student_busy = sorted(
+            calendar_span(session["scheduled_at"], session["scheduled_at"] + timedelta(minutes=session["duration_minutes"]))
+            for session in student_sessions
+        )
+        for busy in teacher_busy.values():
+            busy.sort()
+        teacher_load = {teacher_id: len(busy) for teacher_id, busy in teacher_busy.items()}
+        
+        # Spacing is kept from the course's already booked sessions as well as the new ones
+        course_busy = sorted(
+            (session["scheduled_at"], session["scheduled_at"] + timedelta(minutes=session["duration_minutes"]))
+            for session in booked_sessions
+        )
+        
+        placements = plan_course_sessions(
+            plan, start_day, datetime.utcnow(), remaining,
+            teacher_busy, teacher_load, student_busy, course_busy, course.get("teacher_id")
+        )
+        
+        if not placements:
+            raise HTTPException(status_code=409, detail="No free slots found in the requested window")
+        
+        users_cursor = db.users.find(
+            {"id": {"$in": [teachers_by_id[teacher_id]["user_id"] for teacher_id, _ in placements]}},
+            {"id": 1, "first_name": 1, "last_name": 1}
+        )
+        teacher_names = {u["id"]: f"{u['first_name']} {u['last_name']}" for u in await users_cursor.to_list(length=None)}
+        
+        session_docs = [
+            new_session_doc(
+                course,
+                teachers_by_id[teacher_id],
+                teacher_names.get(teachers_by_id[teacher_id]["user_id"], "Unknown Teacher"),
+                current_user,
+                scheduled_at,
+                plan.duration_minutes,
+                plan.location
+            )
+            for teacher_id, scheduled_at in placements
+        ]
+        
+        # Reserve every planned slot atomically before writing the sessions
+        slot_docs = []
+        for session_doc in session_docs:
+            owner_keys = [f"teacher:{session_doc['teacher_id']}", f"student:{current_user['id']}"]
+            slot_docs.extend(calendar_slot_docs(session_doc["id"], owner_keys, session_doc["scheduled_at"], plan.duration_minutes))
+        if not await claim_calendar_slots(slot_docs):
+            raise HTTPException(status_code=409, detail="Some planned slots were just booked, please try again")
+        
+        try:
+            await db.sessions.insert_many(session_docs)
+        except Exception:
+            await release_calendar_slots([session_doc["id"] for session_doc in session_docs])
+            raise
+        invalidate_slot_search_cache(enrollment["driving_school_id"])
+        
+        return {
+            "message": f"{len(session_docs)} sessions scheduled successfully",
+            "scheduled": len(session_docs),
+            "unscheduled": remaining - len(session_docs),
+            "sessions": serialize_doc(session_docs)
+        }
+    
+    except Exception as e:
+        logger.error(f"Auto-schedule course error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to schedule course sessions")
+
 @api_router.get("/sessions/my")
-async def get_my_sessions(current_user = Depends(get_current_user)):
+async def get_my_sessions(
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    cursor: Optional[str] = None,
+    limit: int = SESSION_PAGE_DEFAULT_LIMIT,
+    sort_order: str = "asc",  # asc, desc
+    current_user = Depends(get_current_user)
+):
     try:
         query = {}
         if current_user["role"] == "student":
             query["student_id"] = current_user["id"]
         elif current_user["role"] == "teacher":
-            query["teacher_id"] = current_user["id"]
+            # Sessions reference the teacher record, not the user
+            teacher_ids = await db.teachers.distinct("id", {"user_id": current_user["id"]})
+            query["teacher_id"] = {"$in": teacher_ids}
         else:
             raise HTTPException(status_code=403, detail="Only students and teachers can view sessions")
         
-        sessions_cursor = db.sessions.find(query)
-        sessions = await sessions_cursor.to_list(length=None)
+        query = build_session_page_query(query, from_date, to_date, cursor, sort_order)
+        sessions, next_cursor = await fetch_session_page(query, sort_order, limit)
         
-        return serialize_doc(sessions)
+        return {
+            "sessions": serialize_doc(sessions),
+            "next_cursor": next_cursor
+        }
     
     except Exception as e:
         logger.error(f"Get sessions error: {str(e)}")
@@ -2478,18 +4361,18 @@ async def schedule_exam(
         if course["exam_status"] != ExamStatus.AVAILABLE:
             raise HTTPException(status_code=400, detail="Course is not ready for exam")
         
-        # Find available external expert
-        experts_cursor = db.external_experts.find({
-            "specialization": {"$in": [exam_data.exam_type]},
-            "is_available": True
-        })
-        experts = await experts_cursor.to_list(length=None)
-        
-        if not experts:
-            raise HTTPException(status_code=404, detail="No available external experts for this exam type")
+        try:
+            preferred_dates = [datetime.fromisoformat(date) for date in exam_data.preferred_dates]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use ISO 8601")
+        if not preferred_dates:
+            raise HTTPException(status_code=400, detail="At least one preferred date is required")
         
-        # Select first available expert (in real app, would have better logic)
-        expert = experts[0]
+        # Reserve the least-loaded expert of the student's wilaya on the earliest preferred date with capacity
+        assignment = await assign_external_expert(exam_data.exam_type, current_user.get("state"), preferred_dates)
+        if not assignment:
+            raise HTTPException(status_code=404, detail="No available external experts for this exam type in your wilaya on the preferred dates")
+        expert, scheduled_at = assignment
         
         # Create exam
         exam_id = str(uuid.uuid4())
@@ -2499,16 +4382,21 @@ async def schedule_exam(
             "student_id": current_user["id"],
             "external_expert_id": expert["id"],
             "exam_type": exam_data.exam_type,
-            "scheduled_at": datetime.fromisoformat(exam_data.preferred_dates[0]),  # Use first preferred date
+            "scheduled_at": scheduled_at,
+            "preferred_dates": preferred_dates,
             "location": exam_data.location,
-            "duration_minutes": 90,
+            "duration_minutes": EXAM_DURATION_MINUTES,
             "status": ExamStatus.AVAILABLE,
             "score": None,
             "notes": None,
             "created_at": datetime.utcnow()
         }
         
-        await db.exam_schedules.insert_one(exam_doc)
+        try:
+            await db.exam_schedules.insert_one(exam_doc)
+        except Exception:
+            await release_expert_slot(expert["id"], scheduled_at.date().isoformat())
+            raise
         
         return {"exam_id": exam_id, "message": "Exam scheduled successfully"}
     
@@ -2518,6 +4406,127 @@ async def schedule_exam(
             raise e
         raise HTTPException(status_code=500, detail="Failed to schedule exam")
 
+@api_router.post("/exams/batch")
+async def batch_school_exams(current_user = Depends(get_current_user)):
+    """Group the school's pending exams into shared sessions, one expert per session"""
+    try:
+        if current_user["role"] != "manager":
+            raise HTTPException(status_code=403, detail="Only managers can batch exams")
+        
+        school = await db.driving_schools.find_one({"manager_id": current_user["id"]})
+        if not school:
+            raise HTTPException(status_code=404, detail="No driving school found for this manager")
+        
+        # Pending, unbatched exams of the school's students
+        enrollment_ids = await db.enrollments.distinct("id", {"driving_school_id": school["id"]})
+        course_ids = await db.courses.distinct("id", {"enrollment_id": {"$in": enrollment_ids}})
+        exams_cursor = db.exam_schedules.find({
+            "course_id": {"$in": course_ids},
+            "status": ExamStatus.AVAILABLE,
+            "batch_id": {"$exists": False},
+            "scheduled_at": {"$gt": datetime.utcnow()}
+        })
+        exams = await exams_cursor.to_list(length=None)
+        
+        now = datetime.utcnow()
+        batch_docs = []
+        exams_batched = 0
+        for batch in pack_exam_batches(exams):
+            if len(batch["exams"]) < 2:
+                continue  # A single exam keeps its own booking
+            
+            # Start the session at the earliest requested time on the batch date
+            requested_times = [
+                date for exam in batch["exams"]
+                for date in exam.get("preferred_dates") or [exam["scheduled_at"]]
+                if date.date() == batch["date"]
+            ]
+            scheduled_at = min(requested_times)
+            
+            load_units = exam_load_units(batch["exam_type"], len(batch["exams"]))
+            assignment = await assign_external_expert(batch["exam_type"], school["state"], [scheduled_at], load_units)
+            if not assignment:
+                continue
+            expert, _ = assignment
+            
+            batch_id = str(uuid.uuid4())
+            batch_doc = {
+                "id": batch_id,
+                "driving_school_id": school["id"],
+                "exam_type": batch["exam_type"],
+                "location": batch["location"],
+                "external_expert_id": expert["id"],
+                "scheduled_at": scheduled_at,
+                "duration_minutes": exam_session_minutes(batch["exam_type"], len(batch["exams"])),
+                "capacity": EXAM_BATCH_CAPACITY.get(batch["exam_type"], 1),
+                "load_units": load_units,
+                "exam_ids": [exam["id"] for exam in batch["exams"]],
+                "created_at": now
+            }
+            exam_updates = [
+                UpdateOne(
+                    {"id": exam["id"], "batch_id": {"$exists": False}},
+                    {"$set": {"batch_id": batch_id, "external_expert_id": expert["id"], "scheduled_at": scheduled_at}}
+                )
+                for exam in batch["exams"]
+            ]
+            try:
+                await db.exam_batches.insert_one(batch_doc)
+                result = await db.exam_schedules.bulk_write(exam_updates, ordered=False)
+                if result.matched_count != len(exam_updates):
+                    raise HTTPException(status_code=409, detail="Exams were batched concurrently; please retry")
+            except Exception:
+                # Undo this batch so the exams keep their individual bookings
+                await db.exam_schedules.bulk_write([
+                    UpdateOne(
+                        {"id": exam["id"], "batch_id": batch_id},
+                        {"$unset": {"batch_id": ""},
+                         "$set": {"external_expert_id": exam.get("external_expert_id"), "scheduled_at": exam["scheduled_at"]}}
+                    )
+                    for exam in batch["exams"]
+                ], ordered=False)
+                await db.exam_batches.delete_one({"id": batch_id})
+                await release_expert_slot(expert["id"], scheduled_at.date().isoformat(), load_units)
+                raise
+            
+            # Only once the batch is stored are the individual reservations given back
+            for exam in batch["exams"]:
+                if exam.get("preferred_dates"):  # Booked through assign_external_expert
+                    await release_expert_slot(exam["external_expert_id"], exam["scheduled_at"].date().isoformat())
+            
+            batch_docs.append(batch_doc)
+            await insert_notifications([{
+                "id": str(uuid.uuid4()),
+                "user_id": exam["student_id"],
+                "type": NotificationType.EXAM_SCHEDULED,
+                "title": "Exam Scheduled",
+                "message": f"Your {batch['exam_type']} exam at {batch['location']} is scheduled for {scheduled_at.strftime('%Y-%m-%d %H:%M')}.",
+                "is_read": False,
+                "metadata": {"exam_id": exam["id"], "batch_id": batch_id},
+                "created_at": now
+            } for exam in batch["exams"]])
+            exams_batched += len(batch["exams"])
+        
+        # Individually each exam is a one-candidate session; batched, the session length grows with its size
+        expert_hours_before = sum(
+            exam_session_minutes(batch_doc["exam_type"], 1) * len(batch_doc["exam_ids"]) for batch_doc in batch_docs
+        ) / 60
+        expert_hours_after = sum(batch_doc["duration_minutes"] for batch_doc in batch_docs) / 60
+        return {
+            "exams_considered": len(exams),
+            "exams_batched": exams_batched,
+            "batches_created": len(batch_docs),
+            "expert_hours_before": expert_hours_before,
+            "expert_hours_after": expert_hours_after,
+            "expert_hours_saved": expert_hours_before - expert_hours_after
+        }
+    
+    except Exception as e:
+        logger.error(f"Batch exams error: {str(e)}")
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail="Failed to batch exams")
+
 @api_router.get("/exams/my")
 async def get_my_exams(current_user = Depends(get_current_user)):
     try:
@@ -2696,6 +4705,37 @@ async def get_my_notifications(current_user = Depends(get_current_user)):
             raise e
         raise HTTPException(status_code=500, detail="Failed to retrieve notifications")
 
+@api_router.get("/notifications/stream")
+async def stream_notifications(request: Request, token: str):
+    """Server-Sent Events stream of the caller's new notifications.
+
+    EventSource can't send an Authorization header, so the JWT comes as a query parameter.
+    """
+    current_user = await get_user_from_token(token)
+    queue = notification_broker.subscribe(current_user["id"])
+    
+    async def event_stream():
+        try:
+            yield "retry: 5000\nevent: ready\ndata: {}\n\n"
+            while True:
+                try:
+                    notification = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                payload = json.dumps(serialize_doc(notification), default=str)
+                yield f"id: {notification.get('id', '')}\nevent: notification\ndata: {payload}\n\n"
+        finally:
+            notification_broker.unsubscribe(current_user["id"], queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.post("/notifications/{notification_id}/read")
 async def mark_notification_read(
     notification_id: str,
@@ -2703,18 +4743,15 @@ async def mark_notification_read(
 ):
     try:
         # Verify notification ownership
-        notification = await db.notifications.find_one({
-            "id": notification_id,
-            "user_id": current_user["id"]
-        })
+        notification = await db.notifications.find_one(
+            {"id": notification_id, "user_id": current_user["id"]},
+            {"id": 1}
+        )
         if not notification:
             raise HTTPException(status_code=404, detail="Notification not found")
         
-        # Mark as read
-        await db.notifications.update_one(
-            {"id": notification_id},
-            {"$set": {"is_read": True}}
-        )
+        # Mark as read (keeps the unread counters in step)
+        await notification_service.mark_as_read(notification_id, current_user["id"])
         
         return {"message": "Notification marked as read"}
     
@@ -2727,10 +4764,7 @@ async def mark_notification_read(
 @api_router.post("/notifications/mark-all-read")
 async def mark_all_notifications_read(current_user = Depends(get_current_user)):
     try:
-        await db.notifications.update_many(
-            {"user_id": current_user["id"], "is_read": False},
-            {"$set": {"is_read": True}}
-        )
+        await notification_service.mark_all_as_read(current_user["id"])
         
         return {"message": "All notifications marked as read"}
     
@@ -3052,6 +5086,8 @@ async def take_course_exam(
 @api_router.get("/dashboard/role/{role}")
 async def get_dashboard(
     role: str,
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
     current_user = Depends(get_current_user)
 ):
     try:
@@ -3084,10 +5120,15 @@ async def get_dashboard(
                 school = await db.driving_schools.find_one({"id": teacher["driving_school_id"]})
                 dashboard_data["school"] = serialize_doc(school)
                 
-                # Get assigned sessions
-                sessions_cursor = db.sessions.find({"teacher_id": teacher["id"]})
-                sessions = await sessions_cursor.to_list(length=None)
+                # Get assigned sessions, the coming week unless a window is given
+                if not from_date and not to_date:
+                    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+                    from_date = today.isoformat()
+                    to_date = (today + timedelta(days=7)).isoformat()
+                query = build_session_page_query({"teacher_id": teacher["id"]}, from_date, to_date, None, "asc")
+                sessions, next_cursor = await fetch_session_page(query, "asc", SESSION_PAGE_MAX_LIMIT)
                 dashboard_data["sessions"] = serialize_doc(sessions)
+                dashboard_data["sessions_next_cursor"] = next_cursor
             
         elif role == "manager":
             # Get manager's school
@@ -3156,7 +5197,7 @@ async def complete_payment(
                 "metadata": {"enrollment_id": enrollment_id},
                 "created_at": datetime.utcnow()
             }
-            await db.notifications.insert_one(notification_doc)
+            await insert_notifications([notification_doc])
         
         return {"message": "Payment completed successfully"}
     
@@ -3233,6 +5274,7 @@ async def verify_document(
             {"id": document_id},
             {"$set": {"is_verified": is_verified}}
         )
+        await refresh_user_documents_status(document["user_id"])
         
         return {"message": "Document verification updated successfully"}
     
@@ -3319,7 +5361,7 @@ async def check_and_generate_certificate(enrollment_id: str):
                     "metadata": {"certificate_id": cert_id, "certificate_number": cert_number},
                     "created_at": datetime.utcnow()
                 }
-                await db.notifications.insert_one(notification_doc)
+                await insert_notifications([notification_doc])
                 
                 return cert_id
         
@@ -3530,22 +5572,57 @@ async def get_my_school(current_user: dict = Depends(get_current_user)):
     return serialize_doc(school)
 
 @api_router.get("/quizzes/my", response_model=dict)
-async def get_my_quizzes(current_user: dict = Depends(get_current_user)):
-    """Get all quizzes created by the current manager"""
+async def get_my_quizzes(
+    cursor: Optional[str] = None,
+    limit: int = QUIZ_PAGE_DEFAULT_LIMIT,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a page of quiz summaries created by the current manager, newest first"""
     if current_user["role"] != "manager":
         raise HTTPException(status_code=403, detail="Only managers can access this endpoint")
     
-    quizzes_cursor = db.quizzes.find({"created_by": current_user["id"]}).sort("created_at", -1)
-    quizzes = await quizzes_cursor.to_list(length=None)
+    query = {"created_by": current_user["id"]}
+    total = await db.quizzes.count_documents(query)
+    if cursor:
+        try:
+            cursor_at, cursor_id = cursor.rsplit("|", 1)
+            cursor_at = datetime.fromisoformat(cursor_at)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = {"$and": [query, {"$or": [
+            {"created_at": {"$lt": cursor_at}},
+            {"created_at": cursor_at, "id": {"$lt": cursor_id}}
+        ]}]}
+    
+    limit = max(1, min(limit, QUIZ_PAGE_MAX_LIMIT))
+    quizzes = await db.quizzes.aggregate([
+        {"$match": query},
+        {"$sort": {"created_at": -1, "id": -1}},
+        {"$limit": limit + 1},
+        {"$project": {**QUIZ_SUMMARY_PROJECTION, "description": 1, "created_at": 1, "is_active": 1}}
+    ]).to_list(length=limit + 1)
+    
+    next_cursor = None
+    if len(quizzes) > limit:
+        quizzes = quizzes[:limit]
+        next_cursor = f"{quizzes[-1]['created_at'].isoformat()}|{quizzes[-1]['id']}"
     
     return {
         "quizzes": serialize_doc(quizzes),
-        "total": len(quizzes)
+        "total": total,
+        "next_cursor": next_cursor
     }
 
 @api_router.get("/sessions/school", response_model=dict)
-async def get_school_sessions(current_user: dict = Depends(get_current_user)):
-    """Get all sessions for the manager's school"""
+async def get_school_sessions(
+    from_date: Optional[str] = Query(None, alias="from"),
+    to_date: Optional[str] = Query(None, alias="to"),
+    cursor: Optional[str] = None,
+    limit: int = SESSION_PAGE_DEFAULT_LIMIT,
+    sort_order: str = "desc",  # asc, desc
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a page of sessions for the manager's school"""
     if current_user["role"] != "manager":
         raise HTTPException(status_code=403, detail="Only managers can access this endpoint")
     
@@ -3554,30 +5631,18 @@ async def get_school_sessions(current_user: dict = Depends(get_current_user)):
     if not school:
         raise HTTPException(status_code=404, detail="No driving school found for this manager")
     
-    # Get all sessions for the school's students through enrollments
-    enrollments_cursor = db.enrollments.find({"driving_school_id": school["id"]})
-    enrollments = await enrollments_cursor.to_list(length=None)
-    
-    if not enrollments:
-        return {"sessions": [], "total": 0}
-    
-    student_ids = [enrollment["student_id"] for enrollment in enrollments]
+    # Sessions carry driving_school_id, so the page is a single indexed range query
+    query = build_session_page_query({"driving_school_id": school["id"]}, from_date, to_date, cursor, sort_order)
+    sessions, next_cursor = await fetch_session_page(query, sort_order, limit)
     
-    # Get sessions for these students
-    sessions_cursor = db.sessions.find({"student_id": {"$in": student_ids}}).sort("scheduled_at", -1)
-    sessions = await sessions_cursor.to_list(length=None)
-    
-    # Enrich sessions with student and teacher names
     for session in sessions:
-        student = await db.users.find_one({"id": session["student_id"]})
-        teacher = await db.users.find_one({"id": session["teacher_id"]}) if session.get("teacher_id") else None
-        
-        session["student_name"] = f"{student['first_name']} {student['last_name']}" if student else "Unknown Student"
-        session["teacher_name"] = f"{teacher['first_name']} {teacher['last_name']}" if teacher else "No Teacher Assigned"
+        session.setdefault("student_name", "Unknown Student")
+        session.setdefault("teacher_name", "No Teacher Assigned")
     
     return {
         "sessions": serialize_doc(sessions),
-        "total": len(sessions)
+        "count": len(sessions),  # Sessions on this page; follow next_cursor for the rest
+        "next_cursor": next_cursor
     }
 
 @api_router.delete("/teachers/{teacher_id}", response_model=dict)
@@ -3713,6 +5778,36 @@ async def add_teacher_enhanced(
     
     return serialize_doc(teacher)
 
+# BACKGROUND TASKS
+
+_background_tasks: List[asyncio.Task] = []
+
+@app.on_event("startup")
+async def start_background_tasks():
+    try:
+        await sync_leaderboards()
+    except Exception as e:
+        logger.error(f"Initial leaderboard load error: {str(e)}")
+    _background_tasks.append(asyncio.create_task(leaderboard_sync_loop()))
+    notification_service.start_delivery_workers()
+    notification_service.start_counter_reconciler()
+    notification_service.start_email_digests()
+    notification_broker.start_change_streams(db, ["notifications"])
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in _background_tasks:
+        task.cancel()
+    await notification_service.stop_delivery_workers()
+    await notification_service.stop_counter_reconciler()
+    await notification_service.stop_email_digests()
+    await notification_broker.stop_change_streams()
+    await notification_service.close()
+    try:
+        await sync_leaderboards()
+    except Exception as e:
+        logger.error(f"Final leaderboard sync error: {str(e)}")
+
 # Include the API router
 app.include_router(api_router)
 
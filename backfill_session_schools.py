@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+import os
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+BATCH_SIZE = 1000
+
+async def backfill_session_schools():
+    """Stamp driving_school_id, student_name and teacher_name onto existing sessions"""
+    client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    db = client.driving_school_platform
+
+    try:
+        # Teachers and their names are few enough to keep in memory
+        teachers = {t["id"]: t async for t in db.teachers.find({}, {"id": 1, "user_id": 1, "driving_school_id": 1})}
+        teacher_users = {
+            u["id"]: f"{u['first_name']} {u['last_name']}"
+            async for u in db.users.find(
+                {"id": {"$in": [t["user_id"] for t in teachers.values()]}},
+                {"id": 1, "first_name": 1, "last_name": 1}
+            )
+        }
+
+        updated = 0
+        sessions_cursor = db.sessions.find(
+            {"driving_school_id": {"$exists": False}},
+            {"id": 1, "course_id": 1, "teacher_id": 1, "student_id": 1}
+        ).batch_size(BATCH_SIZE)
+
+        batch = []
+        async for session in sessions_cursor:
+            batch.append(session)
+            if len(batch) >= BATCH_SIZE:
+                updated += await _backfill_batch(db, batch, teachers, teacher_users)
+                batch = []
+        if batch:
+            updated += await _backfill_batch(db, batch, teachers, teacher_users)
+
+        print(f"✓ Backfilled {updated} sessions")
+
+    except Exception as e:
+        print(f"❌ Error backfilling sessions: {e}")
+    finally:
+        client.close()
+
+async def _backfill_batch(db, sessions, teachers, teacher_users):
+    """Resolve schools and names for one batch of sessions with one query per collection"""
+    courses = {
+        c["id"]: c["enrollment_id"]
+        async for c in db.courses.find(
+            {"id": {"$in": list({s["course_id"] for s in sessions})}},
+            {"id": 1, "enrollment_id": 1}
+        )
+    }
+    enrollments = {
+        e["id"]: e["driving_school_id"]
+        async for e in db.enrollments.find(
+            {"id": {"$in": list(set(courses.values()))}},
+            {"id": 1, "driving_school_id": 1}
+        )
+    }
+    students = {
+        u["id"]: f"{u['first_name']} {u['last_name']}"
+        async for u in db.users.find(
+            {"id": {"$in": list({s["student_id"] for s in sessions})}},
+            {"id": 1, "first_name": 1, "last_name": 1}
+        )
+    }
+
+    updates = []
+    for session in sessions:
+        teacher = teachers.get(session.get("teacher_id"))
+        school_id = enrollments.get(courses.get(session["course_id"]))
+        if not school_id and teacher:
+            school_id = teacher["driving_school_id"]
+        if not school_id:
+            continue
+
+        updates.append(UpdateOne(
+            {"id": session["id"]},
+            {"$set": {
+                "driving_school_id": school_id,
+                "student_name": students.get(session["student_id"], "Unknown Student"),
+                "teacher_name": teacher_users.get(teacher["user_id"], "Unknown Teacher") if teacher else "No Teacher Assigned"
+            }}
+        ))
+
+    if updates:
+        await db.sessions.bulk_write(updates, ordered=False)
+    return len(updates)
+
+if __name__ == "__main__":
+    asyncio.run(backfill_session_schools())
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+import os
+import sys
+import random
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from server import CourseType, EXAM_BATCH_CAPACITY, exam_session_minutes, pack_exam_batches
+
+EXAM_COUNT = int(os.environ.get('BENCH_EXAMS', '6000'))
+LOCATION_COUNT = int(os.environ.get('BENCH_LOCATIONS', '3'))
+DATE_SPREAD_DAYS = int(os.environ.get('BENCH_DATE_SPREAD_DAYS', '5'))  # Preferred dates fall within this many days
+SEED = int(os.environ.get('BENCH_SEED', '7'))
+YEAR_START = datetime(2026, 1, 5, 8)
+
+def synthetic_year(rng):
+    """Park and road exam requests over a year, each with one to three preferred dates"""
+    exams = []
+    for i in range(EXAM_COUNT):
+        first_day = YEAR_START + timedelta(days=rng.randrange(365))
+        days = sorted(rng.sample(range(DATE_SPREAD_DAYS), rng.randint(1, 3)))
+        dates = [first_day + timedelta(days=day, hours=rng.randrange(8)) for day in days]
+        exams.append({
+            "id": f"exam-{i}",
+            "exam_type": rng.choice([CourseType.PARK, CourseType.ROAD]),
+            "location": f"Centre {rng.randrange(LOCATION_COUNT)}",
+            "scheduled_at": dates[0],
+            "preferred_dates": dates
+        })
+    return exams
+
+def benchmark_exam_batching():
+    """Expert hours for a synthetic year of exams, one session per exam versus packed batches"""
+    exams = synthetic_year(random.Random(SEED))
+    # Single-exam batches keep their own booking, as in batch_school_exams
+    batches = [batch for batch in pack_exam_batches(exams) if len(batch["exams"]) >= 2]
+    
+    total_before = total_after = 0
+    for exam_type in (CourseType.PARK, CourseType.ROAD):
+        typed = [batch for batch in batches if batch["exam_type"] == exam_type]
+        batched = sum(len(batch["exams"]) for batch in typed)
+        before = exam_session_minutes(exam_type, 1) * batched / 60
+        after = sum(exam_session_minutes(exam_type, len(batch["exams"])) for batch in typed) / 60
+        total_before += before
+        total_after += after
+        print(f"{exam_type.value}: {batched} exams in {len(typed)} sessions (capacity {EXAM_BATCH_CAPACITY[exam_type]}): "
+              f"{before:.1f}h -> {after:.1f}h")
+    
+    batched = sum(len(batch["exams"]) for batch in batches)
+    print(f"{batched} of {len(exams)} exams batched into {len(batches)} sessions")
+    print(f"Expert hours: {total_before:.1f}h before, {total_after:.1f}h after, "
+          f"{total_before - total_after:.1f}h saved ({(total_before - total_after) / total_before:.0%})")
+
+if __name__ == "__main__":
+    benchmark_exam_batching()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import asyncio
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from external_integrations.messaging import SMSProvider
+from tests.fake_http import FakeProviderServer
+
+MESSAGE_COUNT = int(os.environ.get('BENCH_MESSAGES', '100000'))
+BATCH_SIZE = int(os.environ.get('SMS_BATCH_SIZE', '100'))
+POOL_SIZE = int(os.environ.get('SMS_POOL_SIZE', '4'))
+RATE_PER_SECOND = float(os.environ.get('BENCH_RATE_PER_SECOND', '1000000'))  # Effectively unthrottled by default
+
+async def drain_queue(server):
+    """Push MESSAGE_COUNT queued SMS through one adapter, as the outbox workers would"""
+    provider = SMSProvider(
+        server.url, "key", sender_id="DrivingSchool",
+        rate_per_second=RATE_PER_SECOND, batch_size=BATCH_SIZE, pool_size=POOL_SIZE
+    )
+    started = time.perf_counter()
+    results = await provider.send_batch([
+        {"to": f"+213555{i:06d}", "text": "Reminder: your driving session is tomorrow"}
+        for i in range(MESSAGE_COUNT)
+    ])
+    elapsed = time.perf_counter() - started
+    provider.close()
+    return sum(results), elapsed
+
+def benchmark_sms_provider():
+    """Measure SMS throughput against a local HTTP provider stand-in"""
+    with FakeProviderServer() as server:
+        accepted, elapsed = asyncio.run(drain_queue(server))
+        print(f"{MESSAGE_COUNT} SMS in {elapsed:.2f}s: {MESSAGE_COUNT / elapsed:.0f} SMS/s")
+        print(f"{accepted} accepted over {server.requests} requests (batch size {BATCH_SIZE}, pool size {POOL_SIZE})")
+
+if __name__ == "__main__":
+    benchmark_sms_provider()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import asyncio
+import smtplib
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from enhanced_notifications import SMTPConnectionPool, SMTP_MAX_MESSAGES_PER_CONNECTION
+from tests.fake_smtp import FakeSMTPServer
+
+MESSAGE_COUNT = int(os.environ.get('BENCH_MESSAGES', '2000'))
+POOL_SIZE = int(os.environ.get('BENCH_POOL_SIZE', '4'))
+MESSAGE = "Subject: benchmark\r\n\r\nhello"
+
+def send_unpooled(server, count):
+    """One connection and login per message, as before the pool"""
+    for i in range(count):
+        smtp = smtplib.SMTP(server.host, server.port)
+        smtp.login("user", "secret")
+        smtp.sendmail("from@example.com", [f"{i}@example.com"], MESSAGE)
+        smtp.quit()
+
+async def send_pooled(server, count):
+    pool = SMTPConnectionPool(server.host, server.port, "user", "secret", size=POOL_SIZE, use_tls=False)
+    await asyncio.gather(*[pool.send("from@example.com", [f"{i}@example.com"], MESSAGE) for i in range(count)])
+    await pool.close()
+
+async def send_pooled_many(server, count):
+    pool = SMTPConnectionPool(server.host, server.port, "user", "secret", size=POOL_SIZE, use_tls=False)
+    messages = [("from@example.com", [f"{i}@example.com"], MESSAGE) for i in range(count)]
+    chunks = [messages[i:i + SMTP_MAX_MESSAGES_PER_CONNECTION] for i in range(0, count, SMTP_MAX_MESSAGES_PER_CONNECTION)]
+    await asyncio.gather(*[pool.send_many(chunk) for chunk in chunks])
+    await pool.close()
+
+def report(name, server, count, seconds):
+    print(f"{name:<24} {count / seconds:>8.0f} emails/s  ({server.connections} connections, {server.messages} delivered)")
+
+def benchmark_smtp_pool():
+    """Compare emails per second against a local SMTP stand-in (no network or TLS cost)"""
+    runs = [
+        ("connection per message", lambda server: send_unpooled(server, MESSAGE_COUNT)),
+        ("pool send()", lambda server: asyncio.run(send_pooled(server, MESSAGE_COUNT))),
+        ("pool send_many()", lambda server: asyncio.run(send_pooled_many(server, MESSAGE_COUNT)))
+    ]
+    for name, run in runs:
+        with FakeSMTPServer() as server:
+            started = time.perf_counter()
+            run(server)
+            report(name, server, MESSAGE_COUNT, time.perf_counter() - started)
+
+if __name__ == "__main__":
+    benchmark_smtp_pool()
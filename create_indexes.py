@@ -11,6 +11,7 @@ async def create_indexes():
         # Users collection indexes
         await db.users.create_index("email", unique=True)
         await db.users.create_index("role")
+        await db.users.create_index("documents_status.complete")
         print("✓ Created users indexes")
         
         # Driving schools collection indexes
@@ -37,8 +38,17 @@ async def create_indexes():
         await db.sessions.create_index("student_id")
         await db.sessions.create_index("teacher_id")
         await db.sessions.create_index("scheduled_at")
+        await db.sessions.create_index([("teacher_id", 1), ("scheduled_at", 1), ("id", 1)])
+        await db.sessions.create_index([("student_id", 1), ("scheduled_at", 1), ("id", 1)])
+        await db.sessions.create_index([("driving_school_id", 1), ("scheduled_at", 1), ("id", 1)])
         print("✓ Created sessions indexes")
         
+        # Calendar slots collection indexes (session double-booking guard)
+        await db.calendar_slots.create_index([("owner_key", 1), ("slot_start", 1)], unique=True)
+        await db.calendar_slots.create_index("session_id")
+        await db.calendar_slots.create_index("slot_start", expireAfterSeconds=7 * 24 * 3600)
+        print("✓ Created calendar_slots indexes")
+        
         # Documents collection indexes
         await db.documents.create_index("user_id")
         await db.documents.create_index("document_type")
@@ -47,13 +57,89 @@ async def create_indexes():
         # Quizzes collection indexes
         await db.quizzes.create_index("course_type")
         await db.quizzes.create_index("difficulty")
+        await db.quizzes.create_index("id", unique=True)
+        await db.quizzes.create_index([("is_active", 1), ("course_type", 1), ("difficulty", 1), ("id", 1)])
+        await db.quizzes.create_index([("created_by", 1), ("created_at", -1), ("id", -1)])
+        await db.quiz_bank_meta.create_index("id", unique=True)
         print("✓ Created quizzes indexes")
         
         # Quiz attempts collection indexes
         await db.quiz_attempts.create_index("student_id")
         await db.quiz_attempts.create_index("quiz_id")
+        await db.quiz_attempts.create_index([("student_id", 1), ("completed_at", -1)])
+        await db.quiz_attempts.create_index(
+            [("student_id", 1), ("client_attempt_id", 1)],
+            unique=True,
+            partialFilterExpression={"client_attempt_id": {"$exists": True}}
+        )
         print("✓ Created quiz_attempts indexes")
         
+        # Quiz item statistics indexes
+        await db.quiz_item_stats.create_index("id", unique=True)
+        await db.quiz_item_stats.create_index([("quiz_id", 1), ("question_index", 1)])
+        await db.quiz_item_stats.create_index("course_type")
+        print("✓ Created quiz_item_stats indexes")
+        
+        # Leaderboard entries indexes
+        await db.leaderboard_entries.create_index("id", unique=True)
+        await db.leaderboard_entries.create_index("updated_at")
+        print("✓ Created leaderboard_entries indexes")
+        
+        # External experts collection indexes
+        # MongoDB cannot index two array fields together, so the wilaya array leads and
+        # specialization is filtered from the (few) experts of that wilaya
+        await db.external_experts.create_index([("available_states", 1), ("is_available", 1)])
+        await db.external_experts.create_index("user_id")
+        await db.expert_daily_load.create_index([("expert_id", 1), ("date", 1)], unique=True)
+        print("✓ Created external_experts indexes")
+        
+        # Exam schedules collection indexes
+        await db.exam_schedules.create_index("student_id")
+        await db.exam_schedules.create_index("external_expert_id")
+        await db.exam_schedules.create_index([("course_id", 1), ("status", 1)])
+        await db.exam_batches.create_index("driving_school_id")
+        print("✓ Created exam_schedules indexes")
+        
+        # Notifications collection indexes (shared by server.py and the enhanced service)
+        await db.notifications.create_index("id", unique=True)
+        await db.notifications.create_index([("user_id", 1), ("created_at", -1)])
+        await db.notifications.create_index([("delivery_state", 1), ("next_attempt_at", 1)])
+        await db.notifications.create_index([("delivery_state", 1), ("lease_until", 1)])
+        await db.notifications.create_index(
+            "idempotency_key",
+            unique=True,
+            partialFilterExpression={"idempotency_key": {"$exists": True}}
+        )
+        await db.notifications.create_index([("type", 1), ("metadata.session_id", 1)])
+        await db.notifications.create_index([("type", 1), ("metadata.enrollment_id", 1), ("created_at", -1)])
+        # TTL: expired notifications go 30 minutes after expires_at, two counter reconcile
+        # intervals, so the reconciler still sees them and can drop them from unread counts.
+        # Read ones go after 60 days in case the archival job hasn't moved them (it archives
+        # read ones after 30)
+        await db.notifications.create_index("expires_at", expireAfterSeconds=1800)
+        await db.notifications.create_index(
+            "read_at",
+            expireAfterSeconds=60 * 24 * 3600,
+            partialFilterExpression={"is_read": True}
+        )
+        await db.notifications.create_index([("is_read", 1), ("created_at", 1)])
+        await db.notifications.create_index(
+            [("user_id", 1), ("created_at", 1)],
+            name="email_digest_pending",
+            partialFilterExpression={"email_digest_pending": True}
+        )
+        print("✓ Created notifications indexes")
+        
+        # Notifications archive indexes
+        await db.notifications_archive.create_index("id", unique=True)
+        await db.notifications_archive.create_index([("user_id", 1), ("last_created_at", -1)])
+        print("✓ Created notifications_archive indexes")
+        
+        # Notification counters indexes
+        await db.notification_counters.create_index("id", unique=True)
+        await db.notification_counters.create_index("updated_at")
+        print("✓ Created notification_counters indexes")
+        
         print("\n🎉 All database indexes created successfully!")
         
     except Exception as e:
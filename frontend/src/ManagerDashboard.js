@@ -11,7 +11,9 @@ const ManagerDashboard = ({ user, token }) => {
   const [teachers, setTeachers] = useState([]);
   const [analytics, setAnalytics] = useState(null);
   const [quizzes, setQuizzes] = useState([]);
+  const [quizzesCursor, setQuizzesCursor] = useState(null);
   const [sessions, setSessions] = useState([]);
+  const [sessionsCursor, setSessionsCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
 
@@ -81,10 +83,12 @@ const ManagerDashboard = ({ user, token }) => {
       // Fetch quizzes
       const quizzesResponse = await axios.get(`${API}/quizzes/my`, { headers });
       setQuizzes(quizzesResponse.data.quizzes || []);
+      setQuizzesCursor(quizzesResponse.data.next_cursor || null);
 
       // Fetch sessions
       const sessionsResponse = await axios.get(`${API}/sessions/school`, { headers });
       setSessions(sessionsResponse.data.sessions || []);
+      setSessionsCursor(sessionsResponse.data.next_cursor || null);
 
     } catch (error) {
       console.error('Error fetching manager data:', error);
@@ -189,13 +193,37 @@ const ManagerDashboard = ({ user, token }) => {
     }
   };
 
+  const handleLoadMoreQuizzes = async () => {
+    try {
+      const headers = { Authorization: `Bearer ${token}` };
+      const response = await axios.get(`${API}/quizzes/my`, { headers, params: { cursor: quizzesCursor } });
+      setQuizzes(prev => [...prev, ...(response.data.quizzes || [])]);
+      setQuizzesCursor(response.data.next_cursor || null);
+    } catch (error) {
+      console.error('Error loading quizzes:', error);
+      alert('Failed to load more quizzes');
+    }
+  };
+
+  const handleLoadMoreSessions = async () => {
+    try {
+      const headers = { Authorization: `Bearer ${token}` };
+      const response = await axios.get(`${API}/sessions/school`, { headers, params: { cursor: sessionsCursor } });
+      setSessions(prev => [...prev, ...(response.data.sessions || [])]);
+      setSessionsCursor(response.data.next_cursor || null);
+    } catch (error) {
+      console.error('Error loading sessions:', error);
+      alert('Failed to load more sessions');
+    }
+  };
+
   const handleCreateQuiz = async (e) => {
     e.preventDefault();
     try {
       const headers = { Authorization: `Bearer ${token}` };
       const response = await axios.post(`${API}/quizzes`, quizForm, { headers });
       
-      setQuizzes(prev => [...prev, response.data]);
+      setQuizzes(prev => [response.data, ...prev]);
       setShowQuizModal(false);
       setQuizForm({
         title: '',
@@ -328,7 +356,7 @@ const ManagerDashboard = ({ user, token }) => {
               className={`nav-link ${activeTab === 'sessions' ? 'active' : ''}`}
               onClick={() => setActiveTab('sessions')}
             >
-              <i className="fas fa-calendar me-2"></i>Sessions ({sessions.length})
+              <i className="fas fa-calendar me-2"></i>Sessions ({sessions.length}{sessionsCursor ? '+' : ''})
             </button>
           </li>
           <li className="nav-item">
@@ -674,7 +702,7 @@ const ManagerDashboard = ({ user, token }) => {
                         <div className="quiz-stats mb-3">
                           <div className="row text-center">
                             <div className="col">
-                              <div className="fw-bold">{quiz.questions?.length || 0}</div>
+                              <div className="fw-bold">{quiz.question_count ?? quiz.questions?.length ?? 0}</div>
                               <div className="small text-muted">Questions</div>
                             </div>
                             <div className="col">
@@ -706,6 +734,14 @@ const ManagerDashboard = ({ user, token }) => {
                   </div>
                 ))}
                 
+                {quizzesCursor && (
+                  <div className="col-12 text-center">
+                    <button onClick={handleLoadMoreQuizzes} className="btn btn-outline-primary">
+                      Load More
+                    </button>
+                  </div>
+                )}
+                
                 {quizzes.length === 0 && (
                   <div className="col-12">
                     <div className="text-center py-5">
@@ -777,6 +813,14 @@ const ManagerDashboard = ({ user, token }) => {
                   </tbody>
                 </table>
               </div>
+              
+              {sessionsCursor && (
+                <div className="text-center">
+                  <button onClick={handleLoadMoreSessions} className="btn btn-outline-primary">
+                    Load More
+                  </button>
+                </div>
+              )}
             </div>
           </div>
         )}
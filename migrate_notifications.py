@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import os
+import asyncio
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+BATCH_SIZE = 1000
+
+async def migrate_notifications():
+    """Move enhanced_notifications into notifications and fill the shared schema on old documents.
+
+    Safe to re-run: documents already copied are skipped by the unique id index.
+    Run create_indexes.py first.
+    """
+    client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    db = client.driving_school_platform
+
+    try:
+        # Copy enhanced notifications across in batches
+        copied = 0
+        batch = []
+        async for notification in db.enhanced_notifications.find({}).batch_size(BATCH_SIZE):
+            notification.pop("_id", None)
+            batch.append(InsertOne(notification))
+            if len(batch) >= BATCH_SIZE:
+                copied += await _insert_batch(db, batch)
+                batch = []
+        if batch:
+            copied += await _insert_batch(db, batch)
+        print(f"✓ Copied {copied} enhanced notifications")
+
+        # Notifications written directly by server.py predate the shared schema
+        result = await db.notifications.update_many(
+            {"priority": {"$exists": False}},
+            [{"$set": {
+                "priority": "medium",
+                "channels": ["in_app"],
+                "delivery_status": {"in_app": {"success": True, "delivered_at": "$created_at"}},
+                "delivery_state": "delivered",
+                "delivery_attempts": 0,
+                "is_delivered": True,
+                "metadata": {"$ifNull": ["$metadata", {}]},
+                "scheduled_at": "$created_at",
+                "expires_at": None,
+                "updated_at": datetime.utcnow()
+            }}]
+        )
+        print(f"✓ Filled shared fields on {result.modified_count} notifications")
+
+        # Counters were kept for enhanced_notifications only; they are rebuilt on next read
+        await db.notification_counters.delete_many({})
+        print("✓ Cleared notification counters")
+
+    except Exception as e:
+        print(f"❌ Error migrating notifications: {e}")
+    finally:
+        client.close()
+
+async def _insert_batch(db, operations):
+    try:
+        result = await db.notifications.bulk_write(operations, ordered=False)
+        return result.inserted_count
+    except BulkWriteError as e:
+        # Already migrated on an earlier run
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        return e.details.get("nInserted", 0)
+
+if __name__ == "__main__":
+    asyncio.run(migrate_notifications())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+import os
+import sys
+import asyncio
+from datetime import datetime
+from collections import Counter
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from quiz_scoring import question_answer_key, item_choice_key
+
+BATCH_SIZE = 1000
+
+async def rebuild_quiz_item_stats():
+    """Recompute quiz_item_stats from raw quiz_attempts.
+
+    Attempts are streamed in quiz_id order with one quiz loaded at a time. Practice
+    quiz questions are credited to the bank question named in their source ref, as the
+    live path does, so counters are kept per bank item for the whole run. Run it while
+    attempts are not being submitted, since counters are overwritten, not incremented.
+    """
+    client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    db = client.driving_school_platform
+
+    try:
+        items = {}
+        practice_quiz_ids = []
+        current = None
+        attempts_cursor = db.quiz_attempts.find(
+            {}, {"quiz_id": 1, "answers": 1, "score": 1}
+        ).sort("quiz_id", 1).batch_size(BATCH_SIZE)
+
+        async for attempt in attempts_cursor:
+            if current is None or attempt["quiz_id"] != current["quiz_id"]:
+                current = await _load_quiz(db, attempt["quiz_id"])
+                if current["is_practice"]:
+                    practice_quiz_ids.append(current["quiz_id"])
+            if current["questions"] is not None:
+                _accumulate(items, current, attempt)
+
+        rebuilt = await _flush_items(db, items)
+        # Drop stats an older rebuild wrote against practice quiz positions
+        if practice_quiz_ids:
+            await db.quiz_item_stats.delete_many({"quiz_id": {"$in": practice_quiz_ids}})
+
+        print(f"✓ Rebuilt item statistics for {rebuilt} questions")
+
+    except Exception as e:
+        print(f"❌ Error rebuilding item statistics: {e}")
+    finally:
+        client.close()
+
+async def _load_quiz(db, quiz_id):
+    """Load one quiz's questions and the bank item each one counts towards"""
+    quiz = await db.quizzes.find_one({"id": quiz_id}, {"questions": 1, "course_type": 1, "is_practice": 1})
+    questions = quiz["questions"] if quiz else None
+    return {
+        "quiz_id": quiz_id,
+        "is_practice": bool(quiz and quiz.get("is_practice")),
+        "course_type": quiz["course_type"] if quiz else None,
+        "questions": questions,
+        # Same refs as CompiledQuiz.item_refs in backend/server.py
+        "refs": [
+            (q["source"]["quiz_id"], q["source"]["question_index"]) if q.get("source") else (quiz_id, index)
+            for index, q in enumerate(questions or [])
+        ]
+    }
+
+def _accumulate(items, quiz, attempt):
+    """Fold one attempt into the running sums of each bank item it answered"""
+    answers = attempt.get("answers") or {}
+    score = float(attempt.get("score") or 0)
+    for index, (question, ref) in enumerate(zip(quiz["questions"], quiz["refs"])):
+        item = items.get(ref)
+        if item is None:
+            item = items[ref] = {
+                "course_type": quiz["course_type"],
+                "attempts": 0,
+                "correct": 0,
+                "score_sum": 0.0,
+                "score_sq_sum": 0.0,
+                "correct_score_sum": 0.0,
+                "choice_counts": Counter()
+            }
+        answer = answers.get(str(index))
+        item["attempts"] += 1
+        item["score_sum"] += score
+        item["score_sq_sum"] += score ** 2
+        item["choice_counts"][item_choice_key(answer)] += 1
+        key = question_answer_key(question)
+        if answer is not None and key is not None and answer == key:
+            item["correct"] += 1
+            item["correct_score_sum"] += score
+
+async def _flush_items(db, items):
+    """Overwrite the stored counters of every item seen"""
+    now = datetime.utcnow()
+    updates = [
+        UpdateOne(
+            {"id": f"{quiz_id}:{index}"},
+            {"$set": {
+                "quiz_id": quiz_id,
+                "question_index": index,
+                "course_type": item["course_type"],
+                "attempts": item["attempts"],
+                "correct": item["correct"],
+                "score_sum": item["score_sum"],
+                "score_sq_sum": item["score_sq_sum"],
+                "correct_score_sum": item["correct_score_sum"],
+                "choice_counts": dict(item["choice_counts"]),
+                "updated_at": now
+            }},
+            upsert=True
+        )
+        for (quiz_id, index), item in items.items()
+    ]
+    for start in range(0, len(updates), BATCH_SIZE):
+        await db.quiz_item_stats.bulk_write(updates[start:start + BATCH_SIZE], ordered=False)
+    return len(updates)
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_quiz_item_stats())
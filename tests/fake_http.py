@@ -0,0 +1,65 @@
+"""Local HTTP server standing in for an SMS or push provider in tests and benchmarks.
+
+Accepts JSON batch POSTs in the shape the adapters in
+backend/external_integrations/messaging.py send, records the batch sizes,
+and answers with per-message results. Status codes can be scripted to
+simulate throttling (429) and outages (5xx).
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _ProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so the adapters' pooled connections are reused
+
+    def do_POST(self):
+        server = self.server.fake
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        messages = body.get("messages", body.get("notifications", []))
+        status = server._next_status(len(messages))
+        if 200 <= status < 300:
+            payload = {"results": [
+                {"success": server.reject is None or not server.reject(message)} for message in messages
+            ]}
+        else:
+            payload = {"error": "unavailable"}
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+class FakeProviderServer:
+    """Threaded provider stand-in on 127.0.0.1; use as a context manager"""
+
+    def __init__(self):
+        self.statuses = []  # Scripted status codes, consumed one per request; 200 once exhausted
+        self.reject = None  # Optional predicate marking individual messages as failed
+        self.batch_sizes = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _ProviderHandler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        host, port = self._server.server_address
+        self.url = f"http://{host}:{port}/send"
+
+    @property
+    def requests(self) -> int:
+        return len(self.batch_sizes)
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _next_status(self, batch_size: int) -> int:
+        with self._lock:
+            self.batch_sizes.append(batch_size)
+            return self.statuses.pop(0) if self.statuses else 200
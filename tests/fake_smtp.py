@@ -0,0 +1,109 @@
+"""Minimal local SMTP server standing in for a real provider in tests and benchmarks.
+
+Speaks just enough ESMTP for smtplib: EHLO, AUTH PLAIN, MAIL, RCPT, DATA, RSET,
+NOOP and QUIT, without STARTTLS. Behaviour can be changed while it runs to
+simulate slow servers, refused recipients and dropped sessions.
+"""
+import socketserver
+import threading
+import time
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server.fake
+        server._opened(self)
+        try:
+            self._reply("220 fake-smtp ready")
+            messages_this_session = 0
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                command = line.decode("ascii", "replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+                if verb in ("EHLO", "HELO"):
+                    self._reply("250-fake-smtp", "250-AUTH PLAIN", "250 8BITMIME")
+                elif verb == "AUTH":
+                    self._reply("235 Authentication successful")
+                elif verb == "MAIL":
+                    if server.drop_after is not None and messages_this_session >= server.drop_after:
+                        return  # Hang up mid-session, like a provider enforcing a cap
+                    self._reply("250 OK")
+                elif verb == "RCPT":
+                    if "refused" in command.lower():
+                        self._reply("550 No such user")
+                    else:
+                        self._reply("250 OK")
+                elif verb == "DATA":
+                    self._reply("354 End data with <CR><LF>.<CR><LF>")
+                    while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                        pass
+                    if server.data_delay:
+                        time.sleep(server.data_delay)
+                    messages_this_session += 1
+                    server._delivered()
+                    self._reply("250 OK queued")
+                elif verb in ("RSET", "NOOP"):
+                    self._reply("250 OK")
+                elif verb == "QUIT":
+                    self._reply("221 Bye")
+                    return
+                else:
+                    self._reply("502 Command not implemented")
+        except OSError:
+            return
+        finally:
+            server._closed(self)
+
+    def _reply(self, *lines):
+        self.wfile.write("".join(f"{line}\r\n" for line in lines).encode("ascii"))
+
+class _ThreadingServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class FakeSMTPServer:
+    """Threaded SMTP stand-in on 127.0.0.1; use as a context manager"""
+
+    def __init__(self):
+        self.data_delay = 0.0  # Seconds to stall before acknowledging DATA
+        self.drop_after = None  # Hang up once a session has sent this many messages
+        self.connections = 0
+        self.messages = 0
+        self._handlers = set()
+        self._lock = threading.Lock()
+        self._server = _ThreadingServer(("127.0.0.1", 0), _SMTPHandler)
+        self._server.fake = self
+        self.host, self.port = self._server.server_address
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        self.drop_connections()
+
+    def drop_connections(self):
+        """Close every open session, as a server does with idle clients"""
+        with self._lock:
+            handlers = list(self._handlers)
+        for handler in handlers:
+            try:
+                handler.connection.shutdown(2)
+            except OSError:
+                pass
+
+    def _opened(self, handler):
+        with self._lock:
+            self.connections += 1
+            self._handlers.add(handler)
+
+    def _closed(self, handler):
+        with self._lock:
+            self._handlers.discard(handler)
+
+    def _delivered(self):
+        with self._lock:
+            self.messages += 1
@@ -0,0 +1,67 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+server = pytest.importorskip("server")
+
+DAY = datetime(2026, 3, 1)
+
+def test_is_on_calendar_grid():
+    assert server.is_on_calendar_grid(DAY.replace(hour=8, minute=45))
+    assert not server.is_on_calendar_grid(DAY.replace(hour=8, minute=50))
+    assert not server.is_on_calendar_grid(DAY.replace(hour=8, minute=45, second=30))
+
+def test_slots_of_a_short_session_stop_at_the_next_boundary():
+    slots = server.calendar_slot_starts(DAY.replace(hour=8), 50)
+    assert slots == [DAY.replace(hour=8, minute=minute) for minute in (0, 15, 30, 45)]
+    assert DAY.replace(hour=9) not in slots
+
+def test_grid_aligned_sessions_that_do_not_overlap_never_share_a_slot():
+    rng = random.Random(28)
+    for _ in range(2000):
+        first, second = sorted(
+            (DAY + timedelta(minutes=server.CALENDAR_SLOT_MINUTES * rng.randrange(64)), rng.randint(1, server.MAX_SESSION_DURATION_MINUTES))
+            for _ in range(2)
+        )
+        overlaps = not server.interval_is_free(
+            [(first[0], first[0] + timedelta(minutes=first[1]))], second[0], second[0] + timedelta(minutes=second[1])
+        )
+        shared = set(server.calendar_slot_starts(*first)) & set(server.calendar_slot_starts(*second))
+        assert bool(shared) == overlaps
+
+def plan(**overrides):
+    fields = dict(start_date=DAY.date().isoformat(), duration_minutes=50, earliest_hour=8, latest_hour=12,
+                  weekdays=list(range(7)), min_spacing_hours=0, horizon_days=1)
+    fields.update(overrides)
+    return server.AutoScheduleRequest(**fields)
+
+def claimed_slots(teacher_id, start, duration_minutes):
+    return {(doc["owner_key"], doc["slot_start"]) for doc in server.calendar_slot_docs("s", [f"teacher:{teacher_id}"], start, duration_minutes)}
+
+def test_planned_sessions_next_to_a_booking_can_claim_their_slots():
+    # Another student's 50-minute session, booked off the grid before starts were validated
+    booked_start = DAY.replace(hour=9, minute=10)
+    teacher_busy = {"t1": [server.calendar_span(booked_start, booked_start + timedelta(minutes=50))]}
+    placements = server.plan_course_sessions(
+        plan(), DAY, DAY - timedelta(days=1), 4, teacher_busy, {"t1": 1}, [], [], "t1"
+    )
+    
+    starts = [start for _, start in placements]
+    assert starts == [DAY.replace(hour=8), DAY.replace(hour=10), DAY.replace(hour=11)]
+    assert all(server.is_on_calendar_grid(start) for start in starts)
+    booked = claimed_slots("t1", booked_start, 50)
+    claimed = set()
+    for teacher_id, start in placements:
+        slots = claimed_slots(teacher_id, start, 50)
+        assert not slots & booked
+        assert not slots & claimed
+        claimed |= slots
+
+def test_planned_sessions_keep_spacing_from_the_previous_end():
+    booked = (DAY.replace(hour=8), DAY.replace(hour=8, minute=50))
+    placements = server.plan_course_sessions(
+        plan(min_spacing_hours=2, latest_hour=18), DAY, DAY - timedelta(days=1), 2,
+        {"t1": []}, {"t1": 0}, [], [booked], "t1"
+    )
+    assert [start for _, start in placements] == [DAY.replace(hour=11), DAY.replace(hour=14)]
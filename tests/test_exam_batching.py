@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+server = pytest.importorskip("server")
+
+DAY = datetime(2026, 3, 2, 9)
+
+def exam(exam_id, exam_type, *days):
+    dates = [DAY + timedelta(days=day) for day in days]
+    return {"id": exam_id, "exam_type": exam_type, "location": "Alger Centre", "scheduled_at": dates[0], "preferred_dates": dates}
+
+@pytest.mark.parametrize("exam_type, candidates, units", [
+    (server.CourseType.ROAD, 1, 1),
+    (server.CourseType.ROAD, 4, 4),
+    (server.CourseType.PARK, 8, 5),
+    (server.CourseType.THEORY, 20, 3)
+])
+def test_batch_load_grows_with_session_length(exam_type, candidates, units):
+    assert server.exam_load_units(exam_type, candidates) == units
+
+def test_full_batches_never_exceed_the_expert_day():
+    for exam_type, capacity in server.EXAM_BATCH_CAPACITY.items():
+        assert server.exam_load_units(exam_type, capacity) <= server.MAX_EXAMS_PER_EXPERT_PER_DAY
+
+def test_batches_respect_capacity_and_requested_dates():
+    exams = [exam(f"r{i}", server.CourseType.ROAD, 0, 1) for i in range(6)] + [exam("only-day-1", server.CourseType.ROAD, 1)]
+    batches = server.pack_exam_batches(exams)
+    assert all(len(batch["exams"]) <= server.EXAM_BATCH_CAPACITY[server.CourseType.ROAD] for batch in batches)
+    assert sorted(len(batch["exams"]) for batch in batches) == [3, 4]
+    assert any(batch["date"] == (DAY + timedelta(days=1)).date() and "only-day-1" in [e["id"] for e in batch["exams"]] for batch in batches)
@@ -0,0 +1,177 @@
+import asyncio
+import time
+
+import pytest
+
+from tests.fake_http import FakeProviderServer
+
+messaging = pytest.importorskip("external_integrations.messaging")
+
+@pytest.fixture
+def provider_server():
+    with FakeProviderServer() as server:
+        yield server
+
+def make_sms_provider(server, rate_per_second=1000, batch_size=10, pool_size=2):
+    return messaging.SMSProvider(
+        server.url, "key", sender_id="DrivingSchool",
+        rate_per_second=rate_per_second, batch_size=batch_size, pool_size=pool_size
+    )
+
+def sms(i):
+    return {"to": f"+21355500{i:04d}", "text": "Reminder"}
+
+class _Response:
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+def test_token_bucket_paces_to_rate():
+    async def scenario():
+        bucket = messaging.TokenBucket(rate=50, capacity=10)
+        started = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire(10)
+        return time.monotonic() - started
+
+    # The first 10 are a burst; the other 20 take 20 / 50 s
+    elapsed = asyncio.run(scenario())
+    assert 0.35 <= elapsed < 1.0
+
+def test_token_bucket_charges_large_batches_in_installments():
+    async def scenario():
+        bucket = messaging.TokenBucket(rate=100, capacity=10)
+        started = time.monotonic()
+        await bucket.acquire(30)
+        return time.monotonic() - started
+
+    assert 0.15 <= asyncio.run(scenario()) < 0.8
+
+def test_messages_are_split_into_provider_batches(provider_server):
+    async def scenario():
+        provider = make_sms_provider(provider_server, batch_size=10)
+        results = await provider.send_batch([sms(i) for i in range(25)])
+        provider.close()
+        return results
+
+    assert asyncio.run(scenario()) == [True] * 25
+    assert sorted(provider_server.batch_sizes) == [5, 10, 10]
+
+def test_concurrent_sends_share_one_request(provider_server):
+    async def scenario():
+        provider = make_sms_provider(provider_server, batch_size=100)
+        results = await asyncio.gather(*[provider.send(sms(i)) for i in range(30)])
+        provider.close()
+        return results
+
+    assert asyncio.run(scenario()) == [True] * 30
+    assert provider_server.batch_sizes == [30]
+
+def test_per_message_rejections_are_reported(provider_server):
+    provider_server.reject = lambda message: message["to"].endswith("1")
+
+    async def scenario():
+        provider = make_sms_provider(provider_server)
+        results = await provider.send_batch([sms(i) for i in range(3)])
+        provider.close()
+        return results
+
+    assert asyncio.run(scenario()) == [True, False, True]
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_circuit_opens_after_repeated_failures(provider_server, status):
+    provider_server.statuses = [status] * 10
+
+    async def scenario():
+        provider = make_sms_provider(provider_server, batch_size=1)
+        provider.breaker.failure_threshold = 2
+        for _ in range(2):
+            with pytest.raises(messaging.ProviderUnavailable):
+                await provider.send(sms(0))
+        with pytest.raises(messaging.ProviderUnavailable, match="circuit is open"):
+            await provider.send(sms(0))
+        provider.close()
+
+    asyncio.run(scenario())
+    assert provider_server.requests == 2  # The open circuit never reached the provider
+
+def test_half_open_circuit_lets_a_single_trial_through(provider_server):
+    provider_server.statuses = [503, 503]
+
+    async def scenario():
+        provider = make_sms_provider(provider_server, batch_size=1)
+        provider.breaker.failure_threshold = 2
+        provider.breaker.reset_seconds = 0.2
+        for _ in range(2):
+            with pytest.raises(messaging.ProviderUnavailable):
+                await provider.send(sms(0))
+        await asyncio.sleep(0.25)
+
+        results = await asyncio.gather(*[provider.send(sms(i)) for i in range(3)], return_exceptions=True)
+        requests_during_trial = provider_server.requests - 2
+        after_recovery = await provider.send(sms(9))
+        provider.close()
+        return results, requests_during_trial, after_recovery
+
+    results, requests_during_trial, after_recovery = asyncio.run(scenario())
+    assert requests_during_trial == 1
+    assert results.count(True) == 1
+    assert sum(isinstance(result, messaging.ProviderUnavailable) for result in results) == 2
+    assert after_recovery is True
+
+def test_failed_trial_reopens_circuit(provider_server):
+    provider_server.statuses = [503, 503, 503]
+
+    async def scenario():
+        provider = make_sms_provider(provider_server, batch_size=1)
+        provider.breaker.failure_threshold = 2
+        provider.breaker.reset_seconds = 0.2
+        for _ in range(2):
+            with pytest.raises(messaging.ProviderUnavailable):
+                await provider.send(sms(0))
+        await asyncio.sleep(0.25)
+        with pytest.raises(messaging.ProviderUnavailable, match="returned 503"):
+            await provider.send(sms(0))
+        with pytest.raises(messaging.ProviderUnavailable, match="circuit is open"):
+            await provider.send(sms(0))
+        provider.close()
+
+    asyncio.run(scenario())
+    assert provider_server.requests == 3
+
+def test_client_errors_fail_the_batch_without_opening_the_circuit(provider_server):
+    provider_server.statuses = [400] * 10
+
+    async def scenario():
+        provider = make_sms_provider(provider_server, batch_size=1)
+        provider.breaker.failure_threshold = 2
+        results = [await provider.send(sms(0)) for _ in range(3)]
+        is_open = provider.breaker.is_open()
+        provider.close()
+        return results, is_open
+
+    assert asyncio.run(scenario()) == ([False, False, False], False)
+
+@pytest.mark.parametrize("body, expected", [
+    ({"results": [{"success": True}, {"success": False}, {}]}, [True, False, True]),
+    ({"results": [{"success": False}]}, [True, True, True]),  # Count mismatch: trust the 2xx
+    ({"accepted": 3}, [True, True, True]),
+    (["not", "a", "dict"], [True, True, True]),
+    (ValueError("not json"), [True, True, True]),
+    ({"results": [True, False, 1]}, [True, False, True])
+])
+def test_parse_results(body, expected):
+    provider = messaging.SMSProvider("http://127.0.0.1:9/", "key", sender_id="DS", rate_per_second=1, batch_size=1, pool_size=1)
+    assert provider.parse_results(_Response(body), 3) == expected
+    provider.close()
+
+def test_adapters_must_build_their_payload():
+    class IncompleteProvider(messaging.HTTPProviderAdapter):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteProvider("http://127.0.0.1:9/", "key", rate_per_second=1, batch_size=1, pool_size=1)
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+
+server = pytest.importorskip("server")
+
+def make_quiz(questions, passing_score=70.0):
+    return {"id": "quiz-1", "passing_score": passing_score, "course_type": "theory", "questions": questions}
+
+def option_question(correct_id):
+    return {
+        "question": "?",
+        "options": [{"id": option_id, "text": option_id.upper(), "is_correct": option_id == correct_id} for option_id in "abcd"]
+    }
+
+def test_grade_many_scores_correct_answer_keys():
+    quiz = server.CompiledQuiz(make_quiz([
+        {"question": "1", "correct_answer": "a"},
+        {"question": "2", "correct_answer": 0},
+        {"question": "3", "correct_answer": "c"},
+        {"question": "4", "correct_answer": "d"}
+    ]))
+    correct, scores = quiz.grade_many([
+        {"0": "a", "1": 0, "2": "c", "3": "d"},
+        {"0": "a", "1": 1, "2": "b"},
+        {}
+    ])
+    assert correct.tolist() == [4, 1, 0]
+    assert scores.tolist() == [100.0, 25.0, 0.0]
+
+def test_grade_many_uses_is_correct_options_when_key_absent():
+    quiz = server.CompiledQuiz(make_quiz([option_question("a"), option_question("b"), option_question("b")]))
+    correct, scores = quiz.grade_many([{"0": "a", "1": "b", "2": "c"}])
+    assert correct.tolist() == [2]
+    assert quiz.grade({"0": "a", "1": "b", "2": "b"}) == (3, 100.0)
+
+def test_unanswered_questions_never_count_as_correct():
+    quiz = server.CompiledQuiz(make_quiz([option_question("a"), option_question("b"), option_question("b")]))
+    assert quiz.grade({}) == (0, 0.0)
+
+def test_questions_without_any_key_match_nothing():
+    quiz = server.CompiledQuiz(make_quiz([{"question": "no key"}, {"question": "keyed", "correct_answer": "x"}]))
+    correct, _ = quiz.grade_many([{}, {"0": None, "1": "x"}, {"0": "anything"}])
+    assert correct.tolist() == [0, 1, 0]
+
+def test_empty_quiz_scores_zero():
+    quiz = server.CompiledQuiz(make_quiz([]))
+    correct, scores = quiz.grade_many([{}, {"0": "a"}])
+    assert correct.tolist() == [0, 0]
+    assert scores.tolist() == [0.0, 0.0]
+
+@pytest.mark.parametrize("value", ["2026-05-04T08:30:00.000Z", "2026-05-04T10:30:00+02:00", "2026-05-04T08:30:00"])
+def test_client_datetimes_become_naive_utc(value):
+    parsed = server.parse_client_datetime(value)
+    assert parsed.tzinfo is None
+    assert parsed == server.datetime(2026, 5, 4, 8, 30)
+
+class _BumpingQuizzes:
+    """quizzes collection whose query finishes after another request bumped the bank version"""
+
+    def __init__(self, quiz):
+        self.quiz = quiz
+
+    def find(self, *args, **kwargs):
+        return self
+
+    async def find_one(self, *args, **kwargs):
+        server._quiz_bank_state["version"] += 1
+        return self.quiz
+
+    async def to_list(self, length=None):
+        server._quiz_bank_state["version"] += 1
+        return [self.quiz]
+
+class _FakeDB:
+    def __init__(self, quiz):
+        self.quizzes = _BumpingQuizzes(quiz)
+
+def test_quizzes_loaded_across_a_version_bump_are_not_cached(monkeypatch):
+    monkeypatch.setattr(server, "db", _FakeDB(make_quiz([option_question("a")])))
+    monkeypatch.setattr(server, "_quiz_bank_state", {"version": 1, "checked_at": time.monotonic(), "active_ids": None})
+    monkeypatch.setattr(server, "_quiz_cache", {})
+
+    quizzes = asyncio.run(server.get_active_quizzes())
+    assert [compiled.id for compiled in quizzes] == ["quiz-1"]
+    assert server._quiz_bank_state["active_ids"] is None
+
+    assert asyncio.run(server.get_compiled_quiz("quiz-1")).id == "quiz-1"
+    assert server._quiz_cache == {}
+
+def test_quiz_pack_encodings_have_distinct_etags():
+    pack = server.QuizPack(b'{"quizzes": []}', 1)
+    assert pack.etag != pack.gzip_etag
+    assert pack.gzip_etag == pack.etag[:-1] + '-gzip"'
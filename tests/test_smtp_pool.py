@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from tests.fake_smtp import FakeSMTPServer
+
+enhanced_notifications = pytest.importorskip("enhanced_notifications")
+SMTPConnectionPool = enhanced_notifications.SMTPConnectionPool
+
+MESSAGE = "Subject: test\r\n\r\nhello"
+
+@pytest.fixture
+def smtp_server():
+    with FakeSMTPServer() as server:
+        yield server
+
+def make_pool(server, size=2):
+    return SMTPConnectionPool(server.host, server.port, "user", "secret", size=size, use_tls=False)
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_send_reuses_pooled_connection(smtp_server):
+    async def scenario():
+        pool = make_pool(smtp_server)
+        results = [await pool.send("from@example.com", ["to@example.com"], MESSAGE) for _ in range(5)]
+        await pool.close()
+        return results
+
+    assert run(scenario()) == [True] * 5
+    assert smtp_server.messages == 5
+    assert smtp_server.connections == 1
+
+def test_send_retries_once_when_pooled_connection_went_stale(smtp_server):
+    async def scenario():
+        pool = make_pool(smtp_server)
+        assert await pool.send("from@example.com", ["to@example.com"], MESSAGE)
+        smtp_server.drop_connections()
+        await asyncio.sleep(0.05)
+        result = await pool.send("from@example.com", ["to@example.com"], MESSAGE)
+        await pool.close()
+        return result
+
+    assert run(scenario()) is True
+    assert smtp_server.messages == 2
+    assert smtp_server.connections == 2
+
+def test_timed_out_connection_is_recycled(smtp_server, monkeypatch):
+    monkeypatch.setattr(enhanced_notifications, "SMTP_TIMEOUT_SECONDS", 0.2)
+
+    async def scenario():
+        pool = make_pool(smtp_server, size=1)
+        smtp_server.data_delay = 1.0
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.send("from@example.com", ["to@example.com"], MESSAGE)
+        assert pool._idle == []
+        smtp_server.data_delay = 0.0
+        result = await pool.send("from@example.com", ["to@example.com"], MESSAGE)
+        await pool.close()
+        return result
+
+    assert run(scenario()) is True
+    assert smtp_server.connections == 2
+
+def test_idle_and_exhausted_connections_are_recycled(smtp_server, monkeypatch):
+    monkeypatch.setattr(enhanced_notifications, "SMTP_MAX_MESSAGES_PER_CONNECTION", 2)
+
+    async def scenario():
+        pool = make_pool(smtp_server, size=1)
+        for _ in range(5):
+            await pool.send("from@example.com", ["to@example.com"], MESSAGE)
+        monkeypatch.setattr(enhanced_notifications, "SMTP_IDLE_SECONDS", 0)
+        await pool.send("from@example.com", ["to@example.com"], MESSAGE)
+        await pool.close()
+
+    run(scenario())
+    # Five sends at two per connection need three; the idle one is then replaced
+    assert smtp_server.connections == 4
+
+def test_send_many_reports_refused_recipients_per_message(smtp_server):
+    async def scenario():
+        pool = make_pool(smtp_server)
+        results = await pool.send_many([
+            ("from@example.com", ["a@example.com"], MESSAGE),
+            ("from@example.com", ["refused@example.com"], MESSAGE),
+            ("from@example.com", ["c@example.com"], MESSAGE)
+        ])
+        idle = len(pool._idle)
+        await pool.close()
+        return results, idle
+
+    results, idle = run(scenario())
+    assert results == [True, False, True]
+    assert idle == 1  # A refused recipient doesn't poison the session
+
+def test_send_many_marks_rest_failed_when_session_drops(smtp_server):
+    smtp_server.drop_after = 2
+
+    async def scenario():
+        pool = make_pool(smtp_server)
+        results = await pool.send_many([("from@example.com", [f"{i}@example.com"], MESSAGE) for i in range(4)])
+        idle = len(pool._idle)
+        await pool.close()
+        return results, idle
+
+    results, idle = run(scenario())
+    assert results == [True, True, False, False]
+    assert idle == 0
+
+def test_fresh_connection_failure_is_not_retried(smtp_server):
+    smtp_server.drop_after = 0
+
+    async def scenario():
+        pool = make_pool(smtp_server)
+        with pytest.raises(enhanced_notifications.smtplib.SMTPServerDisconnected):
+            await pool.send("from@example.com", ["to@example.com"], MESSAGE)
+        await pool.close()
+
+    run(scenario())
+    assert smtp_server.connections == 1